@@ -0,0 +1,575 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple, Union
+from urllib.parse import parse_qs, quote, urlsplit
+
+from openpyxl import load_workbook
+
+from attestation_jobs import JOB_DONE, AttestationJobManager
+from gen_final import MonthlyAssessmentGenerator
+from mark_log import check_mark_target, normalize_mark_value
+from student_mutations import EXPEL, MOVE, apply_mutations, expel_student, move_student, recover_mutations
+from xlsx_anonymizer import AnonymizedCache
+from xlsx_journal_reader import READER_OPENPYXL, READERS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Ответ обработчика: (код, заголовки, тело)
+Response = Tuple[int, Dict[str, str], Union[bytes, "FileBody"]]
+
+STATUS_TEXT = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+def json_response(data: Dict, status: int = 200) -> Response:
+    """Формирует JSON-ответ"""
+    body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+    return status, {"Content-Type": "application/json; charset=utf-8"}, body
+
+
+def error_response(message: str, status: int = 200) -> Response:
+    """Ответ с ошибкой в формате api-paths.txt: {"status":"error","error":...}"""
+    return json_response({"status": "error", "error": message}, status)
+
+
+class FileBody:
+    """Тело ответа из файла: отправляется частями, не читаясь целиком в память
+
+    Файл открывается сразу в обработчике: если его удалят или заменят до
+    отправки (например, при перестроении кэша обезличенных копий), уйдет уже
+    открытая версия.
+    """
+
+    chunk_size = 1 << 16
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+
+    def close(self):
+        self.file.close()
+
+    def __len__(self) -> int:
+        return self.size
+
+
+def file_response(filename: str, body: Union[bytes, FileBody]) -> Response:
+    """Ответ-скачивание xlsx файла"""
+    headers = {
+        "Content-Type": XLSX_CONTENT_TYPE,
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}",
+    }
+    return 200, headers, body
+
+
+def parse_date_param(value: Optional[str]) -> Optional[datetime]:
+    """Разбирает дату ДД.ММ.ГГГГ из параметра запроса"""
+    if not value:
+        return None
+    return datetime.strptime(value, "%d.%m.%Y")
+
+
+class LatencyStats:
+    """Статистика времени ответа по маршрутам (последние N запросов)"""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self.samples: Dict[str, deque] = {}
+        self.counts: Dict[str, int] = {}
+
+    def record(self, route: str, elapsed: float):
+        self.samples.setdefault(route, deque(maxlen=self.window)).append(elapsed)
+        self.counts[route] = self.counts.get(route, 0) + 1
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for route, samples in self.samples.items():
+            ordered = sorted(samples)
+            result[route] = {
+                "count": self.counts[route],
+                "avg_ms": round(1000 * sum(ordered) / len(ordered), 3),
+                "p50_ms": round(1000 * ordered[len(ordered) // 2], 3),
+                "p95_ms": round(1000 * ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+                "max_ms": round(1000 * ordered[-1], 3),
+            }
+        return result
+
+
+class RenderCache:
+    """Кэш JSON-представлений файлов аттестаций
+
+    Готовые байты ответа хранятся по пути файла и действительны, пока у файла
+    не изменились mtime и размер. ETag — хэш тела ответа.
+    """
+
+    def __init__(self, render: Callable[[str], bytes], max_entries: int = 64):
+        self.render = render
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[Tuple[int, int], str, bytes]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path: str) -> Tuple[str, bytes]:
+        """Возвращает (ETag, тело) для файла, при необходимости перестраивая запись"""
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry[0] == stamp:
+                self.entries.move_to_end(path)
+                self.hits += 1
+                return entry[1], entry[2]
+            self.misses += 1
+
+        body = self.render(path)
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        with self.lock:
+            self.entries[path] = (stamp, etag, body)
+            self.entries.move_to_end(path)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return etag, body
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Проверяет заголовок If-None-Match (список ETag или *)"""
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+class ApiServer:
+    """HTTP-сервис по arch&struct/api-paths.txt на asyncio
+
+    Тяжелая работа с openpyxl выполняется в ограниченных пулах потоков:
+    сборка аттестаций — в очереди заданий (не больше build_workers сборок
+    одновременно), перевод и отчисление — в отдельном потоке, чтобы долгие
+    операции не задерживали поиск, просмотр и статистику (пул query_workers).
+    """
+
+    def __init__(self, journals_path: str = "Журналы/1 Курс", result_folder: str = "Итог",
+                 build_workers: int = 2, query_workers: int = 4, group_workers: int = 1, cache_folder: str = "Кэш",
+                 reader: str = READER_OPENPYXL, store_path: Optional[str] = None, mark_log_path: Optional[str] = None):
+        self.journals_path = journals_path
+        self.result_folder = result_folder
+        # Пакет изменений студентов, прерванный сбоем, доводится до конца до первых чтений
+        recover_mutations(journals_path)
+        self.jobs = AttestationJobManager(journals_path, result_folder, build_workers, group_workers, reader=reader,
+                                          store_path=store_path, mark_log_path=mark_log_path)
+        # Изменения журналов выполняются по одному, чтобы не перезаписывать файлы одновременно
+        self.mutation_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mutation")
+        self.query_executor = ThreadPoolExecutor(max_workers=query_workers, thread_name_prefix="query")
+
+        # Общий генератор для быстрых запросов (поиск, статистика). Статистика (кэши журналов,
+        # синхронизация хранилища) и индекс поиска защищены разными блокировками, чтобы поиск
+        # не ждал долгих пересчетов статистики; кэши журналов сами потокобезопасны для /metrics
+        self.generator = MonthlyAssessmentGenerator(journals_path, result_folder, cache_folder, reader=reader,
+                                                    store_path=store_path, mark_log_path=mark_log_path)
+        self.stats_lock = threading.Lock()
+        self.search_lock = threading.Lock()
+        self.latency = LatencyStats()
+        self.render_cache = RenderCache(self._render_attestation)
+        self.anonymized_cache = AnonymizedCache(os.path.join(cache_folder, "Обезличенные"))
+
+        self.routes = {
+            ("GET", "/attestation"): self.list_attestations,
+            ("POST", "/attestation"): self.create_attestation,
+            ("GET", "/attestation/jobs"): self.attestation_jobs,
+            ("POST", "/attestation/cancel"): self.cancel_attestation,
+            ("GET", "/view-attestation"): self.view_attestation,
+            ("POST", "/view-attestation"): self.download_attestation,
+            ("GET", "/single/search"): self.search_students,
+            ("POST", "/single/move"): self.move_student,
+            ("POST", "/single/delete"): self.delete_student,
+            ("POST", "/single/batch"): self.batch_mutations,
+            ("POST", "/single/stats"): self.student_stats,
+            ("POST", "/single/mark"): self.record_mark,
+            ("POST", "/marks/compact"): self.compact_marks,
+            ("GET", "/metrics"): self.metrics,
+        }
+
+    async def run_in(self, executor, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, func, *args)
+
+    def attestation_path(self, filename: Optional[str]) -> Optional[str]:
+        """Путь к файлу аттестации в папке результатов (None, если файла нет)"""
+        if not filename or os.path.basename(filename) != filename:
+            return None
+        path = os.path.join(self.result_folder, filename)
+        return path if os.path.isfile(path) else None
+
+    def invalidate_caches(self):
+        """Сбрасывает кэши общего генератора после изменения журналов"""
+        with self.stats_lock:
+            self.generator.cleanup_cache()
+        with self.search_lock:
+            self.generator.search_index.refresh(force=True)
+
+    # Обработчики маршрутов
+
+    async def list_attestations(self, params: Dict[str, str], headers: Dict[str, str]) -> Response:
+        files = []
+        if os.path.isdir(self.result_folder):
+            files = sorted(file for file in os.listdir(self.result_folder) if file.endswith('.xlsx'))
+        return json_response({"files": [{"filename": file} for file in files]})
+
+    async def create_attestation(self, params: Dict[str, str], headers: Dict[str, str]) -> Response:
+        """Ставит сборку в очередь заданий
+
+        По умолчанию ждет готовности файла, как описано в api-paths.txt;
+        с ?async=true сразу возвращает задание для опроса через /attestation/jobs.
+        """
+        try:
+            month = int(params["month"]) if params.get("month") else None
+            start_date = parse_date_param(params.get("start"))
+            end_date = parse_date_param(params.get("end"))
+        except ValueError:
+            return error_response("Неверный месяц или дата")
+        if month is not None and month not in MonthlyAssessmentGenerator.MONTH_NAMES:
+            months = ", ".join(map(str, MonthlyAssessmentGenerator.MONTH_NAMES))
+            return error_response(f"Неверный номер месяца. Доступны месяцы: {months}.")
+
+        period = (start_date, end_date) if start_date and end_date else month
+        # submit обходит все журналы ради версии, поэтому не в цикле событий
+        job = await self.run_in(self.query_executor, self.jobs.submit, period)
+        if params.get("async") == "true":
+            return json_response({"status": "Ok", "job": job.to_dict()})
+
+        await asyncio.wrap_future(job.future)
+        if job.status != JOB_DONE:
+            return json_response({"status": "error", "error": job.error or "Сборка отменена", "job": job.to_dict()})
+        return json_response({"status": "Ok", "filename": os.path.basename(job.filename), "job": job.to_dict()})
+
+    async def attestation_jobs(self, params: Dict[str, str], headers: Dict[str, str]) -> Response:
+        job_id = params.get("id")
+        if job_id:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return error_response("Задание не найдено")
+            return json_response({"status": "ok", "result": job.to_dict()})
+        return json_response({"status": "ok", "result": [job.to_dict() for job in self.jobs.list()]})
+
+    async def cancel_attestation(self, params: Dict[str, str], headers: Dict[str, str]) -> Response:
+        if not self.jobs.cancel(params.get("id") or ""):
+            return error_response("Задание не найдено или уже завершено")
+        return json_response({"status": "ok"})
+
+    def _read_attestation(self, path: str) -> Dict[str, list]:
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            return {
+                ws.title: [["" if value is None else str(value) for value in row] for row in ws.iter_rows(values_only=True)]
+                for ws in wb.worksheets
+            }
+        finally:
+            wb.close()
+
+    def _render_attestation(self, path: str) -> bytes:
+        return json.dumps({"status": "ok", "result": self._read_attestation(path)}, ensure_ascii=False).encode('utf-8')
+
+    async def view_attestation(self, params: Dict[str, str], headers: Dict[str, str]) -> Response:
+        path = self.attestation_path(params.get("file"))
+        if path is None:
+            return error_response("файл не существует")
+        etag, body = await self.run_in(self.query_executor, self.render_cache.get, path)
+        response_headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(headers.get("if-none-match"), etag):
+            return 304, response_headers, b""
+        response_headers["Content-Type"] = "application/json; charset=utf-8"
+        return 200, response_headers, body
+
+    async def download_attestation(self, params: Dict[str, str], headers: Dict[str, str]) -> Response:
+        path = self.attestation_path(params.get("file"))
+        if path is None:
+            return error_response("файл не существует")
+        try:
+            if params.get("fioff") == "true":
+                body = await self.run_in(self.query_executor, self._open_anonymized, path)
+            else:
+                body = FileBody(path)
+        except FileNotFoundError:
+            return error_response("файл не существует")
+        return file_response(os.path.basename(path), body)
+
+    def _open_anonymized(self, path: str) -> FileBody:
+        """Открывает обезличенную копию аттестации (строит ее при необходимости)"""
+        try:
+            return FileBody(self.anonymized_cache.get(path))
+        except FileNotFoundError:
+            # Копию между get и open удалило перестроение для другого запроса — берем заново
+            return FileBody(self.anonymized_cache.get(path))
+
+    def _search(self, query: str, limit: Optional[int] = None):
+        with self.search_lock:
+            return self.generator.find_students_by_name(query, limit)
+
+    async def search_students(self, params: Dict[str, str], headers: Dict[str, str]) -> Response:
+        query = params.get("q") or ""
+        try:
+            limit = int(params["limit"]) if params.get("limit") else None
+        except ValueError:
+            return error_response("Неверный лимит")
+        if limit is not None and limit < 1:
+            return error_response("Неверный лимит")
+        # Запрашиваем на одного студента больше, чтобы сообщить об усечении выдачи
+        matches = await self.run_in(self.query_executor, self._search, query, limit + 1 if limit else None) if query else []
+        truncated = limit is not None and len(matches) > limit
+        return json_response({
+            "status": "ok",
+            "result": [{"fio": fio, "group": group} for group, fio, _ in matches[:limit]],
+            "truncated": truncated,
+        })
+
+    def _compact_marks(self, batch_size: Optional[int] = None) -> int:
+        """Переносит журнал отметок в xlsx (выполняется в потоке изменений)"""
+        if self.generator.mark_log is None:
+            return 0
+        return self.generator.mark_log.compact(self.journals_path, batch_size)
+
+    async def record_mark(self, params: Dict[str, str], headers: Dict[str, str]) -> Response:
+        student_fio, group_name, subject, date_str = params.get("stud"), params.get("orgroup"), params.get("subject"), params.get("date")
+        if self.generator.mark_log is None:
+            return error_response("Журнал отметок не включен (--mark-log)")
+        if not (student_fio and group_name and subject and date_str):
+            return error_response("Не указаны stud, orgroup, subject или date")
+        try:
+            date_key = parse_date_param(date_str).strftime("%d.%m.%Y")
+        except ValueError:
+            return error_response("Неверный формат даты. Используйте ДД.ММ.ГГГГ.")
+        try:
+            value = normalize_mark_value(params.get("value"))
+            await self.run_in(self.mutation_executor, check_mark_target, self.journals_path, group_name, subject, student_fio, date_key)
+        except ValueError as e:
+            return error_response(str(e))
+
+        await self.run_in(self.mutation_executor, self.generator.mark_log.append, group_name, subject, student_fio, date_key, value)
+        return json_response({"status": "ok"})
+
+    async def compact_marks(self, params: Dict[str, str], headers: Dict[str, str]) -> Response:
+        if self.generator.mark_log is None:
+            return error_response("Журнал отметок не включен (--mark-log)")
+        try:
+            batch_size = int(params["batch"]) if params.get("batch") else None
+        except ValueError:
+            return error_response("Неверный размер пачки")
+        try:
+            written = await self.run_in(self.mutation_executor, self._compact_marks, batch_size)
+        finally:
+            await self.run_in(self.query_executor, self.invalidate_caches)
+        return json_response({"status": "ok", "result": {"written": written, "pending": len(self.generator.mark_log)}})
+
+    async def move_student(self, params: Dict[str, str], headers: Dict[str, str]) -> Response:
+        student_fio, from_group, to_group = params.get("stud"), params.get("orgroup"), params.get("newgroup")
+        if not (student_fio and from_group and to_group):
+            return error_response("Не указаны stud, orgroup или newgroup")
+        try:
+            await self.run_in(self.mutation_executor, self._compact_marks)
+            await self.run_in(self.mutation_executor, move_student, self.journals_path, student_fio, from_group, to_group)
+        except ValueError as e:
+            return error_response(str(e))
+        finally:
+            await self.run_in(self.query_executor, self.invalidate_caches)
+        return json_response({"status": "ok"})
+
+    async def delete_student(self, params: Dict[str, str], headers: Dict[str, str]) -> Response:
+        student_fio, group_name = params.get("stud"), params.get("orgroup")
+        if not (student_fio and group_name):
+            return error_response("Не указаны stud или orgroup")
+        try:
+            await self.run_in(self.mutation_executor, self._compact_marks)
+            await self.run_in(self.mutation_executor, expel_student, self.journals_path, student_fio, group_name)
+        except ValueError as e:
+            return error_response(str(e))
+        finally:
+            await self.run_in(self.query_executor, self.invalidate_caches)
+        return json_response({"status": "ok"})
+
+    async def batch_mutations(self, params: Dict[str, str], headers: Dict[str, str]) -> Response:
+        """Пакет переводов и отчислений: каждый файл переписывается один раз, все или ничего
+
+        Тело (JSON): {"operations": [{"op": "move", "stud", "orgroup", "newgroup"}, {"op": "delete", "stud", "orgroup"}]}
+        """
+        operations = []
+        items = params.get("operations")
+        if not isinstance(items, list) or not items:
+            return error_response("Не указан список operations")
+        for item in items:
+            if not isinstance(item, dict) or any(not isinstance(item.get(key, ""), str) for key in ("op", "stud", "orgroup", "newgroup")):
+                return error_response(f"Неверная операция: {item}")
+            student_fio, from_group = item.get("stud"), item.get("orgroup")
+            if item.get("op") == "move" and student_fio and from_group and item.get("newgroup"):
+                operations.append((MOVE, student_fio, from_group, item["newgroup"]))
+            elif item.get("op") == "delete" and student_fio and from_group:
+                operations.append((EXPEL, student_fio, from_group))
+            else:
+                return error_response(f"Неверная операция: {item}")
+        try:
+            await self.run_in(self.mutation_executor, self._compact_marks)
+            result = await self.run_in(self.mutation_executor, apply_mutations, self.journals_path, operations)
+        except ValueError as e:
+            return error_response(str(e))
+        finally:
+            await self.run_in(self.query_executor, self.invalidate_caches)
+        return json_response({"status": "ok", "result": result})
+
+    def _student_stats(self, group_name: str, student_fio: str, start_date: datetime, end_date: datetime) -> Dict:
+        with self.stats_lock:
+            self.generator.sync_store()
+            return self.generator.get_student_period_stats(group_name, student_fio, start_date, end_date)
+
+    async def student_stats(self, params: Dict[str, str], headers: Dict[str, str]) -> Response:
+        student_fio, group_name = params.get("stud"), params.get("orgroup")
+        if not (student_fio and group_name):
+            return error_response("Не указаны stud или orgroup")
+        if not os.path.isdir(os.path.join(self.journals_path, group_name)):
+            return error_response(f"Не существует {group_name}")
+        try:
+            start_date = parse_date_param(params.get("start")) or datetime(1900, 1, 1)
+            end_date = parse_date_param(params.get("end")) or datetime(9999, 12, 31)
+        except ValueError:
+            return error_response("Неверный формат даты. Используйте ДД.ММ.ГГГГ.")
+
+        stats = await self.run_in(self.query_executor, self._student_stats, group_name, student_fio, start_date, end_date)
+        return json_response({"status": "ok", "result": stats})
+
+    async def metrics(self, params: Dict[str, str], headers: Dict[str, str]) -> Response:
+        caches = self.generator.cache_stats()
+        caches["render"] = self.render_cache.stats()
+        return json_response({"status": "ok", "result": self.latency.summary(), "caches": caches})
+
+    # HTTP
+
+    async def dispatch(self, method: str, target: str, headers: Optional[Dict[str, str]] = None, body: bytes = b"") -> Tuple[str, Response]:
+        url = urlsplit(target)
+        # В примерах api-paths.txt значения передаются в кавычках: ?file="..."
+        params = {key: values[-1].strip('"') for key, values in parse_qs(url.query).items()}
+        # Поля JSON-объекта в теле запроса дополняют параметры строки запроса
+        if body and (headers or {}).get("content-type", "").startswith("application/json"):
+            try:
+                data = json.loads(body.decode('utf-8'))
+            except ValueError:
+                return url.path, error_response("Неверный JSON в теле запроса", 400)
+            if isinstance(data, dict):
+                for key, value in data.items():
+                    if key == "operations":
+                        params[key] = value  # /single/batch ждет список операций
+                    elif isinstance(value, bool):
+                        params[key] = "true" if value else "false"
+                    elif isinstance(value, (str, int, float)):
+                        params[key] = str(value)
+                    elif value is not None:
+                        return url.path, error_response(f"Неверное значение поля {key}: ожидается строка", 400)
+        handler = self.routes.get((method, url.path))
+        if handler is None:
+            if any(path == url.path for _, path in self.routes):
+                return url.path, error_response("Метод не поддерживается", 405)
+            return url.path, error_response("Не найдено", 404)
+        try:
+            return f"{method} {url.path}", await handler(params, headers or {})
+        except Exception as e:
+            logger.error(f"Ошибка при обработке {method} {target}: {e}", exc_info=True)
+            return f"{method} {url.path}", error_response("Внутренняя ошибка сервера", 500)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            request_line, *header_lines = head.decode('latin-1').split("\r\n")
+            method, target, _ = request_line.split(" ", 2)
+            headers = {}
+            for line in header_lines:
+                if ":" in line:
+                    name, value = line.split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+            length = int(headers.get("content-length") or 0)
+            body = await reader.readexactly(length) if length else b""
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            writer.close()
+            return
+
+        started = time.perf_counter()
+        route, (status, response_headers, body) = await self.dispatch(method.upper(), target, headers, body)
+        elapsed = time.perf_counter() - started
+        self.latency.record(route, elapsed)
+        logger.info(f"{method} {target} -> {status} ({elapsed * 1000:.1f} мс)")
+
+        response_headers = dict(response_headers)
+        response_headers["Content-Length"] = str(len(body))
+        response_headers["Connection"] = "close"
+        head = f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+        head += "".join(f"{name}: {value}\r\n" for name, value in response_headers.items())
+        try:
+            if isinstance(body, FileBody):
+                writer.write(head.encode('utf-8') + b"\r\n")
+                for chunk in iter(lambda: body.file.read(FileBody.chunk_size), b""):
+                    writer.write(chunk)
+                    await writer.drain()
+            else:
+                writer.write(head.encode('utf-8') + b"\r\n" + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        except OSError as e:
+            # Заголовки уже отправлены — остается только оборвать соединение
+            logger.error(f"Ошибка при отправке ответа на {method} {target}: {e}")
+        finally:
+            if isinstance(body, FileBody):
+                body.close()
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8000):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        logger.info(f"Сервер запущен на http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+    def shutdown(self):
+        self.jobs.shutdown()
+        self.mutation_executor.shutdown(wait=False, cancel_futures=True)
+        self.query_executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP-сервис аттестаций")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--journals", default="Журналы/1 Курс", help="папка с журналами групп")
+    parser.add_argument("--results", default="Итог", help="папка с файлами аттестаций")
+    parser.add_argument("--build-workers", type=int, default=2, help="одновременных сборок аттестаций")
+    parser.add_argument("--query-workers", type=int, default=4, help="потоков для просмотра, поиска и статистики")
+    parser.add_argument("--group-workers", type=int, default=1, help="процессов на группы внутри одной сборки")
+    parser.add_argument("--cache", default="Кэш", help="папка кэша (обезличенные копии аттестаций)")
+    parser.add_argument("--reader", choices=READERS, default=READER_OPENPYXL, help="способ чтения журналов")
+    parser.add_argument("--store", default=None, help="файл хранилища журналов SQLite (по умолчанию итоги считаются по xlsx)")
+    parser.add_argument("--mark-log", default=None, help="файл журнала отметок на дозапись (POST /single/mark)")
+    args = parser.parse_args()
+
+    server = ApiServer(args.journals, args.results, args.build_workers, args.query_workers, args.group_workers, args.cache, args.reader,
+                       args.store, args.mark_log)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nСервер остановлен.")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
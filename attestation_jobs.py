@@ -0,0 +1,188 @@
+import hashlib
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from gen_final import AssessmentCancelled, MonthlyAssessmentGenerator, Period
+from xlsx_journal_reader import READER_OPENPYXL
+
+logger = logging.getLogger(__name__)
+
+# Состояния задания
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+ACTIVE_STATES = (JOB_QUEUED, JOB_RUNNING)
+
+
+def journals_version(journals_path: str, mark_log_path: Optional[str] = None) -> str:
+    """Версия входных журналов: хэш путей, mtime и размеров всех .xlsx файлов (и журнала отметок)"""
+    digest = hashlib.sha1()
+    if mark_log_path and os.path.exists(mark_log_path):
+        st = os.stat(mark_log_path)
+        digest.update(f"{st.st_ino}|{st.st_size}\n".encode('utf-8'))
+    if os.path.isdir(journals_path):
+        for root, dirs, files in os.walk(journals_path):
+            dirs.sort()
+            for file in sorted(files):
+                if not file.endswith('.xlsx'):
+                    continue
+                st = os.stat(os.path.join(root, file))
+                digest.update(f"{os.path.relpath(os.path.join(root, file), journals_path)}|{st.st_mtime_ns}|{st.st_size}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class AttestationJob:
+    """Задание на сборку аттестации за один период"""
+
+    def __init__(self, job_id: str, period: Period, version: str):
+        self.id = job_id
+        self.period = period
+        self.version = version
+        self.status = JOB_QUEUED
+        self.groups_done = 0
+        self.groups_total = 0
+        self.current_group: Optional[str] = None
+        self.filename: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.cancel_event = threading.Event()
+        self.future: Optional[Future] = None
+
+    @property
+    def key(self):
+        return (self.period, self.version)
+
+    def to_dict(self) -> Dict:
+        target_month, start_date, end_date = self.period
+        return {
+            "id": self.id,
+            "status": self.status,
+            "month": target_month,
+            "start": start_date.strftime("%d.%m.%Y") if start_date else None,
+            "end": end_date.strftime("%d.%m.%Y") if end_date else None,
+            "progress": {"done": self.groups_done, "total": self.groups_total, "group": self.current_group},
+            "filename": os.path.basename(self.filename) if self.filename else None,
+            "error": self.error,
+        }
+
+
+class AttestationJobManager:
+    """Очередь сборки аттестаций с отчетом о прогрессе и объединением запросов
+
+    Одинаковые запросы (тот же период и та же версия журналов), пришедшие,
+    пока задание в очереди или выполняется, получают одно и то же задание.
+    Одновременно выполняется не больше max_concurrent сборок.
+    """
+
+    def __init__(self, journals_path: str = "Журналы/1 Курс", result_folder: str = "Итог",
+                 max_concurrent: int = 1, group_workers: int = 1, keep_finished: int = 100, reader: str = READER_OPENPYXL,
+                 store_path: Optional[str] = None, mark_log_path: Optional[str] = None):
+        self.journals_path = journals_path
+        self.result_folder = result_folder
+        self.reader = reader
+        self.store_path = store_path  # хранилище журналов SQLite (journal_store), None — без него
+        self.mark_log_path = mark_log_path  # журнал отметок на дозапись (mark_log), None — без него
+        self.group_workers = group_workers
+        self.keep_finished = keep_finished
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="attestation")
+        self.jobs: Dict[str, AttestationJob] = {}
+        self.active: Dict[tuple, AttestationJob] = {}
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def submit(self, period=None) -> AttestationJob:
+        """Ставит сборку в очередь или возвращает уже идущее задание с тем же ключом
+
+        period — месяц, пара дат (начало, конец) или None (все данные).
+        Версия журналов считается обходом всего дерева, поэтому из asyncio
+        вызывается в пуле потоков.
+        """
+        period = MonthlyAssessmentGenerator._normalize_period(period)
+        version = journals_version(self.journals_path, self.mark_log_path)
+        with self.lock:
+            job = self.active.get((period, version))
+            if job is not None:
+                return job
+
+            job = AttestationJob(str(next(self._ids)), period, version)
+            self.jobs[job.id] = job
+            self.active[job.key] = job
+            self._trim_finished()
+            job.future = self.executor.submit(self._run, job)
+        logger.info(f"Задание {job.id} поставлено в очередь")
+        return job
+
+    def _run(self, job: AttestationJob) -> AttestationJob:
+        try:
+            if job.cancel_event.is_set():
+                raise AssessmentCancelled()
+            job.status = JOB_RUNNING
+
+            def progress(done: int, total: int, group_name: str):
+                job.groups_done, job.groups_total, job.current_group = done, total, group_name
+
+            generator = MonthlyAssessmentGenerator(self.journals_path, self.result_folder, reader=self.reader,
+                                                   store_path=self.store_path, mark_log_path=self.mark_log_path)
+            job.groups_total = len(generator.get_groups())
+            filenames = generator.create_assessments_for_periods(
+                [self._period_argument(job.period)], self.group_workers, progress, job.cancel_event
+            )
+            if filenames:
+                job.filename = filenames[0]
+                job.status = JOB_DONE
+            else:
+                job.error = "Не удалось создать аттестацию"
+                job.status = JOB_FAILED
+        except AssessmentCancelled:
+            job.status = JOB_CANCELLED
+        except Exception as e:
+            logger.error(f"Ошибка в задании {job.id}: {e}", exc_info=True)
+            job.error = str(e)
+            job.status = JOB_FAILED
+        finally:
+            job.finished = time.time()
+            with self.lock:
+                if self.active.get(job.key) is job:
+                    del self.active[job.key]
+        return job
+
+    @staticmethod
+    def _period_argument(period: Period):
+        target_month, start_date, end_date = period
+        if start_date and end_date:
+            return (start_date, end_date)
+        return target_month
+
+    def _trim_finished(self):
+        """Удаляет самые старые завершенные задания сверх keep_finished"""
+        finished = [job for job in self.jobs.values() if job.status not in ACTIVE_STATES]
+        for job in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[job.id]
+
+    def get(self, job_id: str) -> Optional[AttestationJob]:
+        return self.jobs.get(job_id)
+
+    def list(self) -> List[AttestationJob]:
+        return list(self.jobs.values())
+
+    def cancel(self, job_id: str) -> bool:
+        """Отменяет задание в очереди или во время сборки (после текущей группы)"""
+        job = self.jobs.get(job_id)
+        if job is None or job.status not in ACTIVE_STATES:
+            return False
+        job.cancel_event.set()
+        return True
+
+    def shutdown(self):
+        for job in self.list():
+            job.cancel_event.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
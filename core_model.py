@@ -0,0 +1,249 @@
+import os
+import sys
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from journal_matrix import JournalMatrix
+
+# Файл списка студентов в папке группы
+STUDENTS_FILE = "студенты.xlsx"
+
+
+class Student:
+    """Студент: целочисленный id, части ФИО (интернированные строки) и группа"""
+
+    __slots__ = ("id", "last_name", "first_name", "patronymic", "group_id", "row")
+
+    def __init__(self, student_id: int, last_name: str, first_name: str, patronymic: str, group_id: int, row: int):
+        self.id = student_id
+        self.last_name = last_name
+        self.first_name = first_name
+        self.patronymic = patronymic
+        self.group_id = group_id
+        self.row = row  # номер строки студента в группе (и в матрицах отметок группы)
+
+    @property
+    def fio(self) -> str:
+        return f"{self.last_name} {self.first_name} {self.patronymic}"
+
+    def to_dict(self) -> Dict[str, str]:
+        """Словарь в формате gen_table.py / gen_exrel_fio.py"""
+        return {'фамилия': self.last_name, 'имя': self.first_name, 'отчество': self.patronymic}
+
+    def __repr__(self) -> str:
+        return f"Student({self.id}, {self.fio!r})"
+
+
+class Group:
+    """Группа: имя и id студентов в порядке списка"""
+
+    __slots__ = ("id", "name", "student_ids")
+
+    def __init__(self, group_id: int, name: str):
+        self.id = group_id
+        self.name = name
+        self.student_ids = array('i')
+
+
+class SubjectMarks:
+    """Отметки группы по предмету
+
+    Строки codes идут в порядке студентов группы (Group.student_ids), поэтому
+    соединение предметов — это операции с индексами, без сравнения ФИО.
+    days — порядковые номера дат столбцов (date.toordinal(), 0 — столбец без даты).
+    """
+
+    __slots__ = ("group_id", "subject_id", "days", "codes")
+
+    def __init__(self, group_id: int, subject_id: int, days: np.ndarray, codes: np.ndarray):
+        self.group_id = group_id
+        self.subject_id = subject_id
+        self.days = days
+        self.codes = codes
+
+    def columns_between(self, start_date: datetime, end_date: datetime) -> np.ndarray:
+        """Номера столбцов с датами из диапазона (включительно)"""
+        return np.flatnonzero((self.days >= start_date.toordinal()) & (self.days <= end_date.toordinal()))
+
+
+class CoreModel:
+    """Общая модель данных: студенты, группы, предметы и отметки
+
+    Каждая строка ФИО хранится один раз (sys.intern), студенты — записи со
+    __slots__, отметки — матрицы int8 по (группа, предмет) с теми же кодами,
+    что и в journal_matrix.
+    """
+
+    def __init__(self, subjects: Optional[Sequence[str]] = None):
+        self.students: List[Student] = []
+        self.groups: List[Group] = []
+        self.group_ids: Dict[str, int] = {}
+        self.subjects: List[str] = []
+        self.subject_ids: Dict[str, int] = {}
+        self.marks: Dict[Tuple[int, int], SubjectMarks] = {}
+        self._fio_ids: Dict[int, Dict[str, int]] = {}  # группа -> {ФИО: id}, строится по запросу
+        for subject in subjects or ():
+            self.subject_id(subject)
+
+    # Наполнение модели
+
+    def group(self, name: str) -> Group:
+        """Группа по имени (создается при первом обращении)"""
+        group_id = self.group_ids.get(name)
+        if group_id is None:
+            group_id = len(self.groups)
+            self.groups.append(Group(group_id, sys.intern(name)))
+            self.group_ids[self.groups[group_id].name] = group_id
+        return self.groups[group_id]
+
+    def subject_id(self, subject: str) -> int:
+        subject_id = self.subject_ids.get(subject)
+        if subject_id is None:
+            subject_id = len(self.subjects)
+            self.subjects.append(sys.intern(subject))
+            self.subject_ids[self.subjects[subject_id]] = subject_id
+        return subject_id
+
+    def add_student(self, group_name: str, last_name: str, first_name: str, patronymic: str) -> Student:
+        group = self.group(group_name)
+        student = Student(
+            len(self.students), sys.intern(str(last_name)), sys.intern(str(first_name)),
+            sys.intern(str(patronymic)), group.id, len(group.student_ids),
+        )
+        self.students.append(student)
+        group.student_ids.append(student.id)
+        self._fio_ids.pop(group.id, None)
+        return student
+
+    def add_student_dicts(self, group_name: str, students: Iterable[Dict[str, str]]) -> List[Student]:
+        """Добавляет студентов из словарей {'фамилия', 'имя', 'отчество'}"""
+        return [self.add_student(group_name, s['фамилия'], s['имя'], s['отчество']) for s in students]
+
+    def add_roster_rows(self, group_name: str, rows: Iterable[Sequence]) -> List[Student]:
+        """Добавляет студентов из строк списка (№, Фамилия, Имя, Отчество) без заголовка"""
+        self.group(group_name)
+        return [
+            self.add_student(group_name, row[1], row[2], row[3])
+            for row in rows
+            if row and len(row) > 3 and row[1] and row[2] and row[3]
+        ]
+
+    def add_journal(self, group_name: str, subject: str, matrix: JournalMatrix) -> SubjectMarks:
+        """Добавляет разобранный журнал предмета, выравнивая строки по списку группы
+
+        Студенты, которых нет в журнале, получают пустые строки; строки журнала
+        без студента в списке группы отбрасываются.
+        """
+        group = self.group(group_name)
+        fios = [self.students[student_id].fio for student_id in group.student_ids]
+        days = np.array([cell_date.toordinal() if cell_date else 0 for cell_date in matrix.column_dates], dtype=np.int32)
+        marks = SubjectMarks(group.id, self.subject_id(subject), days, matrix.student_block(fios))
+        self.marks[(group.id, marks.subject_id)] = marks
+        return marks
+
+    # Построение из файлов
+
+    @classmethod
+    def from_group_file(cls, filename: str) -> "CoreModel":
+        """Модель из файла список_групп.xlsx (лист на группу, как в gen_exrel_fio.py)"""
+        from openpyxl import load_workbook
+        model = cls()
+        wb = load_workbook(filename, read_only=True)
+        try:
+            for ws in wb.worksheets:
+                model.add_roster_rows(ws.title, ws.iter_rows(min_row=2, values_only=True))
+        finally:
+            wb.close()
+        return model
+
+    @classmethod
+    def from_journals(cls, journals_path: str, subjects: Optional[Sequence[str]] = None,
+                      load_matrix=None, read_rows=None) -> "CoreModel":
+        """Модель из папки журналов (папка на группу со студенты.xlsx и журналами предметов)
+
+        load_matrix(путь) -> JournalMatrix и read_rows(путь) -> строки списка можно
+        передать из генератора, чтобы использовать его кэши и способ чтения.
+        """
+        from xlsx_journal_reader import read_journal_matrix, read_sheet_rows
+        load_matrix = load_matrix or read_journal_matrix
+        read_rows = read_rows or (lambda path: read_sheet_rows(path, min_row=2))
+
+        model = cls(subjects)
+        for group_name in sorted(os.listdir(journals_path)):
+            group_path = os.path.join(journals_path, group_name)
+            if not os.path.isdir(group_path):
+                continue
+            students_file = os.path.join(group_path, STUDENTS_FILE)
+            model.group(group_name)
+            if os.path.exists(students_file):
+                model.add_roster_rows(group_name, read_rows(students_file))
+
+            group_subjects = subjects or sorted(
+                file[:-5] for file in os.listdir(group_path)
+                if file.endswith('.xlsx') and file != STUDENTS_FILE and not file.startswith('~$')
+            )
+            for subject in group_subjects:
+                subject_file = os.path.join(group_path, f"{subject}.xlsx")
+                if os.path.exists(subject_file):
+                    matrix = load_matrix(subject_file)
+                    if matrix is not None:
+                        model.add_journal(group_name, subject, matrix)
+        return model
+
+    # Запросы
+
+    def find_student(self, group_name: str, fio: str) -> Optional[Student]:
+        group_id = self.group_ids.get(group_name)
+        if group_id is None:
+            return None
+        index = self._fio_ids.get(group_id)
+        if index is None:
+            index = {self.students[student_id].fio: student_id for student_id in self.groups[group_id].student_ids}
+            self._fio_ids[group_id] = index
+        student_id = index.get(fio)
+        return self.students[student_id] if student_id is not None else None
+
+    def group_students(self, group_name: str) -> List[Student]:
+        return [self.students[student_id] for student_id in self.groups[self.group_ids[group_name]].student_ids]
+
+    def subject_marks(self, group_name: str, subject: str) -> Optional[SubjectMarks]:
+        group_id = self.group_ids.get(group_name)
+        subject_id = self.subject_ids.get(subject)
+        if group_id is None or subject_id is None:
+            return None
+        return self.marks.get((group_id, subject_id))
+
+    def group_marks(self, group_name: str, subjects: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+        """{предмет: коды студентов x даты} для группы; строки совпадают со списком группы"""
+        result = {}
+        for subject in subjects or self.subjects:
+            marks = self.subject_marks(group_name, subject)
+            if marks is not None:
+                result[subject] = marks.codes
+        return result
+
+    def student_marks(self, student: Student) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """{предмет: (дни, коды)} для одного студента"""
+        result = {}
+        for (group_id, subject_id), marks in self.marks.items():
+            if group_id == student.group_id:
+                result[self.subjects[subject_id]] = (marks.days, marks.codes[student.row])
+        return result
+
+    # Выгрузка
+
+    def student_dicts(self, group_name: str) -> List[Dict[str, str]]:
+        """Студенты группы словарями {'фамилия', 'имя', 'отчество'} (для gen_table.py)"""
+        return [student.to_dict() for student in self.group_students(group_name)]
+
+    def nbytes(self) -> int:
+        """Примерный объем модели в памяти (объекты студентов, строки и матрицы отметок)"""
+        strings = {id(s): sys.getsizeof(s) for student in self.students for s in (student.last_name, student.first_name, student.patronymic)}
+        size = sum(sys.getsizeof(student) for student in self.students) + sum(strings.values())
+        size += sum(group.student_ids.itemsize * len(group.student_ids) for group in self.groups)
+        size += sum(marks.codes.nbytes + marks.days.nbytes for marks in self.marks.values())
+        return size
+
@@ -1,108 +1,223 @@
-from faker import Faker
-import random
+import sys
+import numpy as np
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.utils import get_column_letter
 from datetime import datetime
 
-# Создаем экземпляр Faker для русского языка
-fake = Faker('ru_RU')
+# Пулы имен составлены заранее; женские формы фамилий и отчеств выводятся из мужских,
+# поэтому фамилия, имя и отчество студента всегда одного пола
+MALE_LAST_NAMES = [
+    "Иванов", "Смирнов", "Кузнецов", "Попов", "Васильев", "Петров", "Соколов", "Михайлов",
+    "Новиков", "Федоров", "Морозов", "Волков", "Алексеев", "Лебедев", "Семенов", "Егоров",
+    "Павлов", "Козлов", "Степанов", "Николаев", "Орлов", "Андреев", "Макаров", "Никитин",
+    "Захаров", "Зайцев", "Соловьев", "Борисов", "Яковлев", "Григорьев", "Романов", "Воробьев",
+    "Сергеев", "Кузьмин", "Фролов", "Александров", "Дмитриев", "Королев", "Гусев", "Киселев",
+    "Ильин", "Максимов", "Поляков", "Сорокин", "Виноградов", "Ковалев", "Белов", "Медведев",
+    "Антонов", "Тарасов", "Жуков", "Баранов", "Филиппов", "Комаров", "Давыдов", "Беляев",
+    "Герасимов", "Богданов", "Осипов", "Сидоров", "Матвеев", "Титов", "Марков", "Миронов",
+    "Крылов", "Куликов", "Карпов", "Власов", "Мельников", "Денисов", "Гаврилов", "Тихонов",
+    "Казаков", "Афанасьев", "Данилов", "Савельев", "Тимофеев", "Фомин", "Чернов", "Абрамов",
+    "Мартынов", "Ефимов", "Федотов", "Щербаков", "Назаров", "Калинин", "Исаев", "Чернышев",
+    "Быков", "Маслов", "Родионов", "Коновалов", "Лазарев", "Воронин", "Климов", "Филатов",
+    "Пономарев", "Голубев", "Кудрявцев", "Прохоров", "Наумов", "Потапов", "Журавлев", "Овчинников",
+    "Трофимов", "Леонов", "Соболев", "Ермаков", "Колесников", "Гончаров", "Емельянов", "Никифоров",
+    "Грачев", "Котов", "Гришин", "Ефремов", "Архипов", "Громов", "Кириллов", "Малышев",
+    "Панов", "Моисеев", "Румянцев", "Акимов", "Кондратьев", "Бирюков", "Горбунов", "Анисимов",
+    "Еремин", "Тихомиров", "Галкин", "Лукьянов", "Михеев", "Скворцов", "Юдин", "Белоусов",
+    "Нестеров", "Симонов", "Прокофьев", "Харитонов", "Князев", "Цветков", "Левин", "Митрофанов",
+    "Воронов", "Аксенов", "Софронов", "Мальцев", "Логинов", "Горшков", "Савин", "Краснов",
+    "Майоров", "Демидов", "Елисеев", "Рыбаков", "Сафонов", "Плотников", "Демин", "Хохлов",
+    "Жданов", "Фадеев", "Молчанов", "Игнатов", "Литвинов", "Ершов", "Ушаков", "Дементьев",
+    "Рябов", "Мухин", "Калашников", "Леонтьев", "Лобанов", "Кузин", "Корнилов", "Евдокимов",
+    "Бородин", "Платонов", "Некрасов", "Балашов", "Бобров", "Зуев", "Блинов", "Сазонов",
+    "Островский", "Покровский", "Вишневский", "Успенский", "Горский", "Высоцкий", "Троицкий", "Раевский",
+    "Толстой", "Донской", "Луговской", "Трубецкой", "Шевченко", "Кравченко", "Бондаренко", "Ткаченко",
+]
+
+MALE_FIRST_NAMES = [
+    "Александр", "Алексей", "Анатолий", "Андрей", "Антон", "Аркадий", "Артем", "Богдан",
+    "Борис", "Вадим", "Валентин", "Валерий", "Василий", "Виктор", "Виталий", "Владимир",
+    "Владислав", "Всеволод", "Вячеслав", "Геннадий", "Георгий", "Глеб", "Григорий", "Даниил",
+    "Денис", "Дмитрий", "Евгений", "Егор", "Иван", "Игорь", "Илья", "Кирилл",
+    "Константин", "Лев", "Леонид", "Макар", "Максим", "Марк", "Матвей", "Михаил",
+    "Никита", "Николай", "Олег", "Павел", "Петр", "Роман", "Руслан", "Савелий",
+    "Семен", "Сергей", "Станислав", "Степан", "Тимофей", "Тимур", "Федор", "Филипп",
+    "Юрий", "Ярослав",
+]
+
+FEMALE_FIRST_NAMES = [
+    "Алена", "Алина", "Алиса", "Алла", "Анастасия", "Ангелина", "Анна", "Арина",
+    "Валентина", "Валерия", "Варвара", "Вера", "Вероника", "Виктория", "Галина", "Дарья",
+    "Диана", "Ева", "Евгения", "Екатерина", "Елена", "Елизавета", "Жанна", "Зоя",
+    "Ирина", "Карина", "Кира", "Кристина", "Ксения", "Лариса", "Лидия", "Любовь",
+    "Людмила", "Маргарита", "Марина", "Мария", "Милана", "Надежда", "Наталья", "Нина",
+    "Оксана", "Олеся", "Ольга", "Полина", "Светлана", "София", "Таисия", "Тамара",
+    "Татьяна", "Ульяна", "Юлия", "Яна",
+]
+
+MALE_PATRONYMICS = [
+    "Александрович", "Алексеевич", "Анатольевич", "Андреевич", "Антонович", "Аркадьевич", "Борисович", "Вадимович",
+    "Валентинович", "Валерьевич", "Васильевич", "Викторович", "Витальевич", "Владимирович", "Владиславович", "Вячеславович",
+    "Геннадьевич", "Георгиевич", "Григорьевич", "Данилович", "Денисович", "Дмитриевич", "Евгеньевич", "Егорович",
+    "Иванович", "Игоревич", "Кириллович", "Константинович", "Леонидович", "Максимович", "Матвеевич", "Михайлович",
+    "Николаевич", "Олегович", "Павлович", "Петрович", "Романович", "Русланович", "Семенович", "Сергеевич",
+    "Станиславович", "Степанович", "Тимофеевич", "Федорович", "Филиппович", "Юрьевич", "Ярославович",
+]
+
+# Доля девушек среди сгенерированных студентов
+FEMALE_SHARE = 0.5
+
+HEADERS = ['№', 'Фамилия', 'Имя', 'Отчество']
+HEADER_FONT = Font(bold=True, color="FFFFFF")
+HEADER_FILL = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="center")
+
+
+def female_last_name(last_name):
+    """Женская форма фамилии (Иванов -> Иванова, Островский -> Островская, Толстой -> Толстая)"""
+    if last_name.endswith(("ский", "цкий")):
+        return last_name[:-2] + "ая"
+    if last_name.endswith("ой"):
+        return last_name[:-2] + "ая"
+    if last_name.endswith(("ов", "ев", "ёв", "ин", "ын")):
+        return last_name + "а"
+    return last_name  # Несклоняемые фамилии (Шевченко)
 
-def generate_person_data():
+
+def female_patronymic(patronymic):
+    """Женская форма отчества (Иванович -> Ивановна)"""
+    return patronymic[:-3] + "вна"
+
+
+# Пулы по полу: 0 — мужской, 1 — женский
+LAST_NAME_POOLS = (
+    np.array(MALE_LAST_NAMES, dtype=object),
+    np.array([female_last_name(name) for name in MALE_LAST_NAMES], dtype=object),
+)
+FIRST_NAME_POOLS = (np.array(MALE_FIRST_NAMES, dtype=object), np.array(FEMALE_FIRST_NAMES, dtype=object))
+PATRONYMIC_POOLS = (
+    np.array(MALE_PATRONYMICS, dtype=object),
+    np.array([female_patronymic(name) for name in MALE_PATRONYMICS], dtype=object),
+)
+
+
+def _pick(pools, is_female, uniform):
+    """Имена из пула своего пола по равномерным числам [0, 1) (пулы разного размера)"""
+    male, female = pools
+    picked = male[(uniform * len(male)).astype(np.int64)]
+    picked[is_female] = female[(uniform[is_female] * len(female)).astype(np.int64)]
+    return picked
+
+
+def generate_names(rng, count, female_share=FEMALE_SHARE):
+    """Фамилии, имена и отчества count студентов одним набором выборок
+
+    Пол выбирается для каждого студента, затем все три части ФИО берутся из
+    пулов этого пола. Возвращает три массива строк (dtype=object).
+    """
+    is_female = rng.random(count) < female_share
+    uniform = rng.random((3, count))
+    return (
+        _pick(LAST_NAME_POOLS, is_female, uniform[0]),
+        _pick(FIRST_NAME_POOLS, is_female, uniform[1]),
+        _pick(PATRONYMIC_POOLS, is_female, uniform[2]),
+    )
+
+
+def generate_person_data(seed=None):
     """Генерирует от 20 до 30 случайных людей с полной информацией"""
+    rng = np.random.default_rng(seed)
     # Случайное количество людей от 20 до 30
-    num_people = random.randint(20, 30)
-    
+    num_people = int(rng.integers(20, 31))
+
     print(f"Генерируем {num_people} людей:")
     print("-" * 60)
-    
+
     people = []
-    for i in range(num_people):
-        # Генерируем полную информацию о человеке
+    for last_name, first_name, middle_name in zip(*generate_names(rng, num_people)):
         person = {
-            'фамилия': fake.last_name_male(),
-            'имя': fake.first_name_male(),
-            'отчество': fake.middle_name_male(),
+            'фамилия': last_name,
+            'имя': first_name,
+            'отчество': middle_name,
         }
         people.append(person)
-        
+
         # Выводим информацию в консоль
         print(f"{person['фамилия']} {person['имя']} {person['отчество']} ")
-    
+
     print("-" * 60)
     print(f"Всего сгенерировано: {len(people)} людей")
-    
+
     return people
 
-def create_excel_file_with_groups(groups_list):
-    """Создает Excel файл с отдельными листами для каждой группы"""
-    # Создаем новую рабочую книгу
-    wb = Workbook()
-    
-    # Удаляем стандартный лист
-    wb.remove(wb.active)
-    
-    # Стили для заголовков
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_alignment = Alignment(horizontal="center", vertical="center")
-    
-    # Заголовки столбцов
-    headers = ['№', 'Фамилия', 'Имя', 'Отчество']
-    
-    for group_name in groups_list:
+
+def make_group_names(prefixes, courses=4, groups_per_course=1):
+    """Названия групп для большого колледжа: ПРЕФИКС-<курс><номер>, например Э-101, Э-102, Э-201"""
+    return [
+        f"{prefix}-{course}{number:02d}"
+        for prefix in prefixes
+        for course in range(1, courses + 1)
+        for number in range(1, groups_per_course + 1)
+    ]
+
+
+def _header_row(ws):
+    row = []
+    for header in HEADERS:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = HEADER_FONT
+        cell.fill = HEADER_FILL
+        cell.alignment = HEADER_ALIGNMENT
+        row.append(cell)
+    return row
+
+
+def create_excel_file_with_groups(groups_list, seed=None, min_students=20, max_students=30, filename=None):
+    """Создает Excel файл с отдельными листами для каждой группы
+
+    Размеры групп и ФИО всех студентов выбираются сразу для всего файла
+    генератором NumPy (одинаковый seed дает одинаковый файл), листы пишутся
+    в режиме write_only без хранения ячеек в памяти.
+    """
+    rng = np.random.default_rng(seed)
+
+    # Создаем новую рабочую книгу (листы пишутся потоково)
+    wb = Workbook(write_only=True)
+
+    # Генерируем студентов для всех групп (от min_students до max_students человек в группе)
+    sizes = rng.integers(min_students, max_students + 1, size=len(groups_list))
+    last_names, first_names, middle_names = generate_names(rng, int(sizes.sum()))
+    bounds = np.concatenate(([0], np.cumsum(sizes)))
+
+    for group_name, start, end in zip(groups_list, bounds[:-1], bounds[1:]):
         # Создаем новый лист для группы
         ws = wb.create_sheet(title=group_name)
-        
-        # Заполняем заголовки
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-        
-        # Генерируем студентов для этой группы (от 20 до 30 человек)
-        num_students = random.randint(20, 30)
-        students = []
-        
-        for i in range(num_students):
-            student = {
-                'номер': i + 1,
-                'фамилия': fake.last_name(),
-                'имя': fake.first_name(),
-                'отчество': fake.middle_name()
-            }
-            students.append(student)
-        
-        # Заполняем данные студентов
-        for row, student in enumerate(students, 2):
-            ws.cell(row=row, column=1, value=student['номер'])
-            ws.cell(row=row, column=2, value=student['фамилия'])
-            ws.cell(row=row, column=3, value=student['имя'])
-            ws.cell(row=row, column=4, value=student['отчество'])
-        
-        # Автоматически подгоняем ширину столбцов
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
+        columns = (last_names[start:end], first_names[start:end], middle_names[start:end])
+        num_students = int(end - start)
+
+        # Ширина столбцов по самому длинному значению (задается до записи строк)
+        lengths = [len(str(num_students))] + [max(map(len, column), default=0) for column in columns]
+        for col, (header, length) in enumerate(zip(HEADERS, lengths), 1):
+            ws.column_dimensions[get_column_letter(col)].width = min(max(length, len(header)) + 2, 50)
+
+        # Заполняем заголовки и данные студентов
+        ws.append(_header_row(ws))
+        for number, row in enumerate(zip(*columns), 1):
+            ws.append((number,) + row)
+
         print(f"Создан лист для группы: {group_name} ({num_students} студентов)")
-    
+
     # Создаем имя файла с текущей датой и временем
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"список_групп_{timestamp}.xlsx"
-    
+    if filename is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"список_групп_{timestamp}.xlsx"
+
     # Сохраняем файл
     wb.save(filename)
     print(f"\nExcel файл сохранен как: {filename}")
-    
+
     return filename
 
 group = [
@@ -125,9 +240,17 @@ group = [
 ]
 
 if __name__ == "__main__":
+    # python gen_exrel_fio.py [зерно] [групп на курс] — второй аргумент строит нагрузочный
+    # список: группы всех префиксов из списка выше на 4 курсах
+    seed = int(sys.argv[1]) if len(sys.argv) > 1 else int(np.random.SeedSequence().entropy % (2 ** 32))
+    if len(sys.argv) > 2:
+        prefixes = sorted({name.split("-")[0] for name in group})
+        group = make_group_names(prefixes, courses=4, groups_per_course=int(sys.argv[2]))
+    print(f"Зерно генератора: {seed}")
+
     # Создаем один Excel файл со всеми группами
-    excel_filename = create_excel_file_with_groups(group)
-    
+    excel_filename = create_excel_file_with_groups(group, seed)
+
     print(f"\nГотово! Создан Excel файл: {excel_filename}")
     print("Файл содержит:")
     print(f"- {len(group)} листов (по одному для каждой группы)")
@@ -1,17 +1,35 @@
 import os
 import random
 from openpyxl import load_workbook, Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.utils import get_column_letter
 from datetime import datetime
-from typing import List, Dict, Tuple, Optional
+from typing import Callable, List, Dict, Tuple, Optional
 import logging
-from difflib import SequenceMatcher
 import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from core_model import STUDENTS_FILE
+from journal_matrix import ABSENCE_CODES, MARK_EMPTY, JournalCache, JournalDiskCache, JournalMatrix, exact_grade
+from student_search import StudentSearchIndex
+from xlsx_journal_reader import READER_EXPAT, READER_OPENPYXL, READERS, iter_sheet_rows, read_journal_matrix, read_sheet_rows
+from journal_store import JournalStore
+from mark_log import MarkLog
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Период аттестации: (месяц, начало, конец); все None — по всем данным
+Period = Tuple[Optional[int], Optional[datetime], Optional[datetime]]
+
+class AssessmentCancelled(Exception):
+    """Создание аттестации отменено через cancel_event"""
+
+
 class MonthlyAssessmentGenerator:
     """Класс для генерации месячной аттестации с оптимизациями"""
     
@@ -22,6 +40,9 @@ class MonthlyAssessmentGenerator:
         "Биология", "География", "Физическая культура",
         "Основы безопасности жизнедеятельности", "Основы профессиональной деятельности"
     ]
+
+    # Месяцы учебного полугодия, для которых строится месячная аттестация
+    MONTH_NAMES = {9: "сентября", 10: "октября", 11: "ноября", 12: "декабря"}
     
     # Стили (создаются один раз)
     HEADER_FONT = Font(bold=True, color="FFFFFF")
@@ -32,11 +53,36 @@ class MonthlyAssessmentGenerator:
     SUBJECT_HEADER_FILL = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
     SUBJECT_HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="center")
 
-    def __init__(self, journals_path: str = "Журналы/1 Курс", result_folder: str = "Итог"):
+    def __init__(self, journals_path: str = "Журналы/1 Курс", result_folder: str = "Итог", cache_folder: Optional[str] = "Кэш", verify_hash: bool = False, reader: str = READER_OPENPYXL,
+                 cache_max_bytes: Optional[int] = 256 * 1024 * 1024, cache_max_entries: Optional[int] = None,
+                 store_path: Optional[str] = None, mark_log_path: Optional[str] = None):
+        if reader not in READERS:
+            raise ValueError(f"Неизвестный способ чтения журналов: {reader}")
         self.journals_path = journals_path
         self.result_folder = result_folder
-        self.workbook_cache = {}  # Кэш для открытых файлов
-        self.student_data_cache = {}  # Кэш данных студентов
+        self.cache_folder = cache_folder
+        self.verify_hash = verify_hash
+        self.reader = reader  # openpyxl или expat (xlsx_journal_reader)
+        self.cache_max_bytes = cache_max_bytes
+        self.cache_max_entries = cache_max_entries
+        # Разобранные журналы и списки студентов в памяти: LRU с проверкой mtime файлов
+        self.matrix_cache = JournalCache(cache_max_entries, cache_max_bytes)
+        self.student_data_cache = JournalCache(cache_max_entries)
+        self._search_index = None  # Индекс поиска студентов
+        # Постоянный кэш разобранных журналов между запусками (None — отключен)
+        self.disk_cache = JournalDiskCache(cache_folder, verify_hash) if cache_folder else None
+        # Журнал отметок на дозапись (None — отключен): отметки накладываются на xlsx при чтении
+        self.mark_log_path = mark_log_path
+        self.mark_log = MarkLog(mark_log_path) if mark_log_path else None
+        self._merged_matrices: Dict[str, Tuple[JournalMatrix, Tuple[int, int], JournalMatrix]] = {}
+        self._store_log_version = None
+        # Хранилище журналов в SQLite (None — итоги считаются по xlsx)
+        self.store_path = store_path
+        self.store = JournalStore(
+            store_path,
+            load_matrix=self.load_journal_matrix,
+            read_rows=lambda path: read_sheet_rows(path, self.reader, min_row=2),
+        ) if store_path else None
         
         # Создаем папку результатов
         os.makedirs(result_folder, exist_ok=True)
@@ -80,31 +126,114 @@ class MonthlyAssessmentGenerator:
         logger.info(f"Найдено групп: {len(groups)}")
         return groups
     
-    def load_workbook_cached(self, file_path: str) -> Optional[Workbook]:
-        """Загружает рабочую книгу с кэшированием"""
-        if file_path in self.workbook_cache:
-            return self.workbook_cache[file_path]
-        
+    def open_workbook(self, file_path: str) -> Optional[Workbook]:
+        """Открывает рабочую книгу в потоковом режиме (read_only); закрывает вызывающий"""
         try:
             if os.path.exists(file_path):
-                wb = load_workbook(file_path, data_only=True)
-                self.workbook_cache[file_path] = wb
-                return wb
+                return load_workbook(file_path, read_only=True, data_only=True)
         except Exception as e:
             logger.error(f"Ошибка при загрузке файла {file_path}: {e}")
         
         return None
     
+    def load_journal_matrix(self, file_path: str) -> Optional[JournalMatrix]:
+        """Загружает журнал предмета вместе с еще не перенесенными отметками из журнала отметок
+
+        Наложенная матрица кэшируется до изменения файла журнала или журнала отметок.
+        """
+        matrix = self.load_journal_snapshot(file_path)
+        if matrix is None or self.mark_log is None:
+            return matrix
+
+        group_name = os.path.basename(os.path.dirname(file_path))
+        subject = os.path.splitext(os.path.basename(file_path))[0]
+        version = self.mark_log.version()
+        cached = self._merged_matrices.get(file_path)
+        if cached and cached[0] is matrix and cached[1] == version:
+            return cached[2]
+
+        marks = self.mark_log.pending(group_name, subject)
+        if not marks:
+            self._merged_matrices.pop(file_path, None)
+            return matrix
+        merged = matrix.with_marks(marks)
+        self._merged_matrices[file_path] = (matrix, version, merged)
+        return merged
+
+    def load_journal_snapshot(self, file_path: str) -> Optional[JournalMatrix]:
+        """Загружает журнал предмета в матрицу отметок с кэшированием (только сохраненный xlsx)
+
+        Файл читается один раз потоково, после разбора книга закрывается —
+        дальше все запросы идут через индексы ФИО -> строка и дата -> столбец.
+        Если файл изменился, запись кэша считается устаревшей и журнал читается заново.
+        """
+        matrix = self.matrix_cache.get(file_path)
+        if matrix is not JournalCache.MISSING:
+            return matrix
+
+        stamp = JournalCache.stamp(file_path)
+        if self.disk_cache:
+            matrix = self.disk_cache.get(file_path)
+            if matrix is not None:
+                self.matrix_cache.put(file_path, matrix, stamp)
+                return matrix
+
+        matrix = None
+        if self.reader == READER_EXPAT:
+            try:
+                if os.path.exists(file_path):
+                    matrix = read_journal_matrix(file_path)
+            except Exception as e:
+                logger.error(f"Ошибка при разборе журнала {file_path}: {e}")
+        else:
+            wb = self.open_workbook(file_path)
+            if wb:
+                try:
+                    matrix = JournalMatrix.from_worksheet(wb.active)
+                except Exception as e:
+                    logger.error(f"Ошибка при разборе журнала {file_path}: {e}")
+                finally:
+                    wb.close()
+
+        if matrix is not None and self.disk_cache:
+            try:
+                self.disk_cache.put(file_path, matrix)
+            except Exception as e:
+                logger.warning(f"Не удалось сохранить кэш журнала {file_path}: {e}")
+
+        self.matrix_cache.put(file_path, matrix, stamp)
+        return matrix
+
     def get_students_from_group(self, group_name: str) -> List[str]:
-        """Получает список студентов группы с кэшированием"""
-        cache_key = f"students_{group_name}"
-        if cache_key in self.student_data_cache:
-            return self.student_data_cache[cache_key]
+        """Получает список студентов группы с кэшированием (до изменения студенты.xlsx)"""
+        if self.store:
+            return self.store.students(group_name)
+        students_file = os.path.join(self.journals_path, group_name, STUDENTS_FILE)
+        students = self.student_data_cache.get(students_file)
+        if students is not JournalCache.MISSING:
+            return students
         
-        students_file = os.path.join(self.journals_path, group_name, "студенты.xlsx")
+        stamp = JournalCache.stamp(students_file)
+        students = self.read_students_file(group_name)
+        self.student_data_cache.put(students_file, students, stamp)
+        return students
+
+    def read_students_file(self, group_name: str) -> List[str]:
+        """Читает список студентов группы из студенты.xlsx (без кэша)"""
+        students_file = os.path.join(self.journals_path, group_name, STUDENTS_FILE)
         students = []
         
-        wb = self.load_workbook_cached(students_file)
+        if self.reader == READER_EXPAT:
+            try:
+                if os.path.exists(students_file):
+                    for row in iter_sheet_rows(students_file, min_row=2):
+                        if row and len(row) > 3 and row[1] and row[2] and row[3]:
+                            students.append(f"{row[1]} {row[2]} {row[3]}")
+            except Exception as e:
+                logger.error(f"Ошибка при чтении студентов группы {group_name}: {e}")
+            return students
+        
+        wb = self.open_workbook(students_file)
         if wb:
             try:
                 ws = wb.active
@@ -114,8 +243,9 @@ class MonthlyAssessmentGenerator:
                         students.append(fio)
             except Exception as e:
                 logger.error(f"Ошибка при чтении студентов группы {group_name}: {e}")
+            finally:
+                wb.close()
         
-        self.student_data_cache[cache_key] = students
         return students
 
     def get_student_grades_from_subject(self, group_name: str, subject: str, student_fio: str, target_month: int = None, start_date: datetime = None, end_date: datetime = None) -> Tuple[List[float], int, int]:
@@ -125,44 +255,30 @@ class MonthlyAssessmentGenerator:
         absences = 0
         lessons_count = 0
         
-        wb = self.load_workbook_cached(subject_file)
-        if not wb:
+        matrix = self.load_journal_matrix(subject_file)
+        if matrix is None:
             return grades, absences, lessons_count
         
         try:
-            ws = wb.active
-            
-            student_row = None
-            for r in range(2, ws.max_row + 1):
-                if ws.cell(row=r, column=1).value == student_fio:
-                    student_row = r
-                    break
-            
-            if student_row:
-                columns_to_process = []
-                if start_date and end_date:
-                    columns_to_process = self._get_date_range_columns(ws, start_date, end_date)
-                elif target_month:
-                    target_dates = self.get_working_days_for_month(2025, target_month)
-                    columns_to_process = self._get_month_columns(ws, target_dates)
-                else:
-                    columns_to_process = list(range(3, ws.max_column + 1))
-
-                if not columns_to_process:
+            student_row = matrix.fio_index.get(student_fio)
+            if student_row is not None:
+                columns_to_process = self._select_matrix_columns(matrix, target_month, start_date, end_date)
+                if columns_to_process is None:
+                    columns_to_process = slice(None)
+                elif not columns_to_process:
                     return grades, absences, lessons_count
+                marks = matrix.codes[student_row, columns_to_process]
+                # Дробные оценки (4.5) берутся точными значениями, как в ячейке
+                values = matrix.grades[student_row, columns_to_process] if matrix.grades is not None else marks
                 
-                for c in columns_to_process:
-                    if c > ws.max_column:
-                        continue
-                        
-                    grade = ws.cell(row=student_row, column=c).value
-                    if grade is None or str(grade).strip() == "":
+                for code, value in zip(marks.tolist(), values.tolist()):
+                    if code == MARK_EMPTY:
                         continue
                     
                     lessons_count += 1
-                    if isinstance(grade, (int, float)) and 2 <= grade <= 5:
-                        grades.append(grade)
-                    elif str(grade).strip().upper() == "Н":
+                    if 2 <= code <= 5:
+                        grades.append(value if exact_grade(value) is not None else code)
+                    elif code in ABSENCE_CODES:
                         absences += 1
                         
         except Exception as e:
@@ -170,154 +286,200 @@ class MonthlyAssessmentGenerator:
         
         return grades, absences, lessons_count
 
-    def _get_month_columns(self, ws, target_dates: List[str]) -> List[int]:
-        """Находит номера столбцов с датами целевого месяца"""
+    def _get_month_columns(self, matrix: JournalMatrix, target_dates: List[str]) -> List[int]:
+        """Находит номера столбцов матрицы с датами целевого месяца"""
         month_columns = []
-        target_dates_set = set(target_dates)
-        
-        for col in range(3, ws.max_column + 1):
-            cell_value = ws.cell(row=1, column=col).value
-            if cell_value and isinstance(cell_value, datetime):
-                date_str = cell_value.strftime("%d.%m.%Y")
-                if date_str in target_dates_set:
-                    month_columns.append(col)
-            elif cell_value and isinstance(cell_value, str):
-                if cell_value.strip() in target_dates_set:
-                    month_columns.append(col)
-        
-        return month_columns
-
-    def _get_date_range_columns(self, ws, start_date: datetime, end_date: datetime) -> List[int]:
-        """Находит номера столбцов, даты которых попадают в указанный диапазон."""
-        date_columns = []
-        for col in range(3, ws.max_column + 1):
-            cell_value = ws.cell(row=1, column=col).value
-            if not cell_value:
-                continue
-            
-            cell_date = None
-            if isinstance(cell_value, datetime):
-                cell_date = cell_value
-            elif isinstance(cell_value, str):
-                try:
-                    date_str = cell_value.split(' ')[0]
-                    cell_date = datetime.strptime(date_str, "%d.%m.%Y")
-                except ValueError:
-                    continue
-            
-            if cell_date and start_date <= cell_date <= end_date:
-                date_columns.append(col)
-        return date_columns
+        for date_str in set(target_dates):
+            month_columns.extend(matrix.date_columns.get(date_str, ()))
+        return sorted(month_columns)
+
+    def _get_date_range_columns(self, matrix: JournalMatrix, start_date: datetime, end_date: datetime) -> List[int]:
+        """Находит номера столбцов матрицы, даты которых попадают в указанный диапазон."""
+        return matrix.range_columns(start_date, end_date)
 
     def _get_month_name(self, month: int) -> str:
         """Возвращает название месяца по номеру"""
-        month_names = {9: "сентября", 10: "октября", 11: "ноября", 12: "декабря"}
-        return month_names.get(month, "неизвестный")
+        return self.MONTH_NAMES.get(month, "неизвестный")
     
+    def sheet_headers(self) -> List[str]:
+        """Заголовки листа группы"""
+        return ["ФИО"] + self.SUBJECTS + ["Пропуски (часы)"]
+
     def apply_header_styles(self, ws, headers: List[str]):
-        """Применяет стили к заголовкам"""
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
+        """Добавляет на лист строку заголовков со стилями (подходит и для write_only)"""
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
             cell.font = self.HEADER_FONT
             cell.fill = self.HEADER_FILL
             cell.alignment = self.HEADER_ALIGNMENT
+            header_cells.append(cell)
+        ws.append(header_cells)
     
-    def auto_adjust_column_width(self, ws):
-        """Автоматически подгоняет ширину столбцов"""
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if cell.value and len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 40)
-            ws.column_dimensions[column_letter].width = adjusted_width
+    @staticmethod
+    def _update_column_widths(widths: List[int], row):
+        """Обновляет счетчики максимальной длины значений по столбцам"""
+        for idx, value in enumerate(row):
+            if value and len(str(value)) > widths[idx]:
+                widths[idx] = len(str(value))
+
+    def apply_column_widths(self, ws, widths: List[int]):
+        """Задает ширину столбцов по собранным счетчикам длины
+
+        В режиме write_only ширины нужно задать до первой записанной строки.
+        """
+        for idx, max_length in enumerate(widths, 1):
+            ws.column_dimensions[get_column_letter(idx)].width = min(max_length + 2, 40)
     
-    def process_group(self, wb: Workbook, group_name: str, target_month: int = None, start_date: datetime = None, end_date: datetime = None) -> int:
-        """Обрабатывает одну группу и возвращает количество студентов"""
-        info_str = ""
+    def _select_matrix_columns(self, matrix: JournalMatrix, target_month: int = None, start_date: datetime = None, end_date: datetime = None) -> Optional[List[int]]:
+        """Возвращает столбцы матрицы для периода (None — все столбцы)"""
+        if start_date and end_date:
+            return self._get_date_range_columns(matrix, start_date, end_date)
         if target_month:
-            info_str = f" за {self._get_month_name(target_month)}"
-        elif start_date and end_date:
-            info_str = f" за период с {start_date.strftime('%d.%m.%Y')} по {end_date.strftime('%d.%m.%Y')}"
+            return self._get_month_columns(matrix, self.get_working_days_for_month(2025, target_month))
+        return None
 
-        logger.info(f"Обрабатываем группу: {group_name}{info_str}")
-        
-        ws = wb.create_sheet(title=group_name)
-        
-        headers = ["ФИО"] + self.SUBJECTS + ["Пропуски (часы)"]
-        self.apply_header_styles(ws, headers)
-        
-        students = self.get_students_from_group(group_name)
-        if not students:
-            logger.warning(f"В группе {group_name} не найдено студентов. Пропускаем.")
-            return 0
+    def _summarize_subject(self, matrix: JournalMatrix, students: List[str], target_month: int = None, start_date: datetime = None, end_date: datetime = None) -> Dict[str, np.ndarray]:
+        """Итоги по предмету за период для списка студентов
+
+        Диапазон дат считается по накопленным суммам, месяц и все данные — по столбцам.
+        """
+        if start_date and end_date:
+            return matrix.summarize_range(students, start_date, end_date)
+        columns = self._select_matrix_columns(matrix, target_month, start_date, end_date)
+        return matrix.summarize_columns(students, columns)
+
+    def get_student_period_stats(self, group_name: str, student_fio: str, start_date: datetime, end_date: datetime) -> Dict[str, Dict]:
+        """Статистика студента по предметам за диапазон дат (без обхода столбцов)
+
+        Для каждого предмета: сумма и число оценок, средний балл, пропуски и занятия.
+        """
+        stats = {}
+        for subject, summary in self._student_summaries(group_name, student_fio, start_date, end_date):
+            # Сумма целая, если в журнале нет дробных оценок
+            grade_sum = summary['grade_sum'][0].item()
+            grade_count = int(summary['grade_count'][0])
+            stats[subject] = {
+                'grade_sum': grade_sum,
+                'grade_count': grade_count,
+                'average': round(grade_sum / grade_count, 0) if grade_count else 0,
+                'absences': int(summary['absences'][0]),
+                'lessons': int(summary['lessons'][0]),
+            }
+        return stats
+
+    def _student_summaries(self, group_name: str, student_fio: str, start_date: datetime, end_date: datetime):
+        """Пары (предмет, итоги студента за диапазон) по журналам группы"""
+        if self.store:
+            students = self.store.students(group_name)
+            row = students.index(student_fio) if student_fio in students else None
+            summaries = self.store.summarize_group(group_name, len(students), start_date=start_date, end_date=end_date)
+            for subject in self.SUBJECTS:
+                if subject in summaries:
+                    summary = summaries[subject]
+                    yield subject, {field: values[row:row + 1] if row is not None else np.zeros(1, dtype=np.int64)
+                                    for field, values in summary.items()}
+            return
 
-        failing_students_count = 0
-        students_with_one_2 = 0
-        students_with_one_3 = 0
-        students_with_one_4 = 0
-        students_with_one_5 = 0
-        students_4_and_5_only = 0
-        total_absences_lessons = 0
-        total_lessons = 0
-
-        for row_idx, student_fio in enumerate(students, 2):
-            ws.cell(row=row_idx, column=1, value=student_fio)
-            
-            total_absences = 0
-            lessons_for_student = 0
-            subject_avgs: List[int] = []
-            
-            for col_idx, subject in enumerate(self.SUBJECTS, 2):
-                grades, subject_absences, subject_lessons = self.get_student_grades_from_subject(
-                    group_name, subject, student_fio, target_month, start_date, end_date
-                )
-                
-                total_absences += subject_absences
-                lessons_for_student += subject_lessons
-                avg_grade = self.calculate_average_grade(grades)
-                ws.cell(row=row_idx, column=col_idx, value=int(avg_grade) if avg_grade else 0)
-                if avg_grade:
-                    subject_avgs.append(int(avg_grade))
-            
-            absences_hours_col = 2 + len(self.SUBJECTS)
-            ws.cell(row=row_idx, column=absences_hours_col, value=total_absences * 2)
-
-            total_absences_lessons += total_absences
-            total_lessons += lessons_for_student
-
-            if subject_avgs:
-                count_2 = sum(1 for g in subject_avgs if g == 2)
-                count_3 = sum(1 for g in subject_avgs if g == 3)
-                count_4 = sum(1 for g in subject_avgs if g == 4)
-                count_5 = sum(1 for g in subject_avgs if g == 5)
-
-                if count_2 > 0:
-                    failing_students_count += 1
-                if count_2 == 1:
-                    students_with_one_2 += 1
-                if count_3 == 1:
-                    students_with_one_3 += 1
-                if count_4 == 1:
-                    students_with_one_4 += 1
-                if count_5 == 1:
-                    students_with_one_5 += 1
-                if count_2 == 0 and count_3 == 0 and (count_4 > 0 or count_5 > 0):
-                    students_4_and_5_only += 1
-        
-        current_last_row = 1 + len(students)
-        metrics_start_row = current_last_row + 2
+        for subject in self.SUBJECTS:
+            subject_file = os.path.join(self.journals_path, group_name, f"{subject}.xlsx")
+            matrix = self.load_journal_matrix(subject_file)
+            if matrix is not None:
+                yield subject, matrix.summarize_range([student_fio], start_date, end_date)
+
+    def compute_group_marks(self, group_name: str, students: List[str], target_month: int = None, start_date: datetime = None, end_date: datetime = None) -> Dict[str, np.ndarray]:
+        """Считает средние баллы, пропуски и число занятий для всей группы сразу
+
+        Возвращает словарь с массивами: 'averages' (студенты x предметы),
+        'absences' и 'lessons' (суммы по всем предметам для каждого студента).
+        """
+        return self.compute_group_marks_for_periods(group_name, students, [(target_month, start_date, end_date)])[0]
+
+    def compute_group_marks_for_periods(self, group_name: str, students: List[str], periods: List[Period]) -> List[Dict[str, np.ndarray]]:
+        """То же, что compute_group_marks, но сразу для нескольких периодов
+
+        Каждый журнал предмета загружается один раз, а его столбцы дат
+        раскладываются по периодам.
+        """
+        results = [
+            {
+                'averages': np.zeros((len(students), len(self.SUBJECTS)), dtype=np.int64),
+                'absences': np.zeros(len(students), dtype=np.int64),
+                'lessons': np.zeros(len(students), dtype=np.int64),
+            }
+            for _ in periods
+        ]
 
-        students_count = len(students)
+        for subject_idx, subject, period_summaries in self._subject_summaries(group_name, students, periods):
+            for summary, marks in zip(period_summaries, results):
+                if summary is None:
+                    continue
+                counts = summary['grade_count']
+                means = np.divide(summary['grade_sum'], counts, out=np.zeros(len(students)), where=counts > 0)
+                marks['averages'][:, subject_idx] = np.round(means, 0).astype(np.int64)
+                marks['absences'] += summary['absences']
+                marks['lessons'] += summary['lessons']
+
+        return results
+
+    def _subject_summaries(self, group_name: str, students: List[str], periods: List[Period]):
+        """Тройки (номер предмета, предмет, итоги по периодам) для предметов с журналом
+
+        С хранилищем итоги считаются SQL-запросом на период, без него — по
+        матрице журнала, загруженной один раз на все периоды. Итог периода,
+        который не удалось посчитать, — None.
+        """
+        if self.store:
+            per_period = []
+            for target_month, start_date, end_date in periods:
+                try:
+                    month_keys = self.get_working_days_for_month(2025, target_month) if target_month else None
+                    per_period.append(self.store.summarize_group(group_name, len(students), month_keys, start_date, end_date))
+                except Exception as e:
+                    logger.error(f"Ошибка при обработке группы {group_name} в хранилище: {e}")
+                    per_period.append({})
+            for subject_idx, subject in enumerate(self.SUBJECTS):
+                if any(subject in summaries for summaries in per_period):
+                    yield subject_idx, subject, [summaries.get(subject) for summaries in per_period]
+            return
+
+        for subject_idx, subject in enumerate(self.SUBJECTS):
+            subject_file = os.path.join(self.journals_path, group_name, f"{subject}.xlsx")
+            matrix = self.load_journal_matrix(subject_file)
+            if matrix is None:
+                continue
+
+            period_summaries = []
+            for period in periods:
+                try:
+                    period_summaries.append(self._summarize_subject(matrix, students, *period))
+                except Exception as e:
+                    logger.error(f"Ошибка при обработке предмета {subject} группы {group_name}: {e}")
+                    period_summaries.append(None)
+            yield subject_idx, subject, period_summaries
+
+    def compute_group_metrics(self, averages: np.ndarray, absences: np.ndarray, lessons: np.ndarray) -> List[Tuple[str, float]]:
+        """Считает итоговые показатели группы по матрице средних баллов"""
+        count_2 = (averages == 2).sum(axis=1)
+        count_3 = (averages == 3).sum(axis=1)
+        count_4 = (averages == 4).sum(axis=1)
+        count_5 = (averages == 5).sum(axis=1)
+
+        failing_students_count = int((count_2 > 0).sum())
+        students_with_one_2 = int((count_2 == 1).sum())
+        students_with_one_3 = int((count_3 == 1).sum())
+        students_with_one_4 = int((count_4 == 1).sum())
+        students_with_one_5 = int((count_5 == 1).sum())
+        students_4_and_5_only = int(((count_2 == 0) & (count_3 == 0) & ((count_4 > 0) | (count_5 > 0))).sum())
+        total_absences_lessons = int(absences.sum())
+        total_lessons = int(lessons.sum())
+
+        students_count = len(averages)
         avg_absences_per_student_hours = (total_absences_lessons * 2) / students_count if students_count > 0 else 0.0
         attendance_percent = 100.0 * (1 - (total_absences_lessons / total_lessons)) if total_lessons > 0 else 0.0
         success_percent = 100.0 * ((students_count - failing_students_count) / students_count) if students_count > 0 else 0.0
 
-        metrics = [
+        return [
             ("Неуспевающих, чел.", failing_students_count),
             ("Студентов с одной '2', чел.", students_with_one_2),
             ("Студентов с одной '3', чел.", students_with_one_3),
@@ -330,35 +492,157 @@ class MonthlyAssessmentGenerator:
             ("Успеваемость, %", round(success_percent, 1)),
         ]
 
-        for idx, (label, value) in enumerate(metrics, start=0):
-            ws.cell(row=metrics_start_row + idx, column=1, value=label)
-            ws.cell(row=metrics_start_row + idx, column=2, value=value)
+    def compute_group(self, group_name: str, target_month: int = None, start_date: datetime = None, end_date: datetime = None) -> Dict:
+        """Считает строки и показатели листа группы, возвращает простые данные
+
+        Результат можно передавать между процессами: {'group', 'rows', 'metrics'},
+        где rows — строки студентов (ФИО, средние по предметам, пропуски в часах).
+        """
+        return self.compute_group_periods(group_name, [(target_month, start_date, end_date)])[0]
+
+    def compute_group_periods(self, group_name: str, periods: List[Period]) -> List[Dict]:
+        """Считает данные листа группы для каждого периода за один проход по журналам"""
+        info_str = ", ".join(filter(None, (self._describe_period(period) for period in periods)))
+        logger.info(f"Обрабатываем группу: {group_name}{' за ' + info_str if info_str else ''}")
+
+        results = [{'group': group_name, 'rows': [], 'metrics': []} for _ in periods]
+        students = self.get_students_from_group(group_name)
+        if not students:
+            logger.warning(f"В группе {group_name} не найдено студентов. Пропускаем.")
+            return results
+
+        headers = self.sheet_headers()
+        for group_data, marks in zip(results, self.compute_group_marks_for_periods(group_name, students, periods)):
+            averages = marks['averages']
+            absences = marks['absences']
+            # Ширины столбцов считаются по ходу формирования строк
+            widths = [0] * len(headers)
+            self._update_column_widths(widths, headers)
+
+            for idx, student_fio in enumerate(students):
+                row = [student_fio] + averages[idx].tolist() + [int(absences[idx]) * 2]
+                self._update_column_widths(widths, row)
+                group_data['rows'].append(row)
+
+            group_data['metrics'] = self.compute_group_metrics(averages, absences, marks['lessons'])
+            for metric in group_data['metrics']:
+                self._update_column_widths(widths, metric)
+            group_data['widths'] = widths
+        return results
+
+    def write_group_sheet(self, wb: Workbook, group_data: Dict) -> int:
+        """Записывает лист группы по данным compute_group и возвращает количество студентов
+
+        Строки добавляются последовательно через append, поэтому лист можно
+        писать и в обычную книгу, и в потоковую (Workbook(write_only=True)).
+        """
+        group_name = group_data['group']
+        rows = group_data['rows']
+
+        ws = wb.create_sheet(title=group_name)
+        if rows:
+            self.apply_column_widths(ws, group_data['widths'])
+
+        self.apply_header_styles(ws, self.sheet_headers())
+        
+        if not rows:
+            return 0
 
-        self.auto_adjust_column_width(ws)
+        for row in rows:
+            ws.append(row)
+
+        ws.append([])
+        for label, value in group_data['metrics']:
+            ws.append([label, value])
         
-        logger.info(f"Лист для группы {group_name} создан ({len(students)} студентов)")
-        return len(students)
+        logger.info(f"Лист для группы {group_name} создан ({len(rows)} студентов)")
+        return len(rows)
+
+    def process_group(self, wb: Workbook, group_name: str, target_month: int = None, start_date: datetime = None, end_date: datetime = None) -> int:
+        """Обрабатывает одну группу и возвращает количество студентов"""
+        group_data = self.compute_group(group_name, target_month, start_date, end_date)
+        return self.write_group_sheet(wb, group_data)
+
+    def compute_groups(self, groups: List[str], periods: List[Period], workers: int = 1):
+        """Считает данные групп для всех периодов (при workers > 1 — в пуле процессов)
+
+        Для каждой группы отдается список данных по периодам, строго в порядке
+        списка groups, независимо от того, какой процесс закончил раньше.
+        """
+        if workers <= 1 or len(groups) <= 1:
+            for group_name in groups:
+                yield self.compute_group_periods(group_name, periods)
+            return
+
+        settings = {
+            'journals_path': self.journals_path,
+            'result_folder': self.result_folder,
+            'cache_folder': self.cache_folder,
+            'verify_hash': self.verify_hash,
+            'reader': self.reader,
+            'cache_max_bytes': self.cache_max_bytes,
+            'cache_max_entries': self.cache_max_entries,
+            'store_path': self.store_path,
+            'mark_log_path': self.mark_log_path,
+        }
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_group_worker, initargs=(settings,)) as executor:
+            futures = [
+                executor.submit(_compute_group_periods_in_worker, group_name, periods)
+                for group_name in groups
+            ]
+            try:
+                for future in futures:
+                    yield future.result()
+            finally:
+                # При отмене или ошибке не ждем еще не начатые группы
+                for future in futures:
+                    future.cancel()
     
+    def sync_store(self) -> int:
+        """Синхронизирует хранилище с папкой журналов (без хранилища ничего не делает)
+
+        Возвращает число перечитанных файлов.
+        """
+        if not self.store:
+            return 0
+        reload = []
+        if self.mark_log is not None:
+            # Журналы с новыми отметками перечитываются в хранилище вместе с ними
+            version = self.mark_log.version()
+            if version != self._store_log_version:
+                reload = self.mark_log.journals()
+                self._store_log_version = version
+        reloaded = self.store.sync(self.journals_path, self.SUBJECTS, reload)
+        if reloaded:
+            logger.info(f"Хранилище журналов обновлено: перечитано файлов {reloaded}")
+        return reloaded
+
     def cleanup_cache(self):
-        """Очищает кэш открытых файлов"""
-        for wb in self.workbook_cache.values():
-            try:
-                wb.close()
-            except:
-                pass
-        self.workbook_cache.clear()
+        """Очищает кэши в памяти (постоянный кэш на диске сохраняется)"""
         self.student_data_cache.clear()
-
-    def find_students_by_name(self, search_name: str) -> List[Tuple[str, str, float]]:
-        """Ищет студентов по ФИО с учетом неточности ввода"""
-        matching_students = []
-        groups = self.get_groups()
-        for group_name in groups:
-            students = self.get_students_from_group(group_name)
-            for student_fio in students:
-                if search_name.lower() in student_fio.lower():
-                    matching_students.append((group_name, student_fio, 1.0))
-        return matching_students
+        self.matrix_cache.clear()
+        self._merged_matrices.clear()
+
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """Статистика кэшей в памяти: записи, объем, попадания, промахи, устаревшие, вытеснения"""
+        return {'journals': self.matrix_cache.stats(), 'students': self.student_data_cache.stats()}
+
+    @property
+    def search_index(self) -> StudentSearchIndex:
+        """Индекс поиска студентов (строится при первом запросе)"""
+        if self._search_index is None:
+            self._search_index = StudentSearchIndex(self.journals_path, self.read_students_file)
+        return self._search_index
+
+    def find_students_by_name(self, search_name: str, limit: Optional[int] = None) -> List[Tuple[str, str, float]]:
+        """Ищет студентов по ФИО с учетом неточности ввода
+
+        Возвращает [(группа, ФИО, схожесть)] по убыванию схожести. По умолчанию
+        возвращает всех подходящих студентов, limit оставляет только лучшие.
+        """
+        if limit is None:
+            return self.search_index.search(search_name, limit=None, max_candidates=None)
+        return self.search_index.search(search_name, limit=limit)
 
     def get_all_student_grades(self, group_name: str, student_fio: str, target_month: int = None, start_date: datetime = None, end_date: datetime = None) -> Dict[str, Dict]:
         """Получает все оценки студента по всем предметам"""
@@ -422,67 +706,114 @@ class MonthlyAssessmentGenerator:
             except ValueError:
                 print("[ОШИБКА] Введите корректный номер.", exc_info=True)
 
-    def create_monthly_assessment(self, month: int = None) -> str:
-        """Создает итоговую таблицу 'Месячная аттестация'"""
+    @staticmethod
+    def _normalize_period(period) -> Period:
+        """Приводит период к виду (месяц, начало, конец)
+
+        None — все данные, число — месяц, пара дат — диапазон.
+        """
+        if period is None:
+            return (None, None, None)
+        if isinstance(period, int):
+            return (period, None, None)
+        start_date, end_date = period
+        return (None, start_date, end_date)
+
+    def _describe_period(self, period: Period) -> str:
+        """Возвращает описание периода для логов"""
+        target_month, start_date, end_date = period
+        if target_month:
+            return self._get_month_name(target_month)
+        if start_date and end_date:
+            return f"период с {start_date.strftime('%d.%m.%Y')} по {end_date.strftime('%d.%m.%Y')}"
+        return ""
+
+    def _assessment_filename(self, period: Period, timestamp: str) -> str:
+        """Возвращает путь к файлу аттестации за период"""
+        target_month, start_date, end_date = period
+        if start_date and end_date:
+            start_str = start_date.strftime("%Y%m%d")
+            end_str = end_date.strftime("%Y%m%d")
+            return os.path.join(self.result_folder, f"Аттестация_с_{start_str}_по_{end_str}_{timestamp}.xlsx")
+        month_name = f"_{self._get_month_name(target_month)}_2025" if target_month else ""
+        return os.path.join(self.result_folder, f"Месячная аттестация{month_name}_{timestamp}.xlsx")
+
+    def create_assessments_for_periods(self, periods: List, workers: int = 1,
+                                       progress: Optional[Callable[[int, int, str], None]] = None,
+                                       cancel_event: Optional[threading.Event] = None) -> List[str]:
+        """Создает аттестации сразу за несколько периодов за одно чтение журналов
+
+        periods — список месяцев (9-12), пар дат (начало, конец) или None
+        (все данные). Возвращает список созданных файлов в порядке periods.
+        progress(обработано, всего, группа) вызывается после каждой группы;
+        если установлен cancel_event, сборка прерывается с AssessmentCancelled.
+        """
         try:
+            self.sync_store()
             groups = self.get_groups()
             if not groups:
-                return ""
-            
-            wb = Workbook()
-            wb.remove(wb.active)
-            
-            month_name = f"_{self._get_month_name(month)}_2025" if month else ""
-            logger.info(f"Создаем аттестацию{month_name.replace('_', ' ')}...")
-            
+                return []
+
+            periods = [self._normalize_period(period) for period in periods]
+            for period in periods:
+                info_str = self._describe_period(period)
+                logger.info(f"Создаем аттестацию{' за ' + info_str if info_str else ''}...")
+
+            # Потоковые книги: строки уходят во временные файлы по мере записи
+            workbooks = [Workbook(write_only=True) for _ in periods]
+
             total_students = 0
-            for group_name in groups:
-                total_students += self.process_group(wb, group_name, target_month=month)
-            
+            for done, group_periods in enumerate(self.compute_groups(groups, periods, workers), 1):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise AssessmentCancelled()
+                for wb, group_data in zip(workbooks, group_periods):
+                    total_students += self.write_group_sheet(wb, group_data)
+                if progress:
+                    progress(done, len(groups), group_periods[0]['group'])
+
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = os.path.join(self.result_folder, f"Месячная аттестация{month_name}_{timestamp}.xlsx")
-            wb.save(filename)
-            
-            logger.info(f"Файл сохранен: {filename}")
-            return filename
-            
+            filenames = []
+            for wb, period in zip(workbooks, periods):
+                filename = self._assessment_filename(period, timestamp)
+                wb.save(filename)
+                logger.info(f"Файл сохранен: {filename}")
+                filenames.append(filename)
+            return filenames
+
+        except AssessmentCancelled:
+            logger.info("Создание аттестации отменено")
+            raise
         except Exception as e:
             logger.error(f"Критическая ошибка при создании аттестации: {e}")
-            return ""
-        finally:
-            self.cleanup_cache()
+            return []
 
-    def create_assessment_for_date_range(self, start_date: datetime, end_date: datetime) -> str:
-        """Создает аттестацию за указанный диапазон дат."""
-        try:
-            groups = self.get_groups()
-            if not groups:
-                return ""
+    def create_monthly_assessment(self, month: int = None, workers: int = 1) -> str:
+        """Создает итоговую таблицу 'Месячная аттестация'
 
-            wb = Workbook()
-            wb.remove(wb.active)
+        workers > 1 — группы считаются параллельно в пуле процессов.
+        """
+        filenames = self.create_assessments_for_periods([month], workers)
+        return filenames[0] if filenames else ""
 
-            logger.info(f"Создаем аттестацию за период с {start_date.strftime('%d.%m.%Y')} по {end_date.strftime('%d.%m.%Y')}...")
+    def create_assessment_for_date_range(self, start_date: datetime, end_date: datetime, workers: int = 1) -> str:
+        """Создает аттестацию за указанный диапазон дат.
 
-            total_students = 0
-            for group_name in groups:
-                total_students += self.process_group(wb, group_name, start_date=start_date, end_date=end_date)
+        workers > 1 — группы считаются параллельно в пуле процессов.
+        """
+        filenames = self.create_assessments_for_periods([(start_date, end_date)], workers)
+        return filenames[0] if filenames else ""
 
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            start_str = start_date.strftime("%Y%m%d")
-            end_str = end_date.strftime("%Y%m%d")
-            filename = os.path.join(self.result_folder, f"Аттестация_с_{start_str}_по_{end_str}_{timestamp}.xlsx")
-            
-            wb.save(filename)
-            
-            logger.info(f"Файл сохранен: {filename}")
-            return filename
+# Генератор процесса-исполнителя (создается один раз на процесс пула)
+_worker_generator: Optional[MonthlyAssessmentGenerator] = None
 
-        except Exception as e:
-            logger.error(f"Критическая ошибка при создании аттестации по датам: {e}")
-            return ""
-        finally:
-            self.cleanup_cache()
+def _init_group_worker(settings: Dict):
+    """Инициализирует генератор в процессе пула"""
+    global _worker_generator
+    _worker_generator = MonthlyAssessmentGenerator(**settings)
+
+def _compute_group_periods_in_worker(group_name: str, periods: List[Period]) -> List[Dict]:
+    """Считает данные одной группы по всем периодам в процессе пула"""
+    return _worker_generator.compute_group_periods(group_name, periods)
 
 def main():
     """Основная функция для запуска CLI"""
@@ -530,8 +861,7 @@ def main():
             
             elif choice == "4":
                 print("\n[СОЗДАНИЕ] Аттестаций за все месяцы...")
-                for month in [9, 10, 11, 12]:
-                    generator.create_monthly_assessment(month)
+                generator.create_assessments_for_periods([9, 10, 11, 12])
                 print("[УСПЕХ] Все месячные аттестации созданы.")
 
             elif choice == "5":
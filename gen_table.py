@@ -16,27 +16,24 @@ predmety_1_kurs = [
 ]
 
 
+import io
 import os
-from openpyxl import load_workbook, Workbook
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import quoteattr
+from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment
 
+from core_model import CoreModel
+
+# Временное имя листа в шаблоне журнала, заменяется названием предмета при копировании
+TEMPLATE_SHEET_TITLE = "ШАБЛОН_ПРЕДМЕТА"
+WORKBOOK_PART = "xl/workbook.xml"
+
 def read_students_from_group_file(filename):
     """Читает студентов из файла список_групп.xlsx и возвращает словарь: {группа: [список студентов]}"""
-    wb = load_workbook(filename)
-    group_students = {}
-    for sheet in wb.sheetnames:
-        ws = wb[sheet]
-        students = []
-        for row in ws.iter_rows(min_row=2, values_only=True):
-            # row: (№, Фамилия, Имя, Отчество)
-            if row[1] and row[2] and row[3]:
-                students.append({
-                    'фамилия': row[1],
-                    'имя': row[2],
-                    'отчество': row[3]
-                })
-        group_students[sheet] = students
-    return group_students
+    model = CoreModel.from_group_file(filename)
+    return {group.name: model.student_dicts(group.name) for group in model.groups}
 
 def save_students_list(students, folder_path):
     """Сохраняет список студентов в Excel файл"""
@@ -71,32 +68,73 @@ def save_students_list(students, folder_path):
     filename = os.path.join(folder_path, "студенты.xlsx")
     wb.save(filename)
 
+def render_predmet_template(students):
+    """Книга журнала предмета с ФИО студентов (xlsx в байтах) с временным именем листа"""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = TEMPLATE_SHEET_TITLE
+    ws.cell(row=1, column=1, value="ФИО")
+    ws.cell(row=1, column=1).font = Font(bold=True, color="FFFFFF")
+    ws.cell(row=1, column=1).fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    ws.cell(row=1, column=1).alignment = Alignment(horizontal="center", vertical="center")
+    for idx, student in enumerate(students, 1):
+        fio = f"{student['фамилия']} {student['имя']} {student['отчество']}"
+        ws.cell(row=idx+1, column=1, value=fio)
+    ws.column_dimensions['A'].width = 40
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+def clone_workbook(parts, sheet_title, filename):
+    """Сохраняет копию шаблона (части zip по порядку), меняя в xl/workbook.xml только имя листа"""
+    placeholder = f"name={quoteattr(TEMPLATE_SHEET_TITLE)}".encode('utf-8')
+    title = f"name={quoteattr(sheet_title)}".encode('utf-8')
+    with zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED) as zout:
+        for name, data in parts:
+            if name == WORKBOOK_PART:
+                data = data.replace(placeholder, title, 1)
+            zout.writestr(name, data)
+
 def save_predmet_files(students, folder_path, predmety):
-    """Создаёт по одному файлу на каждый предмет с ФИО студентов"""
+    """Создаёт по одному файлу на каждый предмет с ФИО студентов
+
+    Книга строится openpyxl один раз, файлы предметов — ее копии на уровне
+    zip, различающиеся только именем листа.
+    """
+    with zipfile.ZipFile(io.BytesIO(render_predmet_template(students))) as template:
+        parts = [(info.filename, template.read(info)) for info in template.infolist()]
     for predmet in predmety:
-        wb = Workbook()
-        ws = wb.active
-        ws.title = predmet
-        ws.cell(row=1, column=1, value="ФИО")
-        ws.cell(row=1, column=1).font = Font(bold=True, color="FFFFFF")
-        ws.cell(row=1, column=1).fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        ws.cell(row=1, column=1).alignment = Alignment(horizontal="center", vertical="center")
-        for idx, student in enumerate(students, 1):
-            fio = f"{student['фамилия']} {student['имя']} {student['отчество']}"
-            ws.cell(row=idx+1, column=1, value=fio)
-        ws.column_dimensions['A'].width = 40
         filename = os.path.join(folder_path, f"{predmet}.xlsx")
-        wb.save(filename)
+        clone_workbook(parts, predmet, filename)
+
+def create_group_folder(group_name, students, base_path, predmety):
+    """Создаёт папку группы со списком студентов и файлами по предметам"""
+    folder_path = os.path.join(base_path, group_name)
+    os.makedirs(folder_path, exist_ok=True)
+    save_students_list(students, folder_path)
+    save_predmet_files(students, folder_path, predmety)
+    return group_name
+
+def _create_group_folder_task(task):
+    return create_group_folder(*task)
+
+def generate_group_folders_with_files_from_group_file(group_file, predmety, workers=1):
+    """Генерирует папки для каждой группы с нужными файлами, используя список студентов из файлa список_групп.xlsx
 
-def generate_group_folders_with_files_from_group_file(group_file, predmety):
-    """Генерирует папки для каждой группы с нужными файлами, используя список студентов из файлa список_групп.xlsx"""
+    Группы независимы, при workers > 1 создаются параллельно в пуле процессов.
+    """
     group_students = read_students_from_group_file(group_file)
-    for group_name, students in group_students.items():
-        folder_path = os.path.join(os.getcwd(), group_name)
-        os.makedirs(folder_path, exist_ok=True)
-        save_students_list(students, folder_path)
-        save_predmet_files(students, folder_path, predmety)
-        print(f"Папка '{group_name}' создана. Список студентов и файлы по предметам сохранены.")
+    base_path = os.getcwd()
+    tasks = [(group_name, students, base_path, predmety) for group_name, students in group_students.items()]
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            created = executor.map(_create_group_folder_task, tasks)
+            for group_name in created:
+                print(f"Папка '{group_name}' создана. Список студентов и файлы по предметам сохранены.")
+    else:
+        for task in tasks:
+            group_name = create_group_folder(*task)
+            print(f"Папка '{group_name}' создана. Список студентов и файлы по предметам сохранены.")
 
 # Пример использования:
 # Укажите путь к вашему файлу, например: "список_групп_20240610_153000.xlsx"
@@ -108,6 +146,6 @@ if __name__ == "__main__":
     os.makedirs(base_folder, exist_ok=True)
     # Меняем рабочую директорию на "Журналы/1 Курс", чтобы группы создавались там
     os.chdir(base_folder)
-    generate_group_folders_with_files_from_group_file(group_file, predmety_1_kurs)
+    generate_group_folders_with_files_from_group_file(group_file, predmety_1_kurs, workers=os.cpu_count() or 1)
     print("Генерация завершена!")
 
@@ -1,10 +1,44 @@
+import json
 import os
-import random
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
+import numpy as np
 from openpyxl import load_workbook
 from datetime import datetime, timedelta
 from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.utils import get_column_letter
 import re
 
+from journal_matrix import MARK_ABSENT
+from xlsx_journal_reader import read_header_row
+
+# Манифест заголовков журналов: известные даты файла по его mtime и размеру
+HEADER_MANIFEST_FILE = ".заголовки_журналов.json"
+
+# Вероятность пропуска "Н" на занятии
+ABSENCE_PROBABILITY = 0.15
+
+# Распределение профилей студентов по типу оценок
+# only_5: только 5
+# only_4_5: только 4 и 5
+# no_4_5: только 2 и 3 (без 4 и 5)
+# mixed: любые 2-5
+PROB_ONLY_5 = 0.15
+PROB_ONLY_4_5 = 0.35
+PROB_NO_4_5 = 0.20
+# Остальное идёт на смешанный профиль
+PROFILE_ONLY_5, PROFILE_ONLY_4_5, PROFILE_NO_4_5, PROFILE_MIXED = range(4)
+
+# Стили создаются один раз и общие для всех ячеек
+DATE_HEADER_FONT = Font(bold=True, color="FFFFFF")
+DATE_HEADER_FILL = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+DATE_HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="center")
+ABSENCE_FILL = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
+ABSENCE_FONT = Font(bold=True, color="9C0006")
+ABSENCE_ALIGNMENT = Alignment(horizontal="center", vertical="center")
+
 def get_working_days_september_2025():
     """Возвращает список рабочих дней (пн-пт) сентября 2025 года"""
     working_days = []
@@ -157,21 +191,205 @@ def get_new_dates_needed(existing_dates, target_dates):
     Returns:
         list: список дат, которые нужно добавить
     """
-    new_dates = []
-    for target_date in target_dates:
-        if target_date not in existing_dates:
-            new_dates.append(target_date)
-    
-    return new_dates
+    existing = set(existing_dates)
+    return [target_date for target_date in target_dates if target_date not in existing]
+
+def header_dates(headers):
+    """Даты из строки заголовков подряд со столбца B (как get_existing_dates для листа)"""
+    dates = []
+    for value in headers[1:]:
+        if not is_date_string(value):
+            break
+        dates.append(value.strftime("%d.%m.%Y") if isinstance(value, datetime) else str(value).strip())
+    return dates
+
+def file_signature(file_path):
+    """Признак неизмененного файла для манифеста: mtime в наносекундах и размер"""
+    st = os.stat(file_path)
+    return [st.st_mtime_ns, st.st_size]
+
+def load_header_manifest(manifest_path):
+    """Манифест заголовков {группа/файл: {signature, fio, dates}} (пустой, если файла нет или он поврежден)"""
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        return manifest if isinstance(manifest, dict) else {}
+    except (OSError, ValueError):
+        return {}
 
-def add_dates_and_grades_to_excel_files_in_folders(base_folder, months_to_process=None):
+def save_header_manifest(manifest_path, manifest):
+    """Сохраняет манифест заголовков атомарно через временный файл"""
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, manifest_path)
+
+def synthesize_grades(rng, students_count, dates_count, absence_probability=ABSENCE_PROBABILITY,
+                      prob_only_5=PROB_ONLY_5, prob_only_4_5=PROB_ONLY_4_5, prob_no_4_5=PROB_NO_4_5):
+    """Случайные отметки для блока студенты x даты одним набором выборок
+
+    Каждому студенту выбирается профиль (только 5, 4-5, 2-3 или любые 2-5),
+    затем на каждую дату — пропуск с вероятностью absence_probability или
+    оценка по профилю. Возвращает int8: MARK_ABSENT для "Н", иначе оценку 2-5.
+    """
+    thresholds = np.cumsum([prob_only_5, prob_only_4_5, prob_no_4_5])
+    profiles = np.searchsorted(thresholds, rng.random(students_count), side='right')[:, None]
+
+    shape = (students_count, dates_count)
+    coin = rng.random(shape) < 0.5
+    grades = np.select(
+        [profiles == PROFILE_ONLY_5, profiles == PROFILE_ONLY_4_5, profiles == PROFILE_NO_4_5],
+        [5, np.where(coin, 5, 4), np.where(coin, 3, 2)],
+        rng.integers(2, 6, size=shape),
+    )
+    absent = rng.random(shape) < absence_probability
+    return np.where(absent, MARK_ABSENT, grades).astype(np.int8)
+
+def write_grade_block(ws, first_col, new_dates, codes):
+    """Записывает заголовки дат и блок отметок (строки листа со 2-й) построчно с общими стилями"""
+    for i, date in enumerate(new_dates):
+        cell = ws.cell(row=1, column=first_col + i, value=date)
+        cell.font = DATE_HEADER_FONT
+        cell.fill = DATE_HEADER_FILL
+        cell.alignment = DATE_HEADER_ALIGNMENT
+
+    if not len(codes):
+        return
+    # Стиль "Н" регистрируется в книге один раз, остальным ячейкам копируется его набор индексов
+    absence_style = None
+    rows = ws.iter_rows(min_row=2, max_row=len(codes) + 1, min_col=first_col, max_col=first_col + len(new_dates) - 1)
+    for cells, row_codes in zip(rows, codes.tolist()):
+        for cell, code in zip(cells, row_codes):
+            if code == MARK_ABSENT:
+                cell.value = "Н"
+                if absence_style is None:
+                    cell.font = ABSENCE_FONT
+                    cell.fill = ABSENCE_FILL
+                    cell.alignment = ABSENCE_ALIGNMENT
+                    absence_style = cell._style
+                else:
+                    cell._style = copy(absence_style)
+            else:
+                cell.value = code
+
+def fit_column_widths(ws):
+    """Подгоняет ширину столбцов по самому длинному значению (не больше 15)"""
+    for idx, column in enumerate(ws.iter_cols(values_only=True), 1):
+        max_length = max((len(str(value)) for value in column), default=0)
+        ws.column_dimensions[get_column_letter(idx)].width = min(max_length + 2, 15)
+
+def file_seed(seed, group_folder, file):
+    """Зерно файла: общее зерно и crc32 пути группа/файл (не зависит от порядка обработки)"""
+    return [seed, zlib.crc32(f"{group_folder}/{file}".encode('utf-8'))]
+
+def update_journal_file(file_path, working_days, seed):
+    """Добавляет в журнал предмета недостающие даты и случайные отметки
+
+    Выполняется целиком в одном процессе и ничего не печатает. Сначала из zip
+    читается только строка заголовков: если столбца ФИО нет или все даты уже
+    есть, книга не загружается. Возвращает сводку по файлу: статус ('updated',
+    'complete', 'no_fio', 'error'), даты заголовка, число добавленных дат,
+    заполненных строк, признак файла для манифеста и текст ошибки.
+    """
+    summary = {
+        'file': file_path, 'status': 'no_fio', 'existing_dates': 0, 'dates': [], 'dates_added': 0, 'rows': 0,
+        'signature': None, 'error': None,
+    }
+    try:
+        headers = read_header_row(file_path)
+        
+        # Проверяем, есть ли столбец "ФИО"
+        if "ФИО" not in headers:
+            summary['signature'] = file_signature(file_path)
+            return summary
+        
+        # Определяем, какие даты нужно добавить
+        existing_dates = header_dates(headers)
+        new_dates = get_new_dates_needed(existing_dates, working_days)
+        summary.update(existing_dates=len(existing_dates), dates=existing_dates)
+        if not new_dates:
+            summary.update(status='complete', signature=file_signature(file_path))
+            return summary
+        
+        wb = load_workbook(file_path)
+        ws = wb.active
+        
+        # Новые даты идут сразу за последним столбцом с датой (или за столбцом A с ФИО)
+        last_col = 1 + len(existing_dates)
+        
+        # Оценки/пропуски с учётом профилей студентов для всех строк и новых дат сразу
+        rows_count = ws.max_row - 1
+        codes = synthesize_grades(np.random.default_rng(seed), rows_count, len(new_dates))
+        write_grade_block(ws, last_col + 1, new_dates, codes)
+        
+        # Автоматически подгоняем ширину столбцов
+        fit_column_widths(ws)
+        
+        wb.save(file_path)
+        summary.update(status='updated', dates=existing_dates + new_dates, dates_added=len(new_dates),
+                       rows=rows_count, signature=file_signature(file_path))
+    except Exception as e:
+        summary.update(status='error', error=str(e))
+    return summary
+
+def manifest_summary(file_path, entry, working_days):
+    """Сводка по файлу из манифеста, если файл не менялся и добавлять в него нечего, иначе None"""
+    try:
+        if not entry or entry['signature'] != file_signature(file_path):
+            return None
+        if entry['fio'] and get_new_dates_needed(entry['dates'], working_days):
+            return None
+        return {
+            'file': file_path, 'status': 'complete' if entry['fio'] else 'no_fio',
+            'existing_dates': len(entry['dates']), 'dates': entry['dates'], 'dates_added': 0, 'rows': 0,
+            'signature': entry['signature'], 'error': None,
+        }
+    except (OSError, KeyError, TypeError):
+        return None
+
+def _update_journal_file_task(task):
+    return update_journal_file(*task)
+
+def print_update_report(summaries):
+    """Сводный отчет по обработанным файлам (в порядке групп и предметов)"""
+    for summary in summaries:
+        group_folder = os.path.basename(os.path.dirname(summary['file']))
+        file = os.path.basename(summary['file'])
+        if summary['status'] == 'error':
+            print(f"Ошибка при обработке файла {summary['file']}: {summary['error']}")
+        elif summary['status'] == 'complete':
+            print(f"  Все даты уже присутствуют в файле '{file}' ({group_folder})")
+        elif summary['status'] == 'updated':
+            existing = f", было дат: {summary['existing_dates']}" if summary['existing_dates'] else ""
+            print(f"Файл '{file}' в папке '{group_folder}' обновлен: добавлено дат {summary['dates_added']}, строк {summary['rows']}{existing}")
+
+    counts = {status: sum(1 for s in summaries if s['status'] == status) for status in ('updated', 'complete', 'no_fio', 'error')}
+    print("-" * 60)
+    print(f"Файлов: {len(summaries)}, обновлено: {counts['updated']}, без новых дат: {counts['complete']}, "
+          f"без столбца ФИО: {counts['no_fio']}, ошибок: {counts['error']}")
+    print(f"Добавлено столбцов дат: {sum(s['dates_added'] for s in summaries)}, "
+          f"заполнено ячеек: {sum(s['dates_added'] * s['rows'] for s in summaries)}")
+
+def add_dates_and_grades_to_excel_files_in_folders(base_folder, months_to_process=None, seed=None, workers=1,
+                                                   manifest_path=None):
     """
     В каждой папке внутри base_folder ищет файлы Excel (xlsx), где есть ФИО студентов,
     и добавляет столбцы с датами указанных месяцев 2025 (только рабочие дни) и случайными оценками.
     
+    Отметки всего блока студенты x новые даты выбираются сразу генератором NumPy.
+    Зерно каждого файла выводится из seed и пути файла, поэтому при одинаковом
+    seed результат повторяется и не зависит от порядка и числа процессов.
+    
     Args:
         base_folder: путь к папке с группами
         months_to_process: список месяцев для обработки (например, [9, 10, 11, 12] для сентября-декабря)
+        seed: зерно генератора случайных чисел (None — случайное)
+        workers: число процессов (файлы независимы и обрабатываются параллельно)
+        manifest_path: файл манифеста заголовков (None — без манифеста); файлы,
+            не изменившиеся с прошлого запуска и уже содержащие все даты, не открываются
+    
+    Returns:
+        list: сводки по файлам (update_journal_file) в порядке групп и предметов
     """
     if months_to_process is None:
         months_to_process = [9, 10, 11, 12]  # По умолчанию обрабатываем сентябрь-декабрь
@@ -186,122 +404,44 @@ def add_dates_and_grades_to_excel_files_in_folders(base_folder, months_to_proces
         print(f"Добавляем {len(month_days)} рабочих дней {month_names[month]} 2025")
     
     working_days = all_working_days
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % (2 ** 32))
+    
+    manifest = load_header_manifest(manifest_path) if manifest_path else {}
     
-    # Стили для заголовков дат
-    date_header_font = Font(bold=True, color="FFFFFF")
-    date_header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    date_header_alignment = Alignment(horizontal="center", vertical="center")
-    
-    # Вероятность пропуска и стили для отметки "Н"
-    absence_probability = 0.15  # 15% вероятность пропуска
-    absence_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-    absence_font = Font(bold=True, color="9C0006")
-    
-    # Распределение профилей студентов по типу оценок
-    # only_5: только 5
-    # only_4_5: только 4 и 5
-    # no_4_5: только 2 и 3 (без 4 и 5)
-    # mixed: любые 2-5
-    prob_only_5 = 0.15
-    prob_only_4_5 = 0.35
-    prob_no_4_5 = 0.20
-    # Остальное идёт на смешанный профиль
-    
-    for group_folder in os.listdir(base_folder):
+    summaries = []
+    tasks = []
+    for group_folder in sorted(os.listdir(base_folder)):
         group_path = os.path.join(base_folder, group_folder)
         if os.path.isdir(group_path):
-            for file in os.listdir(group_path):
+            for file in sorted(os.listdir(group_path)):
                 if file.endswith('.xlsx') and file != 'студенты.xlsx':  # Пропускаем файл со списком студентов
                     file_path = os.path.join(group_path, file)
-                    try:
-                        wb = load_workbook(file_path)
-                        ws = wb.active
-                        
-                        # Проверяем, есть ли столбец "ФИО"
-                        headers = [cell.value for cell in ws[1]]
-                        if "ФИО" in headers:
-                            # Проверяем, есть ли уже даты в файле
-                            existing_dates = []
-                            if has_existing_dates(ws):
-                                existing_dates = get_existing_dates(ws)
-                                print(f"  Найдены существующие даты: {len(existing_dates)}")
-                                print(f"  Первая дата: {existing_dates[0] if existing_dates else 'Нет'}")
-                                print(f"  Последняя дата: {existing_dates[-1] if existing_dates else 'Нет'}")
-                            
-                            # Определяем, какие даты нужно добавить
-                            new_dates = get_new_dates_needed(existing_dates, working_days)
-                            
-                            if not new_dates:
-                                print(f"  Все даты уже присутствуют в файле '{file}'")
-                                continue
-                            
-                            print(f"  Добавляем {len(new_dates)} новых дат в файл '{file}'")
-                            
-                            # Находим последний столбец с датой
-                            if existing_dates:
-                                last_date_col = get_last_date_column(ws)
-                                last_col = last_date_col
-                            else:
-                                last_col = 1  # Столбец A (ФИО)
-                            
-                            # Добавляем заголовки новых дат
-                            for i, date in enumerate(new_dates):
-                                col = last_col + 1 + i
-                                cell = ws.cell(row=1, column=col, value=date)
-                                cell.font = date_header_font
-                                cell.fill = date_header_fill
-                                cell.alignment = date_header_alignment
-                            
-                            # Добавляем оценки/пропуски с учётом профилей студентов
-                            for row in range(2, ws.max_row + 1):
-                                r = random.random()
-                                if r < prob_only_5:
-                                    profile = "only_5"
-                                elif r < prob_only_5 + prob_only_4_5:
-                                    profile = "only_4_5"
-                                elif r < prob_only_5 + prob_only_4_5 + prob_no_4_5:
-                                    profile = "no_4_5"
-                                else:
-                                    profile = "mixed"
-
-                                # Добавляем оценки только для новых дат
-                                for i, date in enumerate(new_dates):
-                                    col = last_col + 1 + i
-                                    # Случайный пропуск "Н" с заданной вероятностью, иначе оценка по профилю
-                                    if random.random() < absence_probability:
-                                        cell = ws.cell(row=row, column=col, value="Н")
-                                        cell.font = absence_font
-                                        cell.fill = absence_fill
-                                        cell.alignment = Alignment(horizontal="center", vertical="center")
-                                    else:
-                                        if profile == "only_5":
-                                            grade = 5
-                                        elif profile == "only_4_5":
-                                            grade = 5 if random.random() < 0.5 else 4
-                                        elif profile == "no_4_5":
-                                            grade = 3 if random.random() < 0.5 else 2
-                                        else:
-                                            grade = random.randint(2, 5)
-                                        ws.cell(row=row, column=col, value=grade)
-                            
-                            # Автоматически подгоняем ширину столбцов
-                            for column in ws.columns:
-                                max_length = 0
-                                column_letter = column[0].column_letter
-                                for cell in column:
-                                    try:
-                                        if len(str(cell.value)) > max_length:
-                                            max_length = len(str(cell.value))
-                                    except:
-                                        pass
-                                adjusted_width = min(max_length + 2, 15)
-                                ws.column_dimensions[column_letter].width = adjusted_width
-                            
-                            wb.save(file_path)
-                            print(f"Файл '{file}' в папке '{group_folder}' обновлен.")
-                            
-                    except Exception as e:
-                        print(f"Ошибка при обработке файла {file_path}: {e}")
+                    summaries.append(manifest_summary(file_path, manifest.get(f"{group_folder}/{file}"), working_days))
+                    if summaries[-1] is None:
+                        tasks.append((len(summaries) - 1, (file_path, working_days, file_seed(seed, group_folder, file))))
+    
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(_update_journal_file_task, [task for _, task in tasks],
+                                   chunksize=max(1, len(tasks) // (workers * 4)))
+            for (index, _), summary in zip(tasks, results):
+                summaries[index] = summary
+    else:
+        for index, task in tasks:
+            summaries[index] = update_journal_file(*task)
+    
+    if manifest_path:
+        for summary in summaries:
+            key = f"{os.path.basename(os.path.dirname(summary['file']))}/{os.path.basename(summary['file'])}"
+            if summary['signature'] is None:
+                manifest.pop(key, None)
+            else:
+                manifest[key] = {'signature': summary['signature'], 'fio': summary['status'] != 'no_fio', 'dates': summary['dates']}
+        save_header_manifest(manifest_path, manifest)
+    
+    print_update_report(summaries)
+    return summaries
 
 def show_working_days_for_months(months_to_show):
     """Показывает рабочие дни для указанных месяцев"""
@@ -332,10 +472,16 @@ if __name__ == "__main__":
     print(f"\nОбщее количество рабочих дней: {total_days}")
     print("-" * 60)
     
+    # Зерно и число процессов можно передать аргументами: python gen_table_grade.py [зерно] [процессов]
+    seed = int(sys.argv[1]) if len(sys.argv) > 1 else int(np.random.SeedSequence().entropy % (2 ** 32))
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    print(f"Зерно генератора: {seed}, процессов: {workers}")
+    
     # Запрашиваем подтверждение у пользователя
     response = input("Продолжить генерацию оценок? (y/n): ").strip().lower()
     if response in ['y', 'yes', 'да', 'д']:
-        add_dates_and_grades_to_excel_files_in_folders(base_folder, months_to_process)
+        add_dates_and_grades_to_excel_files_in_folders(base_folder, months_to_process, seed, workers,
+                                                       os.path.join(base_folder, HEADER_MANIFEST_FILE))
         print("\nГотово! Даты и оценки добавлены во все файлы по предметам.")
     else:
         print("Генерация отменена.")
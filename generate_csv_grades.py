@@ -1,7 +1,22 @@
 import os
 import csv
+import json
+import numpy as np
 from openpyxl import load_workbook
-from datetime import datetime
+from datetime import date, datetime
+
+from core_model import STUDENTS_FILE, CoreModel
+from journal_matrix import MARK_ABSENT, JournalDiskCache, JournalMatrix
+from journal_store import JournalStore
+from xlsx_journal_reader import READER_EXPAT, READER_OPENPYXL, iter_sheet_rows, read_journal_matrix, read_sheet_rows
+
+# pyarrow не обязателен: без него колоночная выгрузка пишется в формате NumPy
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
 
 def get_all_subjects():
     """Возвращает список всех предметов"""
@@ -22,18 +37,22 @@ def get_all_subjects():
         "Основы профессиональной деятельности"
     ]
 
-def read_students_from_group(group_path):
+def read_students_from_group(group_path, reader=READER_OPENPYXL):
     """Читает список студентов из файла студенты.xlsx"""
-    students_file = os.path.join(group_path, "студенты.xlsx")
+    students_file = os.path.join(group_path, STUDENTS_FILE)
     students = []
     
     if os.path.exists(students_file):
         try:
-            wb = load_workbook(students_file)
-            ws = wb.active
+            if reader == READER_EXPAT:
+                rows = iter_sheet_rows(students_file, min_row=2)
+            else:
+                wb = load_workbook(students_file, read_only=True)
+                rows = list(wb.active.iter_rows(min_row=2, values_only=True))
+                wb.close()
             
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                if row[1] and row[2] and row[3]:  # Фамилия, Имя, Отчество
+            for row in rows:
+                if len(row) > 3 and row[1] and row[2] and row[3]:  # Фамилия, Имя, Отчество
                     fio = f"{row[1]} {row[2]} {row[3]}"
                     students.append(fio)
         except Exception as e:
@@ -41,238 +60,420 @@ def read_students_from_group(group_path):
     
     return students
 
-def get_student_grades(student_fio, group_path, subjects):
-    """Получает все оценки студента по всем предметам"""
-    student_data = {"ФИО": student_fio}
-    
+def load_subject_matrix(subject_file, disk_cache=None, reader=READER_OPENPYXL):
+    """Загружает журнал предмета в матрицу отметок (один потоковый проход по файлу)"""
+    if not os.path.exists(subject_file):
+        return None
+
+    if disk_cache:
+        matrix = disk_cache.get(subject_file)
+        if matrix is not None:
+            return matrix
+
+    if reader == READER_EXPAT:
+        matrix = read_journal_matrix(subject_file)
+    else:
+        wb = load_workbook(subject_file, read_only=True, data_only=True)
+        try:
+            matrix = JournalMatrix.from_worksheet(wb.active)
+        finally:
+            wb.close()
+
+    if disk_cache:
+        try:
+            disk_cache.put(subject_file, matrix)
+        except Exception as e:
+            print(f"Не удалось сохранить кэш журнала {subject_file}: {e}")
+    return matrix
+
+def read_group_journals(group_path, subjects, disk_cache=None, reader=READER_OPENPYXL):
+    """Загружает каждый журнал группы один раз и возвращает {предмет: JournalMatrix}"""
+    journals = {}
     for subject in subjects:
         subject_file = os.path.join(group_path, f"{subject}.xlsx")
-        
-        if os.path.exists(subject_file):
-            try:
-                wb = load_workbook(subject_file)
-                ws = wb.active
-                
-                # Находим строку студента
-                student_row = None
-                for r in range(2, ws.max_row + 1):
-                    if ws.cell(row=r, column=1).value == student_fio:
-                        student_row = r
-                        break
-                
-                if student_row:
-                    # Собираем все оценки студента
-                    grades = []
-                    absences = 0
-                    
-                    for c in range(3, ws.max_column + 1):  # Начинаем с 3-го столбца
-                        cell_value = ws.cell(row=student_row, column=c).value
-                        
-                        if cell_value and isinstance(cell_value, (int, float)) and 2 <= cell_value <= 5:
-                            grades.append(int(cell_value))
-                        elif str(cell_value).strip() == "Н":
-                            absences += 1
-                    
-                    # Добавляем данные по предмету
-                    student_data[f"{subject}_оценки"] = ";".join(map(str, grades)) if grades else ""
-                    student_data[f"{subject}_пропуски"] = absences
-                    student_data[f"{subject}_средний_балл"] = round(sum(grades) / len(grades), 2) if grades else 0
-                else:
-                    # Студент не найден в журнале по предмету
-                    student_data[f"{subject}_оценки"] = ""
-                    student_data[f"{subject}_пропуски"] = 0
-                    student_data[f"{subject}_средний_балл"] = 0
-                    
-            except Exception as e:
-                print(f"Ошибка при обработке предмета {subject} для студента {student_fio}: {e}")
-                student_data[f"{subject}_оценки"] = ""
-                student_data[f"{subject}_пропуски"] = 0
-                student_data[f"{subject}_средний_балл"] = 0
-        else:
-            # Файл предмета не найден
-            student_data[f"{subject}_оценки"] = ""
-            student_data[f"{subject}_пропуски"] = 0
-            student_data[f"{subject}_средний_балл"] = 0
-    
+        try:
+            matrix = load_subject_matrix(subject_file, disk_cache, reader)
+            if matrix is not None:
+                journals[subject] = matrix
+        except Exception as e:
+            print(f"Ошибка при обработке предмета {subject} в группе {group_path}: {e}")
+    return journals
+
+def read_group_marks(group_path, students, subjects, disk_cache=None, reader=READER_OPENPYXL):
+    """Загружает каждый журнал группы один раз
+
+    Возвращает словарь {предмет: коды отметок студентов x даты}; для отсутствующих
+    журналов и студентов, которых нет в журнале, строки остаются пустыми.
+    """
+    journals = read_group_journals(group_path, subjects, disk_cache, reader)
+    return {subject: matrix.student_block(students) for subject, matrix in journals.items()}
+
+def read_group_model(group_path, subjects, disk_cache=None, reader=READER_OPENPYXL):
+    """Загружает список и журналы группы в общую модель данных (core_model.CoreModel)
+
+    Каждый журнал читается один раз; строки матриц отметок модели идут в
+    порядке списка группы, студенты без строки в журнале получают пустые строки.
+    """
+    group_name = os.path.basename(group_path)
+    model = CoreModel(subjects)
+    model.group(group_name)
+    students_file = os.path.join(group_path, STUDENTS_FILE)
+    if os.path.exists(students_file):
+        try:
+            model.add_roster_rows(group_name, read_sheet_rows(students_file, reader, min_row=2))
+        except Exception as e:
+            print(f"Ошибка при чтении файла студентов: {e}")
+    for subject, matrix in read_group_journals(group_path, subjects, disk_cache, reader).items():
+        model.add_journal(group_name, subject, matrix)
+    return model
+
+def student_subject_marks(group_marks, subject, student_idx):
+    """Возвращает оценки (в порядке дат) и количество пропусков студента по предмету"""
+    block = group_marks.get(subject)
+    if block is None:
+        return [], 0
+    row = block[student_idx]
+    grades = row[(row >= 2) & (row <= 5)].tolist()
+    absences = int((row == MARK_ABSENT).sum())
+    return grades, absences
+
+def build_detailed_row(student_fio, student_idx, group_marks, subjects):
+    """Строка полного CSV: оценки, пропуски и средний балл по каждому предмету"""
+    student_data = {"ФИО": student_fio}
+    for subject in subjects:
+        grades, absences = student_subject_marks(group_marks, subject, student_idx)
+        student_data[f"{subject}_оценки"] = ";".join(map(str, grades)) if grades else ""
+        student_data[f"{subject}_пропуски"] = absences
+        student_data[f"{subject}_средний_балл"] = round(sum(grades) / len(grades), 2) if grades else 0
     return student_data
 
-def generate_csv_with_grades():
-    """Создает CSV файл с ФИО студентов и всеми их оценками"""
-    
-    # Создаем папку "Итог" если её нет
-    result_folder = "Итог"
-    os.makedirs(result_folder, exist_ok=True)
-    
-    # Путь к папке с журналами
-    journals_path = "Журналы/1 Курс"
-    
-    if not os.path.exists(journals_path):
-        print(f"Папка {journals_path} не найдена!")
-        return
-    
-    # Получаем список всех групп
+def build_simple_row(student_fio, student_idx, group_marks, subjects):
+    """Строка упрощенного CSV: средние баллы по предметам и общие итоги"""
+    student_data = {"ФИО": student_fio}
+    all_grades = []
+    total_absences = 0
+    for subject in subjects:
+        grades, absences = student_subject_marks(group_marks, subject, student_idx)
+        student_data[subject] = round(sum(grades) / len(grades), 2) if grades else 0
+        all_grades.extend(grades)
+        total_absences += absences
+
+    student_data["Общий_средний_балл"] = round(sum(all_grades) / len(all_grades), 2) if all_grades else 0
+    student_data["Общее_количество_пропусков"] = total_absences
+    return student_data
+
+def get_student_grades(student_fio, group_path, subjects):
+    """Получает все оценки студента по всем предметам"""
+    group_marks = read_group_marks(group_path, [student_fio], subjects)
+    return build_detailed_row(student_fio, 0, group_marks, subjects)
+
+def get_groups(journals_path):
+    """Возвращает список групп (папок) в папке журналов"""
     groups = []
     for item in os.listdir(journals_path):
         if os.path.isdir(os.path.join(journals_path, item)):
             groups.append(item)
+    return groups
+
+def generate_csv_reports(detailed=True, simple=True, journals_path="Журналы/1 Курс", result_folder="Итог", cache_folder="Кэш", reader=READER_OPENPYXL,
+                         store_path=None):
+    """Создает полный и/или упрощенный CSV за один проход по журналам
+
+    Каждый журнал предмета читается один раз на группу (или берется из
+    постоянного кэша), строки всех студентов формируются из памяти.
+    С store_path отметки берутся из хранилища SQLite (journal_store) после
+    синхронизации с папкой журналов.
+    Возвращает список созданных файлов: сначала полный, затем упрощенный.
+    """
+    os.makedirs(result_folder, exist_ok=True)
+    
+    if not os.path.exists(journals_path):
+        print(f"Папка {journals_path} не найдена!")
+        return []
     
+    groups = get_groups(journals_path)
     print(f"Найдено групп: {len(groups)}")
     
-    # Получаем список предметов
     subjects = get_all_subjects()
-    
-    # Подготавливаем заголовки CSV
-    headers = ["Группа", "ФИО"]
-    for subject in subjects:
-        headers.extend([
-            f"{subject}_оценки",
-            f"{subject}_пропуски", 
-            f"{subject}_средний_балл"
-        ])
-    
-    # Создаем CSV файл
+    disk_cache = JournalDiskCache(cache_folder) if cache_folder else None
+    store = None
+    if store_path:
+        store = JournalStore(
+            store_path,
+            load_matrix=lambda path: load_subject_matrix(path, disk_cache, reader),
+            read_rows=lambda path: read_sheet_rows(path, reader, min_row=2),
+        )
+        store.sync(journals_path, subjects)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    csv_filename = os.path.join(result_folder, f"Оценки_студентов_{timestamp}.csv")
     
-    with open(csv_filename, 'w', newline='', encoding='utf-8-sig') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=headers)
-        writer.writeheader()
+    # Заголовки и файлы для выбранных вариантов CSV
+    outputs = []
+    if detailed:
+        headers = ["Группа", "ФИО"]
+        for subject in subjects:
+            headers.extend([
+                f"{subject}_оценки",
+                f"{subject}_пропуски", 
+                f"{subject}_средний_балл"
+            ])
+        outputs.append((os.path.join(result_folder, f"Оценки_студентов_{timestamp}.csv"), headers, build_detailed_row))
+    if simple:
+        headers = ["Группа", "ФИО"] + subjects + ["Общий_средний_балл", "Общее_количество_пропусков"]
+        outputs.append((os.path.join(result_folder, f"Средние_баллы_{timestamp}.csv"), headers, build_simple_row))
+    
+    files = [open(csv_filename, 'w', newline='', encoding='utf-8-sig') for csv_filename, _, _ in outputs]
+    try:
+        writers = []
+        for csvfile, (_, headers, build_row) in zip(files, outputs):
+            writer = csv.DictWriter(csvfile, fieldnames=headers)
+            writer.writeheader()
+            writers.append((writer, build_row))
         
         # Обрабатываем каждую группу
         for group_name in groups:
             print(f"Обрабатываем группу: {group_name}")
             group_path = os.path.join(journals_path, group_name)
             
-            # Читаем студентов группы
-            students = read_students_from_group(group_path)
+            if store:
+                students = store.students(group_name)
+                group_marks = store.group_marks(group_name, subjects)
+            else:
+                model = read_group_model(group_path, subjects, disk_cache, reader)
+                students = [student.fio for student in model.group_students(group_name)]
+                group_marks = model.group_marks(group_name, subjects)
             
-            # Получаем данные по каждому студенту
-            for student_fio in students:
-                student_data = get_student_grades(student_fio, group_path, subjects)
-                student_data["Группа"] = group_name
-                
-                # Записываем данные студента в CSV
-                writer.writerow(student_data)
+            for student_idx, student_fio in enumerate(students):
+                for writer, build_row in writers:
+                    student_data = build_row(student_fio, student_idx, group_marks, subjects)
+                    student_data["Группа"] = group_name
+                    writer.writerow(student_data)
+    finally:
+        for csvfile in files:
+            csvfile.close()
+        if store:
+            store.close()
     
-    print(f"\nCSV файл создан: {csv_filename}")
+    for csv_filename, _, _ in outputs:
+        print(f"\nCSV файл создан: {csv_filename}")
     print("Готово!")
     
-    return csv_filename
+    return [csv_filename for csv_filename, _, _ in outputs]
+
+def generate_csv_with_grades():
+    """Создает CSV файл с ФИО студентов и всеми их оценками"""
+    files = generate_csv_reports(detailed=True, simple=False)
+    return files[0] if files else None
 
 def generate_simple_csv_with_grades():
     """Создает упрощенный CSV файл с ФИО и средними баллами по предметам"""
-    
-    # Создаем папку "Итог" если её нет
-    result_folder = "Итог"
+    files = generate_csv_reports(detailed=False, simple=True)
+    return files[0] if files else None
+
+# Колонки длинной выгрузки: одна строка на (группа, студент, предмет, дата, отметка)
+LONG_EXPORT_COLUMNS = ["группа", "фио", "предмет", "дата", "оценка", "пропуск"]
+
+# Номер дня 01.01.1970 — даты хранятся как число дней от этой даты (date32)
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+def build_long_batch(group_name, model):
+    """Собирает колонки длинной выгрузки для одной группы модели (read_group_model)
+
+    В выгрузку попадают оценки 2-5 и пропуски "Н" в столбцах с датой
+    (у пропуска оценка 0 и флаг "пропуск"). Возвращает словарь numpy-массивов и списков строк одинаковой длины.
+    """
+    students = [student.fio for student in model.group_students(group_name)]
+    group_col, fio_col, subject_col = [], [], []
+    days_parts, mark_parts, absent_parts = [], [], []
+
+    for subject, block in model.group_marks(group_name).items():
+        marks = model.subject_marks(group_name, subject)
+        days = np.where(marks.days > 0, marks.days - EPOCH_ORDINAL, -1).astype(np.int32)
+        keep = (((block >= 2) & (block <= 5)) | (block == MARK_ABSENT)) & (days >= 0)
+        student_idx, column_idx = np.nonzero(keep)
+        if not len(student_idx):
+            continue
+
+        codes = block[student_idx, column_idx]
+        absent = codes == MARK_ABSENT
+        fio_col.extend(students[i] for i in student_idx.tolist())
+        group_col.extend([group_name] * len(student_idx))
+        subject_col.extend([subject] * len(student_idx))
+        days_parts.append(days[column_idx])
+        mark_parts.append(np.where(absent, 0, codes))
+        absent_parts.append(absent)
+
+    def concat(parts, dtype):
+        return np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype=dtype)
+
+    return {
+        "группа": group_col,
+        "фио": fio_col,
+        "предмет": subject_col,
+        "дата": concat(days_parts, np.int32),
+        "оценка": concat(mark_parts, np.int8),
+        "пропуск": concat(absent_parts, np.bool_),
+    }
+
+class NumpyLongWriter:
+    """Запасной потоковый формат без pyarrow: папка с колонками в бинарных файлах
+
+    Строковые колонки кодируются номерами в словаре, числовые дописываются
+    пачками как есть. В manifest.json хранятся типы, длина и словари, поэтому
+    колонки можно открыть через np.memmap (см. load_numpy_long_export).
+    """
+
+    STRING_COLUMNS = ("группа", "фио", "предмет")
+    DTYPES = {"группа": "int32", "фио": "int32", "предмет": "int32", "дата": "int32", "оценка": "int8", "пропуск": "bool"}
+
+    def __init__(self, folder):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self.rows = 0
+        self.dictionaries = {name: {} for name in self.STRING_COLUMNS}
+        self.files = {name: open(os.path.join(folder, f"{name}.bin"), 'wb') for name in LONG_EXPORT_COLUMNS}
+
+    def write_batch(self, batch):
+        for name in LONG_EXPORT_COLUMNS:
+            values = batch[name]
+            if name in self.STRING_COLUMNS:
+                dictionary = self.dictionaries[name]
+                values = [dictionary.setdefault(value, len(dictionary)) for value in values]
+            np.asarray(values, dtype=self.DTYPES[name]).tofile(self.files[name])
+        self.rows += len(batch["дата"])
+
+    def abort(self):
+        """Закрывает файлы колонок без manifest.json — незавершенная выгрузка не откроется"""
+        for f in self.files.values():
+            f.close()
+
+    def close(self):
+        self.abort()
+        manifest = {
+            "rows": self.rows,
+            "columns": {name: self.DTYPES[name] for name in LONG_EXPORT_COLUMNS},
+            "dictionaries": {name: list(dictionary) for name, dictionary in self.dictionaries.items()},
+            "date_epoch": "1970-01-01",
+        }
+        with open(os.path.join(self.folder, "manifest.json"), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+
+def load_numpy_long_export(folder):
+    """Открывает запасную выгрузку через np.memmap (без чтения в память)
+
+    Возвращает (колонки, словари строк).
+    """
+    with open(os.path.join(folder, "manifest.json"), encoding='utf-8') as f:
+        manifest = json.load(f)
+    columns = {}
+    for name, dtype in manifest["columns"].items():
+        path = os.path.join(folder, f"{name}.bin")
+        if manifest["rows"]:
+            columns[name] = np.memmap(path, dtype=dtype, mode='r', shape=(manifest["rows"],))
+        else:
+            columns[name] = np.zeros(0, dtype=dtype)
+    return columns, manifest["dictionaries"]
+
+def arrow_long_schema():
+    """Схема длинной выгрузки для Parquet/Arrow"""
+    return pa.schema([
+        ("группа", pa.string()),
+        ("фио", pa.string()),
+        ("предмет", pa.string()),
+        ("дата", pa.date32()),
+        ("оценка", pa.int8()),
+        ("пропуск", pa.bool_()),
+    ])
+
+def generate_long_format_export(fmt="parquet", journals_path="Журналы/1 Курс", result_folder="Итог", cache_folder="Кэш", reader=READER_OPENPYXL):
+    """Создает колоночную выгрузку всех оценок в длинном формате
+
+    fmt: "parquet" или "arrow" (Arrow IPC). Без установленного pyarrow
+    выгрузка пишется в папку в формате NumPy (NumpyLongWriter).
+    Данные пишутся пачками — по одной на группу.
+    """
     os.makedirs(result_folder, exist_ok=True)
     
-    # Путь к папке с журналами
-    journals_path = "Журналы/1 Курс"
-    
     if not os.path.exists(journals_path):
         print(f"Папка {journals_path} не найдена!")
-        return
-    
-    # Получаем список всех групп
-    groups = []
-    for item in os.listdir(journals_path):
-        if os.path.isdir(os.path.join(journals_path, item)):
-            groups.append(item)
+        return None
     
+    groups = get_groups(journals_path)
     print(f"Найдено групп: {len(groups)}")
     
-    # Получаем список предметов
     subjects = get_all_subjects()
-    
-    # Подготавливаем заголовки CSV
-    headers = ["Группа", "ФИО"] + subjects + ["Общий_средний_балл", "Общее_количество_пропусков"]
-    
-    # Создаем CSV файл
+    disk_cache = JournalDiskCache(cache_folder) if cache_folder else None
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    csv_filename = os.path.join(result_folder, f"Средние_баллы_{timestamp}.csv")
     
-    with open(csv_filename, 'w', newline='', encoding='utf-8-sig') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=headers)
-        writer.writeheader()
-        
-        # Обрабатываем каждую группу
+    if pa is None:
+        print("pyarrow не установлен, выгрузка будет сохранена в формате NumPy")
+        output_path = os.path.join(result_folder, f"Оценки_длинный_формат_{timestamp}")
+        writer = NumpyLongWriter(output_path)
+        write_batch = writer.write_batch
+    else:
+        schema = arrow_long_schema()
+        if fmt == "arrow":
+            output_path = os.path.join(result_folder, f"Оценки_длинный_формат_{timestamp}.arrow")
+            writer = pa.ipc.new_file(output_path, schema)
+        else:
+            output_path = os.path.join(result_folder, f"Оценки_длинный_формат_{timestamp}.parquet")
+            writer = pq.ParquetWriter(output_path, schema)
+
+        def write_batch(batch):
+            arrays = [
+                pa.array(batch["группа"], type=pa.string()),
+                pa.array(batch["фио"], type=pa.string()),
+                pa.array(batch["предмет"], type=pa.string()),
+                pa.array(batch["дата"], type=pa.int32()).cast(pa.date32()),
+                pa.array(batch["оценка"], type=pa.int8()),
+                pa.array(batch["пропуск"], type=pa.bool_()),
+            ]
+            record_batch = pa.RecordBatch.from_arrays(arrays, schema=schema)
+            if fmt == "arrow":
+                writer.write_batch(record_batch)
+            else:
+                writer.write_table(pa.Table.from_batches([record_batch]))
+    
+    total_rows = 0
+    try:
         for group_name in groups:
             print(f"Обрабатываем группу: {group_name}")
             group_path = os.path.join(journals_path, group_name)
             
-            # Читаем студентов группы
-            students = read_students_from_group(group_path)
-            
-            # Получаем данные по каждому студенту
-            for student_fio in students:
-                student_data = {"Группа": group_name, "ФИО": student_fio}
-                
-                all_grades = []
-                total_absences = 0
-                
-                for subject in subjects:
-                    subject_file = os.path.join(group_path, f"{subject}.xlsx")
-                    avg_grade = 0
-                    absences = 0
-                    
-                    if os.path.exists(subject_file):
-                        try:
-                            wb = load_workbook(subject_file)
-                            ws = wb.active
-                            
-                            # Находим строку студента
-                            student_row = None
-                            for r in range(2, ws.max_row + 1):
-                                if ws.cell(row=r, column=1).value == student_fio:
-                                    student_row = r
-                                    break
-                            
-                            if student_row:
-                                # Собираем оценки и пропуски
-                                grades = []
-                                for c in range(3, ws.max_column + 1):
-                                    cell_value = ws.cell(row=student_row, column=c).value
-                                    
-                                    if cell_value and isinstance(cell_value, (int, float)) and 2 <= cell_value <= 5:
-                                        grades.append(int(cell_value))
-                                    elif str(cell_value).strip() == "Н":
-                                        absences += 1
-                                
-                                if grades:
-                                    avg_grade = round(sum(grades) / len(grades), 2)
-                                    all_grades.extend(grades)
-                                
-                                total_absences += absences
-                                
-                        except Exception as e:
-                            print(f"Ошибка при обработке предмета {subject} для студента {student_fio}: {e}")
-                    
-                    student_data[subject] = avg_grade
-                
-                # Вычисляем общий средний балл
-                overall_avg = round(sum(all_grades) / len(all_grades), 2) if all_grades else 0
-                student_data["Общий_средний_балл"] = overall_avg
-                student_data["Общее_количество_пропусков"] = total_absences
-                
-                # Записываем данные студента в CSV
-                writer.writerow(student_data)
+            model = read_group_model(group_path, subjects, disk_cache, reader)
+            batch = build_long_batch(group_name, model)
+            if len(batch["дата"]):
+                write_batch(batch)
+                total_rows += len(batch["дата"])
+    except BaseException:
+        if pa is None:
+            writer.abort()
+        else:
+            writer.close()
+        raise
+    writer.close()
     
-    print(f"\nУпрощенный CSV файл создан: {csv_filename}")
+    print(f"\nКолоночная выгрузка создана: {output_path} ({total_rows} строк)")
     print("Готово!")
     
-    return csv_filename
+    return output_path
 
 if __name__ == "__main__":
     print("Выберите тип CSV файла:")
     print("1. Полный файл с детальными оценками")
     print("2. Упрощенный файл со средними баллами")
+    print("3. Оба файла за один проход")
+    print("4. Колоночная выгрузка всех оценок (Parquet/Arrow)")
     
-    choice = input("Введите номер (1 или 2): ").strip()
+    choice = input("Введите номер (1, 2, 3 или 4): ").strip()
     
     if choice == "1":
         generate_csv_with_grades()
     elif choice == "2":
         generate_simple_csv_with_grades()
+    elif choice == "3":
+        generate_csv_reports(detailed=True, simple=True)
+    elif choice == "4":
+        generate_long_format_export()
     else:
         print("Неверный выбор. Создаем упрощенный файл...")
         generate_simple_csv_with_grades()
@@ -0,0 +1,512 @@
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+from collections import OrderedDict
+from datetime import datetime, time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Коды отметок в матрице журнала (int8)
+MARK_EMPTY = 0    # пустая ячейка
+MARK_ABSENT = 1   # пропуск "Н"
+# 2..5 — оценки
+MARK_OTHER = 6    # непустая ячейка без оценки (занятие засчитывается)
+MARK_ABSENT_LOWER = 7  # пропуск строчной "н": в итогах аттестации — пропуск, в CSV-выгрузке не считается
+
+# Коды, которые итоги аттестации считают пропуском
+ABSENCE_CODES = (MARK_ABSENT, MARK_ABSENT_LOWER)
+
+# Даты в журналах читаются начиная с 3-го столбца (A — ФИО)
+FIRST_DATE_COLUMN = 3
+
+# Примерный расход памяти на ключ ФИО, заголовок или строку списка (для бюджета кэша)
+ENTRY_OVERHEAD = 120
+
+
+def encode_mark(value: Any) -> int:
+    """Переводит значение ячейки журнала в код отметки
+
+    Дробная оценка (например 4.5) получает код своей целой части; точное
+    значение для средних баллов хранится отдельно (см. exact_grade).
+    """
+    if value is None:
+        return MARK_EMPTY
+    if isinstance(value, (int, float)) and 2 <= value <= 5:
+        return int(value)
+    text = str(value).strip()
+    if text == "":
+        return MARK_EMPTY
+    if text == "Н":
+        return MARK_ABSENT
+    if text.upper() == "Н":
+        return MARK_ABSENT_LOWER
+    return MARK_OTHER
+
+
+def exact_grade(value: Any) -> Optional[float]:
+    """Дробная оценка 2..5 из ячейки или None, если значение не дробная оценка"""
+    if isinstance(value, float) and 2 <= value <= 5 and not value.is_integer():
+        return value
+    return None
+
+
+def grade_matrix(codes: np.ndarray) -> np.ndarray:
+    """Значения оценок по кодам отметок (float64, 0 — не оценка)"""
+    return np.where((codes >= 2) & (codes <= 5), codes, 0).astype(np.float64)
+
+
+class JournalMatrix:
+    """Разобранный журнал предмета: индексы ФИО и дат, матрица отметок"""
+
+    __slots__ = ("fio_index", "headers", "leading_headers", "date_columns", "column_dates", "codes", "grades", "_range_index")
+
+    def __init__(self, fio_index: Dict[Any, int], headers: List[Any], codes: np.ndarray,
+                 leading_headers: Optional[List[Any]] = None, grades: Optional[np.ndarray] = None):
+        self.fio_index = fio_index  # ФИО -> номер строки матрицы
+        self.headers = headers      # заголовки столбцов начиная с FIRST_DATE_COLUMN
+        self.codes = codes          # студенты x даты, коды отметок
+        # Точные значения оценок (float64) — только если в журнале есть дробные оценки, иначе оценка равна коду
+        self.grades = grades
+        # Заголовки столбцов между ФИО и FIRST_DATE_COLUMN: они не читаются, но их даты заняты
+        self.leading_headers = leading_headers or []
+
+        # Дата "ДД.ММ.ГГГГ" -> номера столбцов матрицы и разобранные даты столбцов
+        self.date_columns: Dict[str, List[int]] = {}
+        self.column_dates: List[Optional[datetime]] = []
+        for idx, value in enumerate(headers):
+            key = header_date_key(value)
+            if key is not None:
+                self.date_columns.setdefault(key, []).append(idx)
+            self.column_dates.append(parse_header_date(value))
+        self._range_index: Optional[Dict[str, np.ndarray]] = None
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Sequence[Any]]) -> "JournalMatrix":
+        """Строит матрицу за один проход по строкам листа (values_only), первая строка — заголовки"""
+        rows = iter(rows)
+        header_row = next(rows, None) or ()
+        headers = list(header_row[FIRST_DATE_COLUMN - 1:])
+        leading_headers = list(header_row[1:FIRST_DATE_COLUMN - 1])
+
+        fio_index: Dict[Any, int] = {}
+        encoded: List[List[int]] = []
+        fractional: List[Tuple[int, int, float]] = []  # (строка, столбец, дробная оценка)
+        width = len(headers)
+        for row in rows:
+            row = row or ()
+            fio = row[0] if row else None
+            if fio is not None and fio not in fio_index:
+                fio_index[fio] = len(encoded)
+            values = row[FIRST_DATE_COLUMN - 1:]
+            marks = [encode_mark(v) for v in values]
+            if any(isinstance(v, float) for v in values):
+                fractional.extend((len(encoded), col, v) for col, v in enumerate(values) if exact_grade(v) is not None)
+            width = max(width, len(marks))
+            encoded.append(marks)
+
+        # В read-only режиме строки без размеров листа могут быть разной длины
+        headers.extend([None] * (width - len(headers)))
+        codes = np.zeros((len(encoded), width), dtype=np.int8)
+        for idx, marks in enumerate(encoded):
+            codes[idx, :len(marks)] = marks
+
+        grades = None
+        if fractional:
+            grades = grade_matrix(codes)
+            for row, col, value in fractional:
+                grades[row, col] = value
+        return cls(fio_index, headers, codes, leading_headers, grades)
+
+    @classmethod
+    def from_worksheet(cls, ws) -> "JournalMatrix":
+        """Строит матрицу из листа openpyxl за один проход"""
+        return cls.from_rows(ws.iter_rows(values_only=True))
+
+    def student_rows(self, students: Sequence[Any]) -> np.ndarray:
+        """Номера строк матрицы для списка студентов (-1 — студента нет в журнале)"""
+        return np.array([self.fio_index.get(fio, -1) for fio in students], dtype=np.intp)
+
+    def student_block(self, students: Sequence[Any], columns: Optional[Sequence[int]] = None) -> np.ndarray:
+        """Возвращает коды отметок для списка студентов (строки без студента — пустые)"""
+        return self._take(self.codes, students, columns)
+
+    def student_grades(self, students: Sequence[Any], columns: Optional[Sequence[int]] = None) -> np.ndarray:
+        """Значения оценок для списка студентов (0 — не оценка), дробные оценки не округляются"""
+        if self.grades is None:
+            return grade_matrix(self.student_block(students, columns))
+        return self._take(self.grades, students, columns)
+
+    def _take(self, matrix: np.ndarray, students: Sequence[Any], columns: Optional[Sequence[int]]) -> np.ndarray:
+        rows = self.student_rows(students)
+        if columns is None:
+            columns = np.arange(matrix.shape[1], dtype=np.intp)
+        else:
+            columns = np.asarray(columns, dtype=np.intp)
+
+        block = np.zeros((len(students), len(columns)), dtype=matrix.dtype)
+        found = rows >= 0
+        if found.any() and len(columns):
+            block[found] = matrix[np.ix_(rows[found], columns)]
+        return block
+
+    def summarize_columns(self, students: Sequence[Any], columns: Optional[Sequence[int]] = None) -> Dict[str, np.ndarray]:
+        """Итоги по выбранным столбцам (None — по всем) для списка студентов, см. summarize_block"""
+        block = self.student_block(students, columns)
+        if self.grades is None:
+            return summarize_block(block)
+        return summarize_block(block, self._take(self.grades, students, columns))
+
+    def with_marks(self, marks: Iterable[Tuple[Any, str, Any]]) -> "JournalMatrix":
+        """Копия матрицы с наложенными отметками (ФИО, дата ДД.ММ.ГГГГ, значение)
+
+        Отметка ставится в первый столбец с этой датой начиная со столбца B, как
+        при записи в xlsx (mark_log.write_marks). Отметки для студентов и дат,
+        которых нет в журнале, и отметки в непрочитанные столбцы до
+        FIRST_DATE_COLUMN пропускаются. Сама матрица не меняется — она может
+        лежать в кэше.
+        """
+        leading_keys = {header_date_key(value) for value in self.leading_headers} - {None}
+        codes = self.codes.copy()
+        grades = self.grades.copy() if self.grades is not None else None
+        for fio, date_key, value in marks:
+            row = self.fio_index.get(fio)
+            columns = self.date_columns.get(date_key)
+            if row is None or not columns or date_key in leading_keys:
+                continue
+            code = encode_mark(value)
+            codes[row, columns[0]] = code
+            exact = exact_grade(value)
+            if exact is not None and grades is None:
+                grades = grade_matrix(codes)
+            if grades is not None:
+                grades[row, columns[0]] = exact if exact is not None else (code if 2 <= code <= 5 else 0)
+        return JournalMatrix(self.fio_index, self.headers, codes, self.leading_headers, grades)
+
+    def memory_size(self) -> int:
+        """Примерный объем памяти матрицы в байтах (с индексом диапазонов, если он построен)"""
+        size = self.codes.nbytes + ENTRY_OVERHEAD * (len(self.fio_index) + len(self.headers))
+        if self.grades is not None:
+            size += self.grades.nbytes
+        if self._range_index is not None:
+            size += sum(array.nbytes for array in self._range_index.values())
+        return size
+
+    def range_index(self) -> Dict[str, np.ndarray]:
+        """Индекс для запросов по диапазону дат (строится один раз на матрицу)
+
+        'days' — порядковые номера дней столбцов с датами (по возрастанию),
+        'order' — номера этих столбцов в матрице, остальные массивы —
+        накопленные по столбцам суммы для каждой строки (первый столбец нулевой).
+        """
+        if self._range_index is None:
+            dated = [(cell_date.toordinal(), idx) for idx, cell_date in enumerate(self.column_dates) if cell_date]
+            dated.sort()
+            order = np.array([idx for _, idx in dated], dtype=np.intp)
+            days = np.array([day for day, _ in dated], dtype=np.int64)
+
+            block = self.codes[:, order]
+            graded = (block >= 2) & (block <= 5)
+            index = {'days': days, 'order': order}
+            for name, values in (
+                ('grade_sum', np.where(graded, block, 0)),
+                ('grade_count', graded),
+                ('absences', np.isin(block, ABSENCE_CODES)),
+                ('lessons', block != MARK_EMPTY),
+            ):
+                cumulative = np.zeros((block.shape[0], block.shape[1] + 1), dtype=np.int32)
+                np.cumsum(values, axis=1, dtype=np.int32, out=cumulative[:, 1:])
+                index[name] = cumulative
+            self._range_index = index
+        return self._range_index
+
+    def _range_bounds(self, start_date: datetime, end_date: datetime) -> Tuple[int, int]:
+        """Границы диапазона в индексе: два бинарных поиска по дням"""
+        days = self.range_index()['days']
+        start_day, end_day = range_days(start_date, end_date)
+        lo = int(np.searchsorted(days, start_day, side='left'))
+        hi = int(np.searchsorted(days, end_day, side='right'))
+        return lo, max(lo, hi)
+
+    def range_columns(self, start_date: datetime, end_date: datetime) -> List[int]:
+        """Номера столбцов матрицы с датами из диапазона (по порядку столбцов)"""
+        lo, hi = self._range_bounds(start_date, end_date)
+        return sorted(self.range_index()['order'][lo:hi].tolist())
+
+    def summarize_range(self, students: Sequence[Any], start_date: datetime, end_date: datetime) -> Dict[str, np.ndarray]:
+        """Итоги по диапазону дат для списка студентов через накопленные суммы
+
+        Возвращает тот же словарь, что и summarize_block, но без обхода столбцов.
+        Журнал с дробными оценками считается по столбцам диапазона: разность
+        накопленных дробных сумм может отличаться от суммы оценок в младших битах.
+        """
+        if self.grades is not None:
+            return self.summarize_columns(students, self.range_columns(start_date, end_date))
+        index = self.range_index()
+        lo, hi = self._range_bounds(start_date, end_date)
+        rows = self.student_rows(students)
+        found = rows >= 0
+
+        summary = {}
+        for name in ('grade_sum', 'grade_count', 'absences', 'lessons'):
+            values = np.zeros(len(rows), dtype=np.int64)
+            if found.any():
+                cumulative = index[name]
+                values[found] = cumulative[rows[found], hi] - cumulative[rows[found], lo]
+            summary[name] = values
+        return summary
+
+
+def range_days(start_date: datetime, end_date: datetime) -> Tuple[int, int]:
+    """Первый и последний порядковый день диапазона дат (включительно)
+
+    Столбец с датой в полночь не попадает в диапазон, начинающийся позже полуночи.
+    """
+    start_day = start_date.toordinal() + (1 if start_date.time() != time() else 0)
+    return start_day, end_date.toordinal()
+
+
+def header_date_key(value: Any) -> Optional[str]:
+    """Ключ даты заголовка в формате ДД.ММ.ГГГГ для поиска столбцов месяца"""
+    if value and isinstance(value, datetime):
+        return value.strftime("%d.%m.%Y")
+    if value and isinstance(value, str):
+        return value.strip()
+    return None
+
+
+def parse_header_date(value: Any) -> Optional[datetime]:
+    """Разбирает заголовок столбца в дату (None, если это не дата)"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.strptime(value.split(' ')[0], "%d.%m.%Y")
+        except ValueError:
+            return None
+    return None
+
+
+def summarize_block(block: np.ndarray, grades: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """Сумма и число оценок, пропуски и занятия по каждой строке блока
+
+    grades — точные значения оценок того же блока (журнал с дробными оценками);
+    тогда сумма оценок — float64, сложенная по столбцам подряд, как sum() по списку оценок.
+    """
+    graded = (block >= 2) & (block <= 5)
+    if grades is None:
+        grade_sum = np.where(graded, block, 0).sum(axis=1, dtype=np.int64)
+    elif block.shape[1]:
+        grade_sum = np.add.accumulate(grades, axis=1)[:, -1]
+    else:
+        grade_sum = np.zeros(block.shape[0], dtype=np.float64)
+    return {
+        'grade_sum': grade_sum,
+        'grade_count': graded.sum(axis=1, dtype=np.int64),
+        'absences': np.isin(block, ABSENCE_CODES).sum(axis=1, dtype=np.int64),
+        'lessons': (block != MARK_EMPTY).sum(axis=1, dtype=np.int64),
+    }
+
+
+class JournalDiskCache:
+    """Постоянный кэш разобранных журналов на диске (по одному .npz на журнал)
+
+    Запись действительна, пока у исходного файла совпадают mtime и размер
+    (и, если включено verify_hash, sha256 содержимого).
+    """
+
+    # Версия формата: увеличивается при изменении кодирования отметок или состава записи
+    FORMAT_VERSION = 4
+
+    def __init__(self, cache_dir: str, verify_hash: bool = False):
+        self.cache_dir = cache_dir
+        self.verify_hash = verify_hash
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_path(self, file_path: str) -> str:
+        key = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    @staticmethod
+    def _file_hash(file_path: str) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _stamp(self, file_path: str) -> Tuple[int, int]:
+        st = os.stat(file_path)
+        return st.st_mtime_ns, st.st_size
+
+    def get(self, file_path: str) -> Optional[JournalMatrix]:
+        """Возвращает матрицу из кэша или None, если записи нет или она устарела"""
+        entry_path = self._entry_path(file_path)
+        if not os.path.exists(entry_path) or not os.path.exists(file_path):
+            return None
+
+        try:
+            with np.load(entry_path, allow_pickle=False) as data:
+                meta = json.loads(data['meta'].tobytes().decode('utf-8'))
+                if meta.get('version') != self.FORMAT_VERSION:
+                    return None
+                if [meta['mtime_ns'], meta['size']] != list(self._stamp(file_path)):
+                    return None
+                if self.verify_hash and meta.get('sha256') != self._file_hash(file_path):
+                    return None
+                codes = data['codes']
+                grades = data['grades'] if 'grades' in data.files else None
+        except Exception:
+            return None
+
+        fio_index = {_decode_value(fio): row for fio, row in meta['fio_index']}
+        headers = [_decode_value(value) for value in meta['headers']]
+        leading_headers = [_decode_value(value) for value in meta['leading_headers']]
+        return JournalMatrix(fio_index, headers, codes, leading_headers, grades)
+
+    def put(self, file_path: str, matrix: JournalMatrix):
+        """Сохраняет разобранный журнал в кэш (атомарно через временный файл)"""
+        mtime_ns, size = self._stamp(file_path)
+        meta = {
+            'version': self.FORMAT_VERSION,
+            'mtime_ns': mtime_ns,
+            'size': size,
+            'sha256': self._file_hash(file_path) if self.verify_hash else None,
+            'fio_index': [[_encode_value(fio), row] for fio, row in matrix.fio_index.items()],
+            'headers': [_encode_value(value) for value in matrix.headers],
+            'leading_headers': [_encode_value(value) for value in matrix.leading_headers],
+        }
+        meta_bytes = np.frombuffer(json.dumps(meta, ensure_ascii=False).encode('utf-8'), dtype=np.uint8)
+
+        entry_path = self._entry_path(file_path)
+        tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            arrays = {'codes': matrix.codes, 'meta': meta_bytes}
+            if matrix.grades is not None:
+                arrays['grades'] = matrix.grades
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp_path, entry_path)
+
+
+def estimate_size(value: Any) -> int:
+    """Примерный объем значения кэша в байтах"""
+    if isinstance(value, JournalMatrix):
+        return value.memory_size()
+    if isinstance(value, (list, tuple)):
+        return ENTRY_OVERHEAD * (len(value) + 1)
+    return ENTRY_OVERHEAD
+
+
+class JournalCache:
+    """Кэш разобранных файлов в памяти с вытеснением давно не использованных (LRU)
+
+    Запись привязана к mtime и размеру файла: если файл изменили, get вернет
+    None и запись будет удалена. Объем ограничивается числом записей и/или
+    примерным размером в байтах (см. estimate_size).
+    """
+
+    MISSING = object()  # get: записи нет или она устарела
+
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 sizeof: Callable[[Any], int] = estimate_size):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.entries: "OrderedDict[str, List[Any]]" = OrderedDict()  # путь -> [отметка файла, значение, размер]
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    @staticmethod
+    def stamp(file_path: str) -> Optional[Tuple[int, int]]:
+        """Отметка версии файла (mtime_ns, размер) или None, если файла нет"""
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def get(self, file_path: str) -> Any:
+        """Значение для файла или JournalCache.MISSING (значением может быть и None)"""
+        stamp = self.stamp(file_path)
+        with self.lock:
+            entry = self.entries.get(file_path)
+            if entry is None:
+                self.misses += 1
+                return self.MISSING
+            if entry[0] != stamp:
+                self._remove(file_path)
+                self.stale += 1
+                self.misses += 1
+                return self.MISSING
+
+            self.entries.move_to_end(file_path)
+            self.hits += 1
+            # Размер мог вырасти (например, построен индекс диапазонов)
+            size = self.sizeof(entry[1])
+            self.total_bytes += size - entry[2]
+            entry[2] = size
+            self._evict(keep=file_path)
+            return entry[1]
+
+    def put(self, file_path: str, value: Any, stamp: Optional[Tuple[int, int]] = None):
+        """Сохраняет значение; stamp лучше снять до чтения файла, чтобы не закрепить устаревшие данные"""
+        if stamp is None:
+            stamp = self.stamp(file_path)
+        size = self.sizeof(value)
+        with self.lock:
+            if file_path in self.entries:
+                self._remove(file_path)
+            self.entries[file_path] = [stamp, value, size]
+            self.total_bytes += size
+            self._evict(keep=file_path)
+
+    def _remove(self, file_path: str):
+        _, _, size = self.entries.pop(file_path)
+        self.total_bytes -= size
+
+    def _evict(self, keep: str):
+        while len(self.entries) > 1 and (
+            (self.max_entries is not None and len(self.entries) > self.max_entries)
+            or (self.max_bytes is not None and self.total_bytes > self.max_bytes)
+        ):
+            oldest = next(iter(self.entries))
+            if oldest == keep:
+                self.entries.move_to_end(oldest)
+                continue
+            self._remove(oldest)
+            self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+            }
+
+
+def _encode_value(value: Any) -> Any:
+    """Готовит значение ячейки к сохранению в JSON (даты — отдельным тегом)"""
+    if isinstance(value, datetime):
+        return {'datetime': value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and 'datetime' in value:
+        return datetime.fromisoformat(value['datetime'])
+    return value
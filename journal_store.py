@@ -0,0 +1,478 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core_model import STUDENTS_FILE
+from journal_matrix import (
+    ABSENCE_CODES, FIRST_DATE_COLUMN, MARK_EMPTY, JournalCache, JournalMatrix,
+    encode_mark, exact_grade, header_date_key, range_days,
+)
+from mark_log import write_marks
+
+logger = logging.getLogger(__name__)
+
+# Версия схемы и кодов отметок в базе (PRAGMA user_version): при несовпадении таблицы
+# создаются заново и журналы загружаются из xlsx
+STORE_VERSION = 2
+
+TABLES = ("changed_cells", "marks", "lessons", "journals", "students", "subjects", "groups")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS groups (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    roster_mtime_ns INTEGER,
+    roster_size INTEGER
+);
+CREATE TABLE IF NOT EXISTS students (
+    id INTEGER PRIMARY KEY,
+    group_id INTEGER NOT NULL REFERENCES groups(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    last_name TEXT NOT NULL,
+    first_name TEXT NOT NULL,
+    patronymic TEXT NOT NULL,
+    fio TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS students_group ON students(group_id, position);
+CREATE TABLE IF NOT EXISTS subjects (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS journals (
+    group_id INTEGER NOT NULL REFERENCES groups(id) ON DELETE CASCADE,
+    subject_id INTEGER NOT NULL REFERENCES subjects(id),
+    mtime_ns INTEGER,
+    size INTEGER,
+    dirty INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (group_id, subject_id)
+);
+CREATE TABLE IF NOT EXISTS lessons (
+    id INTEGER PRIMARY KEY,
+    group_id INTEGER NOT NULL,
+    subject_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    header TEXT,
+    key TEXT,
+    day INTEGER
+);
+CREATE INDEX IF NOT EXISTS lessons_group_subject_day ON lessons(group_id, subject_id, day);
+CREATE INDEX IF NOT EXISTS lessons_group_subject_key ON lessons(group_id, subject_id, key);
+CREATE TABLE IF NOT EXISTS marks (
+    lesson_id INTEGER NOT NULL REFERENCES lessons(id) ON DELETE CASCADE,
+    student_id INTEGER NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+    code INTEGER NOT NULL,
+    grade REAL,  -- точное значение дробной оценки (4.5), для остальных отметок NULL
+    PRIMARY KEY (lesson_id, student_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS marks_student ON marks(student_id);
+CREATE TABLE IF NOT EXISTS changed_cells (
+    group_id INTEGER NOT NULL REFERENCES groups(id) ON DELETE CASCADE,
+    subject_id INTEGER NOT NULL REFERENCES subjects(id),
+    fio TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (group_id, subject_id, fio, key)
+);
+"""
+
+# Итоги по (предмет, студент) для выбранных занятий группы
+SUMMARY_SQL = """
+SELECT l.subject_id, s.position,
+       SUM(CASE WHEN m.code BETWEEN 2 AND 5 THEN COALESCE(m.grade, m.code) ELSE 0 END),
+       SUM(m.code BETWEEN 2 AND 5),
+       SUM(m.code IN ({absent})),
+       COUNT(*)
+FROM lessons l
+JOIN marks m ON m.lesson_id = l.id
+JOIN students s ON s.id = m.student_id
+WHERE l.group_id = ? {{filter}}
+GROUP BY l.subject_id, s.position
+""".format(absent=", ".join(map(str, ABSENCE_CODES)))
+
+SUMMARY_FIELDS = ('grade_sum', 'grade_count', 'absences', 'lessons')
+
+
+def _encode_cell(value: Any) -> Optional[str]:
+    """Значение ячейки журнала (заголовка или отметки) в JSON (даты — отдельным тегом)"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return json.dumps({'datetime': value.isoformat()})
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _decode_cell(text: Optional[str]) -> Any:
+    if text is None:
+        return None
+    value = json.loads(text)
+    if isinstance(value, dict) and 'datetime' in value:
+        return datetime.fromisoformat(value['datetime'])
+    return value
+
+
+class JournalStore:
+    """Хранилище журналов в SQLite — альтернатива дереву Журналы/<курс>/<группа>/<предмет>.xlsx
+
+    Группы, студенты, предметы, даты занятий и отметки лежат в таблицах с
+    индексами по (группа, предмет, дата) и по студенту, поэтому итоги за месяц
+    или диапазон считаются SQL-запросами по индексу, а не обходом всех книг.
+
+    Синхронизация двусторонняя (sync): отметки, поставленные через хранилище,
+    записываются в существующие ячейки xlsx (остальное содержимое и
+    оформление книги не меняются), измененные на диске файлы загружаются
+    заново. Отметки хранятся кодами journal_matrix (у дробных оценок — еще и
+точным значением для средних баллов); столбец B журнала, как и
+    при разборе матрицы, не читается, поэтому книга целиком из хранилища не
+    восстанавливается.
+    """
+
+    def __init__(self, db_path: str, load_matrix: Optional[Callable[[str], Optional[JournalMatrix]]] = None,
+                 read_rows: Optional[Callable[[str], Sequence[Sequence]]] = None):
+        from xlsx_journal_reader import read_journal_matrix, read_sheet_rows
+        self.db_path = db_path
+        self.load_matrix = load_matrix or read_journal_matrix
+        self.read_rows = read_rows or (lambda path: read_sheet_rows(path, min_row=2))
+        self.lock = threading.RLock()
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != STORE_VERSION:
+            with self.conn:
+                for table in TABLES:
+                    self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+            self.conn.execute(f"PRAGMA user_version = {STORE_VERSION}")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    # Справочники
+
+    def _group_id(self, group_name: str, create: bool = False) -> Optional[int]:
+        row = self.conn.execute("SELECT id FROM groups WHERE name = ?", (group_name,)).fetchone()
+        if row:
+            return row[0]
+        if not create:
+            return None
+        return self.conn.execute("INSERT INTO groups (name) VALUES (?)", (group_name,)).lastrowid
+
+    def _subject_id(self, subject: str, create: bool = False) -> Optional[int]:
+        row = self.conn.execute("SELECT id FROM subjects WHERE name = ?", (subject,)).fetchone()
+        if row:
+            return row[0]
+        if not create:
+            return None
+        return self.conn.execute("INSERT INTO subjects (name) VALUES (?)", (subject,)).lastrowid
+
+    def group_names(self) -> List[str]:
+        with self.lock:
+            return [name for (name,) in self.conn.execute("SELECT name FROM groups ORDER BY name")]
+
+    def students(self, group_name: str) -> List[str]:
+        """ФИО студентов группы в порядке списка"""
+        with self.lock:
+            return [fio for (fio,) in self.conn.execute(
+                "SELECT s.fio FROM students s JOIN groups g ON g.id = s.group_id WHERE g.name = ? ORDER BY s.position",
+                (group_name,),
+            )]
+
+    def subjects(self, group_name: str) -> List[str]:
+        """Предметы, по которым у группы есть журнал"""
+        with self.lock:
+            return [name for (name,) in self.conn.execute(
+                "SELECT sb.name FROM journals j JOIN subjects sb ON sb.id = j.subject_id "
+                "JOIN groups g ON g.id = j.group_id WHERE g.name = ? ORDER BY sb.name",
+                (group_name,),
+            )]
+
+    # Загрузка из дерева xlsx
+
+    def _import_roster(self, group_id: int, students_file: str):
+        """Заново загружает список группы; отметки группы удаляются вместе со студентами"""
+        self.conn.execute("DELETE FROM changed_cells WHERE group_id = ?", (group_id,))
+        self.conn.execute("DELETE FROM lessons WHERE group_id = ?", (group_id,))
+        self.conn.execute("DELETE FROM journals WHERE group_id = ?", (group_id,))
+        self.conn.execute("DELETE FROM students WHERE group_id = ?", (group_id,))
+        rows = []
+        if os.path.exists(students_file):
+            for row in self.read_rows(students_file):
+                if row and len(row) > 3 and row[1] and row[2] and row[3]:
+                    rows.append((group_id, len(rows), str(row[1]), str(row[2]), str(row[3]), f"{row[1]} {row[2]} {row[3]}"))
+        self.conn.executemany(
+            "INSERT INTO students (group_id, position, last_name, first_name, patronymic, fio) VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        stamp = JournalCache.stamp(students_file) or (None, None)
+        self.conn.execute("UPDATE groups SET roster_mtime_ns = ?, roster_size = ? WHERE id = ?", (*stamp, group_id))
+
+    def _import_journal(self, group_id: int, subject_id: int, journal_file: str):
+        """Заново загружает журнал предмета: занятия по столбцам и непустые отметки студентов списка
+
+        Невыгруженные изменения журнала отбрасываются — побеждает файл.
+        """
+        self.conn.execute("DELETE FROM changed_cells WHERE group_id = ? AND subject_id = ?", (group_id, subject_id))
+        self.conn.execute("DELETE FROM lessons WHERE group_id = ? AND subject_id = ?", (group_id, subject_id))
+        stamp = JournalCache.stamp(journal_file) or (None, None)
+        matrix = self.load_matrix(journal_file)
+        if matrix is None:
+            self.conn.execute("DELETE FROM journals WHERE group_id = ? AND subject_id = ?", (group_id, subject_id))
+            return
+
+        students = self.conn.execute(
+            "SELECT id, fio FROM students WHERE group_id = ? ORDER BY position", (group_id,)
+        ).fetchall()
+        fios = [fio for _, fio in students]
+        block = matrix.student_block(fios)
+        grades = matrix.student_grades(fios) if matrix.grades is not None else None
+
+        lesson_ids = []
+        for position, header in enumerate(matrix.headers):
+            cell_date = matrix.column_dates[position]
+            lesson_ids.append(self.conn.execute(
+                "INSERT INTO lessons (group_id, subject_id, position, header, key, day) VALUES (?, ?, ?, ?, ?, ?)",
+                (group_id, subject_id, position, _encode_cell(header), header_date_key(header),
+                 cell_date.toordinal() if cell_date else None),
+            ).lastrowid)
+
+        rows, columns = np.nonzero(block)
+        self.conn.executemany(
+            "INSERT INTO marks (lesson_id, student_id, code, grade) VALUES (?, ?, ?, ?)",
+            ((lesson_ids[col], students[row][0], int(block[row, col]),
+              exact_grade(float(grades[row, col])) if grades is not None else None)
+             for row, col in zip(rows.tolist(), columns.tolist())),
+        )
+        self.conn.execute(
+            "INSERT OR REPLACE INTO journals (group_id, subject_id, mtime_ns, size, dirty) VALUES (?, ?, ?, ?, 0)",
+            (group_id, subject_id, *stamp),
+        )
+
+    def import_tree(self, journals_path: str, subjects: Optional[Sequence[str]] = None,
+                    reload: Sequence[Tuple[str, str]] = ()) -> int:
+        """Загружает из дерева xlsx группы и журналы, изменившиеся с прошлой синхронизации
+
+        reload — пары (группа, предмет), которые перечитываются независимо от
+        версии файла. Возвращает число перечитанных файлов.
+        """
+        reload = set(reload)
+        if not os.path.isdir(journals_path):
+            return 0
+        reloaded = 0
+        with self.lock, self.conn:
+            folders = sorted(item for item in os.listdir(journals_path) if os.path.isdir(os.path.join(journals_path, item)))
+            for (group_name,) in self.conn.execute("SELECT name FROM groups").fetchall():
+                if group_name not in folders:
+                    self.conn.execute("DELETE FROM lessons WHERE group_id = (SELECT id FROM groups WHERE name = ?)", (group_name,))
+                    self.conn.execute("DELETE FROM groups WHERE name = ?", (group_name,))
+
+            for group_name in folders:
+                group_path = os.path.join(journals_path, group_name)
+                group_id = self._group_id(group_name, create=True)
+                students_file = os.path.join(group_path, STUDENTS_FILE)
+                stored = self.conn.execute("SELECT roster_mtime_ns, roster_size FROM groups WHERE id = ?", (group_id,)).fetchone()
+                roster_changed = tuple(stored) != (JournalCache.stamp(students_file) or (None, None))
+                if roster_changed:
+                    self._import_roster(group_id, students_file)
+                    reloaded += 1
+
+                group_subjects = subjects or sorted(
+                    file[:-5] for file in os.listdir(group_path)
+                    if file.endswith('.xlsx') and file != STUDENTS_FILE and not file.startswith('~$')
+                )
+                known = {
+                    subject_id: (mtime_ns, size)
+                    for subject_id, mtime_ns, size in self.conn.execute(
+                        "SELECT subject_id, mtime_ns, size FROM journals WHERE group_id = ?", (group_id,)
+                    )
+                }
+                for subject in group_subjects:
+                    journal_file = os.path.join(group_path, f"{subject}.xlsx")
+                    stamp = JournalCache.stamp(journal_file)
+                    subject_id = self._subject_id(subject, create=stamp is not None)
+                    if subject_id is None:
+                        continue
+                    if stamp is None:
+                        if subject_id in known:
+                            self.conn.execute("DELETE FROM changed_cells WHERE group_id = ? AND subject_id = ?", (group_id, subject_id))
+                            self.conn.execute("DELETE FROM lessons WHERE group_id = ? AND subject_id = ?", (group_id, subject_id))
+                            self.conn.execute("DELETE FROM journals WHERE group_id = ? AND subject_id = ?", (group_id, subject_id))
+                        continue
+                    if known.get(subject_id) != stamp or (group_name, subject) in reload:
+                        self._import_journal(group_id, subject_id, journal_file)
+                        reloaded += 1
+        return reloaded
+
+    # Выгрузка в дерево xlsx
+
+    def _journal_codes(self, group_id: int, subject_id: int):
+        """Занятия (id, заголовок), студенты (id, ФИО) и коды отметок студенты x занятия"""
+        lessons = self.conn.execute(
+            "SELECT id, header FROM lessons WHERE group_id = ? AND subject_id = ? ORDER BY position",
+            (group_id, subject_id),
+        ).fetchall()
+        students = self.conn.execute(
+            "SELECT id, fio FROM students WHERE group_id = ? ORDER BY position", (group_id,)
+        ).fetchall()
+        lesson_index = {lesson_id: idx for idx, (lesson_id, _) in enumerate(lessons)}
+        student_index = {student_id: idx for idx, (student_id, _) in enumerate(students)}
+        codes = np.zeros((len(students), len(lessons)), dtype=np.int8)
+        for lesson_id, student_id, code in self.conn.execute(
+            "SELECT m.lesson_id, m.student_id, m.code FROM marks m JOIN lessons l ON l.id = m.lesson_id "
+            "WHERE l.group_id = ? AND l.subject_id = ?",
+            (group_id, subject_id),
+        ):
+            codes[student_index[student_id], lesson_index[lesson_id]] = code
+        return lessons, students, codes
+
+    def export_journal(self, journals_path: str, group_name: str, subject: str):
+        """Записывает измененные через хранилище ячейки в xlsx-журнал и запоминает новую версию файла
+
+        Книга загружается целиком, меняются только ячейки отметок, файл
+        заменяется атомарно. Если для какой-то отметки в файле нет строки
+        студента или столбца даты, журнал не выгружается (ValueError) и
+        изменения остаются в хранилище.
+        """
+        journal_file = os.path.join(journals_path, group_name, f"{subject}.xlsx")
+        with self.lock:
+            group_id, subject_id = self._group_id(group_name), self._subject_id(subject)
+            cells = self.conn.execute(
+                "SELECT fio, key, value FROM changed_cells WHERE group_id = ? AND subject_id = ?", (group_id, subject_id)
+            ).fetchall()
+        if cells:
+            # Занятия хранилища — столбцы начиная с FIRST_DATE_COLUMN, в них же и пишем
+            write_marks(journal_file, [(fio, key, _decode_cell(value)) for fio, key, value in cells],
+                        strict=True, first_column=FIRST_DATE_COLUMN)
+        with self.lock, self.conn:
+            # Ячейки, измененные заново во время записи, остаются до следующей выгрузки
+            self.conn.executemany(
+                "DELETE FROM changed_cells WHERE group_id = ? AND subject_id = ? AND fio = ? AND key = ? AND value IS ?",
+                ((group_id, subject_id, fio, key, value) for fio, key, value in cells),
+            )
+            remaining = self.conn.execute(
+                "SELECT 1 FROM changed_cells WHERE group_id = ? AND subject_id = ? LIMIT 1", (group_id, subject_id)
+            ).fetchone()
+            self.conn.execute(
+                "UPDATE journals SET mtime_ns = ?, size = ?, dirty = ? WHERE group_id = ? AND subject_id = ?",
+                (*JournalCache.stamp(journal_file), int(remaining is not None), group_id, subject_id),
+            )
+
+    def sync(self, journals_path: str, subjects: Optional[Sequence[str]] = None,
+             reload: Sequence[Tuple[str, str]] = ()) -> int:
+        """Двусторонняя синхронизация с деревом xlsx
+
+        Отметки, поставленные через хранилище, записываются в xlsx, если файл
+        на диске не менялся с прошлой синхронизации; иначе побеждает файл
+        (конфликт пишется в лог). Журнал, который нельзя выгрузить без потерь,
+        остается измененным в хранилище. Затем загружаются все изменившиеся на
+        диске файлы.
+        """
+        with self.lock:
+            dirty = self.conn.execute(
+                "SELECT g.name, sb.name, j.mtime_ns, j.size FROM journals j JOIN groups g ON g.id = j.group_id "
+                "JOIN subjects sb ON sb.id = j.subject_id WHERE j.dirty = 1"
+            ).fetchall()
+        for group_name, subject, mtime_ns, size in dirty:
+            journal_file = os.path.join(journals_path, group_name, f"{subject}.xlsx")
+            if JournalCache.stamp(journal_file) == (mtime_ns, size):
+                try:
+                    self.export_journal(journals_path, group_name, subject)
+                except Exception as e:
+                    logger.error(f"Журнал {journal_file} не выгружен, изменения остаются в хранилище: {e}")
+            else:
+                logger.warning(f"Журнал {journal_file} изменен и в хранилище, и на диске — берется файл")
+        return self.import_tree(journals_path, subjects, reload)
+
+    # Изменения через хранилище
+
+    def set_mark(self, group_name: str, subject: str, student_fio: str, date_key: str, value: Any):
+        """Ставит отметку студенту на занятие с датой date_key (ДД.ММ.ГГГГ); None — очищает"""
+        with self.lock, self.conn:
+            group_id = self._group_id(group_name)
+            subject_id = self._subject_id(subject)
+            student = self.conn.execute(
+                "SELECT id FROM students WHERE group_id = ? AND fio = ? ORDER BY position LIMIT 1", (group_id, student_fio)
+            ).fetchone()
+            lesson = self.conn.execute(
+                "SELECT id FROM lessons WHERE group_id = ? AND subject_id = ? AND key = ? ORDER BY position LIMIT 1",
+                (group_id, subject_id, date_key),
+            ).fetchone()
+            if student is None or lesson is None:
+                raise ValueError(f"Нет студента {student_fio} или занятия {date_key} в журнале {group_name}/{subject}")
+
+            code = encode_mark(value)
+            if code == MARK_EMPTY:
+                self.conn.execute("DELETE FROM marks WHERE lesson_id = ? AND student_id = ?", (lesson[0], student[0]))
+            else:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO marks (lesson_id, student_id, code, grade) VALUES (?, ?, ?, ?)",
+                    (lesson[0], student[0], code, exact_grade(value)),
+                )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO changed_cells (group_id, subject_id, fio, key, value) VALUES (?, ?, ?, ?, ?)",
+                (group_id, subject_id, student_fio, date_key, _encode_cell(value)),
+            )
+            self.conn.execute("UPDATE journals SET dirty = 1 WHERE group_id = ? AND subject_id = ?", (group_id, subject_id))
+
+    # Итоги SQL-запросами
+
+    def summarize_group(self, group_name: str, student_count: int, target_month_keys: Optional[Sequence[str]] = None,
+                        start_date: datetime = None, end_date: datetime = None) -> Dict[str, Dict[str, np.ndarray]]:
+        """Итоги по предметам группы за период: {предмет: {grade_sum, grade_count, absences, lessons}}
+
+        Период — диапазон дат (по индексу дней), список ключей дат месяца
+        (ДД.ММ.ГГГГ, как заголовки столбцов) или все занятия. Массивы идут в
+        порядке списка группы; предметы без журнала в ответ не попадают.
+        """
+        if start_date and end_date:
+            start_day, end_day = range_days(start_date, end_date)
+            condition, params = "AND l.day BETWEEN ? AND ?", [start_day, end_day]
+        elif target_month_keys is not None:
+            keys = sorted(set(target_month_keys))
+            condition, params = f"AND l.key IN ({', '.join('?' * len(keys))})", keys
+        else:
+            condition, params = "", []
+
+        with self.lock:
+            group_id = self._group_id(group_name)
+            if group_id is None:
+                return {}
+            subject_names = dict(self.conn.execute(
+                "SELECT sb.id, sb.name FROM journals j JOIN subjects sb ON sb.id = j.subject_id WHERE j.group_id = ?",
+                (group_id,),
+            ).fetchall())
+            result = {
+                name: {field: np.zeros(student_count, dtype=np.int64) for field in SUMMARY_FIELDS}
+                for name in subject_names.values()
+            }
+            for subject_id, position, *values in self.conn.execute(SUMMARY_SQL.format(filter=condition), [group_id] + params):
+                if position >= student_count:
+                    continue
+                summary = result[subject_names[subject_id]]
+                for field, value in zip(SUMMARY_FIELDS, values):
+                    if isinstance(value, float) and summary[field].dtype != np.float64:
+                        # Дробные оценки: сумма оценок предмета считается в float64
+                        summary[field] = summary[field].astype(np.float64)
+                    summary[field][position] = value
+        return result
+
+    def group_marks(self, group_name: str, subjects: Sequence[str]) -> Dict[str, np.ndarray]:
+        """{предмет: коды студентов x занятия} в порядке списка группы (как read_group_marks в CSV)"""
+        result = {}
+        with self.lock:
+            group_id = self._group_id(group_name)
+            for subject in subjects:
+                subject_id = self._subject_id(subject)
+                if group_id is None or subject_id is None or self.conn.execute(
+                    "SELECT 1 FROM journals WHERE group_id = ? AND subject_id = ?", (group_id, subject_id)
+                ).fetchone() is None:
+                    continue
+                result[subject] = self._journal_codes(group_id, subject_id)[2]
+        return result
@@ -0,0 +1,288 @@
+import json
+import logging
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from openpyxl import load_workbook
+
+from core_model import STUDENTS_FILE
+from journal_matrix import header_date_key
+from student_mutations import TMP_SUFFIX, recover_mutations, roster_fio, save_durable
+from xlsx_journal_reader import READER_EXPAT, read_header_row, read_sheet_rows
+
+logger = logging.getLogger(__name__)
+
+# Отметка в журнале: ФИО студента, дата занятия (ДД.ММ.ГГГГ), значение ячейки
+Mark = Tuple[str, str, Any]
+
+
+def normalize_mark_value(value: Any) -> Any:
+    """Значение отметки для записи в журнал: оценка 2-5, "Н" или None (очистить ячейку)"""
+    if value is None or str(value).strip() == "":
+        return None
+    text = str(value).strip()
+    if text.upper() == "Н":
+        return "Н"
+    if text.isdigit() and 2 <= int(text) <= 5:
+        return int(text)
+    raise ValueError(f"Неверная отметка: {value}. Допустимы оценки 2-5, Н или пустое значение.")
+
+
+class MarkLog:
+    """Журнал отметок только на дозапись (JSON Lines)
+
+    Каждая отметка — одна короткая строка в конце файла с fsync, без
+    перезаписи книги предмета. Читатели накладывают еще не перенесенные
+    отметки на последний сохраненный xlsx (pending), compact() переносит их
+    в журналы пачками и убирает из файла.
+
+    Индекс отметок по журналам держится в памяти и дочитывается с места
+    последнего чтения, поэтому проверка журнала на новые отметки — один stat().
+    Читать файл могут любые процессы, а дописывать и переносить отметки —
+    один (сервис или CLI переноса), иначе запись во время compact() теряется.
+    """
+
+    def __init__(self, log_path: str, fsync: bool = True):
+        self.log_path = log_path
+        self.fsync = fsync
+        self.lock = threading.RLock()
+        # (группа, предмет) -> {(ФИО, дата): значение} в порядке записи
+        self._pending: Dict[Tuple[str, str], "OrderedDict[Tuple[str, str], Any]"] = {}
+        self._offset = 0
+        self._file_id: Optional[Tuple[int, int]] = None
+        directory = os.path.dirname(os.path.abspath(log_path))
+        os.makedirs(directory, exist_ok=True)
+
+    # Запись
+
+    def append(self, group_name: str, subject: str, student_fio: str, date_key: str, value: Any):
+        """Дописывает отметку в конец файла (value=None очищает ячейку)"""
+        event = {'group': group_name, 'subject': subject, 'student': student_fio, 'date': date_key, 'value': value}
+        line = (json.dumps(event, ensure_ascii=False) + "\n").encode('utf-8')
+        with self.lock:
+            with open(self.log_path, 'ab') as f:
+                f.write(line)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+
+    # Чтение
+
+    def _file_identity(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.log_path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_size
+
+    def refresh(self):
+        """Дочитывает новые строки файла в индекс (после compaction файл читается заново)"""
+        with self.lock:
+            identity = self._file_identity()
+            if identity is None:
+                self._pending, self._offset, self._file_id = {}, 0, None
+                return
+            if self._file_id is None or identity[0] != self._file_id[0] or identity[1] < self._offset:
+                self._pending, self._offset = {}, 0
+            self._file_id = identity
+            if identity[1] == self._offset:
+                return
+
+            with open(self.log_path, 'rb') as f:
+                f.seek(self._offset)
+                data = f.read(identity[1] - self._offset)
+            # Незаконченная последняя строка (запись еще идет или оборвалась) дочитывается позже
+            end = data.rfind(b"\n") + 1
+            for line in data[:end].splitlines():
+                self._apply_line(line)
+            self._offset += end
+
+    def _apply_line(self, line: bytes):
+        try:
+            event = json.loads(line)
+            key = (event['group'], event['subject'])
+            cell = (event['student'], event['date'])
+            value = event['value']
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Пропущена поврежденная строка журнала отметок {self.log_path}: {e}")
+            return
+        marks = self._pending.setdefault(key, OrderedDict())
+        marks.pop(cell, None)
+        marks[cell] = value
+
+    def version(self) -> Tuple[int, int]:
+        """Версия содержимого (меняется при дозаписи и после compaction)"""
+        with self.lock:
+            self.refresh()
+            return self._file_id or (0, 0)
+
+    def pending(self, group_name: str, subject: str) -> List[Mark]:
+        """Еще не перенесенные в xlsx отметки журнала предмета (последняя запись по ячейке)"""
+        with self.lock:
+            self.refresh()
+            marks = self._pending.get((group_name, subject))
+            return [(fio, date_key, value) for (fio, date_key), value in marks.items()] if marks else []
+
+    def journals(self) -> List[Tuple[str, str]]:
+        """(группа, предмет) журналов, у которых есть неперенесенные отметки"""
+        with self.lock:
+            self.refresh()
+            return [key for key, marks in self._pending.items() if marks]
+
+    def __len__(self) -> int:
+        with self.lock:
+            self.refresh()
+            return sum(len(marks) for marks in self._pending.values())
+
+    # Перенос в журналы
+
+    def compact(self, journals_path: str, batch_size: Optional[int] = None) -> int:
+        """Переносит отметки в xlsx-журналы и убирает их из файла
+
+        За вызов обрабатывается до batch_size журналов (None — все). Каждый
+        журнал открывается и сохраняется один раз на все его отметки; отметки,
+        дописанные во время переноса, остаются в файле. Возвращает число
+        перенесенных отметок.
+        """
+        with self.lock:
+            self.refresh()
+            batch = self.journals()[:batch_size] if batch_size else self.journals()
+            snapshot = {key: OrderedDict(self._pending[key]) for key in batch}
+
+        written = 0
+        done = []
+        for (group_name, subject), marks in snapshot.items():
+            journal_file = os.path.join(journals_path, group_name, f"{subject}.xlsx")
+            try:
+                skipped = write_marks(journal_file, [(fio, date_key, value) for (fio, date_key), value in marks.items()])
+            except Exception as e:
+                logger.error(f"Не удалось перенести отметки в журнал {journal_file}: {e}")
+                continue
+            # Пропущенные отметки (нет студента или даты в журнале) тоже убираются из файла
+            done.append((group_name, subject))
+            written += len(marks) - len(skipped)
+
+        with self.lock:
+            self.refresh()
+            for key in done:
+                current = self._pending.get(key, {})
+                for cell, value in snapshot[key].items():
+                    # Ячейку, перезаписанную во время переноса, оставляем для следующего раза
+                    if cell in current and current[cell] == value:
+                        del current[cell]
+            self._rewrite()
+        if written:
+            logger.info(f"Перенесено отметок в журналы: {written}")
+        return written
+
+    def _rewrite(self):
+        """Заменяет файл оставшимися отметками (атомарно через временный файл)"""
+        tmp_path = f"{self.log_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            for (group_name, subject), marks in self._pending.items():
+                for (fio, date_key), value in marks.items():
+                    event = {'group': group_name, 'subject': subject, 'student': fio, 'date': date_key, 'value': value}
+                    f.write((json.dumps(event, ensure_ascii=False) + "\n").encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.log_path)
+        self._pending = {key: marks for key, marks in self._pending.items() if marks}
+        self._file_id = self._file_identity()
+        self._offset = self._file_id[1] if self._file_id else 0
+
+
+def check_mark_target(journals_path: str, group_name: str, subject: str, student_fio: str, date_key: str):
+    """Проверяет, что отметку есть куда записать, иначе ValueError
+
+    Студент должен быть в списке группы (студенты.xlsx), дата — в строке
+    заголовков журнала предмета: журнал отметок не добавляет строк и столбцов.
+    """
+    group_path = os.path.join(journals_path, group_name)
+    journal_file = os.path.join(group_path, f"{subject}.xlsx")
+    if not os.path.isfile(journal_file):
+        raise ValueError(f"Нет журнала {subject} группы {group_name}")
+    students_file = os.path.join(group_path, STUDENTS_FILE)
+    roster = set()
+    if os.path.isfile(students_file):
+        roster = {roster_fio(row) for row in read_sheet_rows(students_file, READER_EXPAT, min_row=2)}
+    if student_fio not in roster:
+        raise ValueError(f"Студент {student_fio} не найден в списке группы {group_name}")
+    if date_key not in {header_date_key(value) for value in read_header_row(journal_file)[1:]}:
+        raise ValueError(f"В журнале {subject} группы {group_name} нет занятия {date_key}")
+
+
+def write_marks(journal_file: str, marks: List[Mark], strict: bool = False, first_column: int = 2) -> List[Mark]:
+    """Записывает отметки в существующие ячейки xlsx-журнала предмета одним сохранением
+
+    Студент ищется по ФИО в столбце A, занятие — по дате в строке заголовков
+    начиная со столбца first_column (по умолчанию B; первый подходящий
+    столбец). Строки и столбцы не
+    добавляются: отметки для студентов и дат, которых нет в журнале,
+    пропускаются с предупреждением в логе и возвращаются. При strict=True
+    такие отметки — ошибка (ValueError), и файл не меняется. Файл заменяется
+    атомарно.
+    """
+    wb = load_workbook(journal_file)
+    ws = wb.active
+    rows = {}
+    for row_idx, (fio,) in enumerate(ws.iter_rows(min_row=2, max_col=1, values_only=True), 2):
+        if fio is not None:
+            rows.setdefault(fio, row_idx)
+    columns = {}
+    for col_idx, (value,) in enumerate(ws.iter_cols(min_col=first_column, max_row=1, values_only=True), first_column):
+        key = header_date_key(value)
+        if key is not None:
+            columns.setdefault(key, col_idx)
+
+    cells = []
+    skipped = []
+    for fio, date_key, value in marks:
+        row_idx, col_idx = rows.get(fio), columns.get(date_key)
+        if row_idx is None or col_idx is None:
+            skipped.append((fio, date_key, value))
+        else:
+            cells.append((row_idx, col_idx, value))
+    if skipped:
+        missing = ", ".join(f"{fio} {date_key}" for fio, date_key, _ in skipped[:10])
+        if strict:
+            raise ValueError(f"В журнале {journal_file} нет студентов или дат для отметок: {missing}")
+        logger.warning(f"Пропущены отметки без студента или даты в журнале {journal_file}: {missing}")
+    if not cells:
+        return skipped
+
+    for row_idx, col_idx, value in cells:
+        ws.cell(row=row_idx, column=col_idx, value=value)
+
+    # Суффикс не .xlsx: копию, оставшуюся после сбоя, не примут за журнал, и ее удалит recover_mutations
+    tmp_path = journal_file + TMP_SUFFIX
+    try:
+        save_durable(wb, tmp_path)
+        os.replace(tmp_path, journal_file)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return skipped
+
+
+def main():
+    """Перенос журнала отметок в xlsx: python mark_log.py <журнал отметок> [папка журналов] [журналов за раз]"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if len(sys.argv) < 2:
+        print(main.__doc__)
+        return
+    log = MarkLog(sys.argv[1])
+    journals_path = sys.argv[2] if len(sys.argv) > 2 else "Журналы/1 Курс"
+    batch_size = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    recover_mutations(journals_path)
+    print(f"Отметок к переносу: {len(log)}")
+    while len(log):
+        if not log.compact(journals_path, batch_size):
+            break
+    print(f"Осталось отметок: {len(log)}")
+
+
+if __name__ == "__main__":
+    main()
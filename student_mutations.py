@@ -0,0 +1,349 @@
+import json
+import os
+from openpyxl import load_workbook
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from core_model import STUDENTS_FILE
+from journal_matrix import header_date_key
+
+# Операции пакета: ("move", ФИО, из группы, в группу) и ("expel", ФИО, группа)
+MOVE = "move"
+EXPEL = "expel"
+
+# Журнал восстановления: список пар (временный файл, файл) подготовленного пакета
+RECOVERY_FILE = ".изменения_студентов.json"
+TMP_SUFFIX = ".mut.tmp"
+
+
+def split_fio(student_fio: str) -> List[str]:
+    """Делит ФИО на фамилию, имя и отчество (отчество может состоять из нескольких слов)"""
+    parts = student_fio.split()
+    if len(parts) < 3:
+        raise ValueError(f"Некорректное ФИО: {student_fio}")
+    return [parts[0], parts[1], " ".join(parts[2:])]
+
+
+def group_path(journals_path: str, group_name: str) -> str:
+    """Возвращает путь к папке группы или выбрасывает ValueError, если группы нет"""
+    path = os.path.join(journals_path, group_name)
+    if not group_name or not os.path.isdir(path):
+        raise ValueError(f"Не существует {group_name}")
+    return path
+
+
+def roster_fio(row: Sequence[Any]) -> Optional[str]:
+    """ФИО строки списка студентов (№, Фамилия, Имя, Отчество)"""
+    if row and len(row) > 3 and row[1] and row[2] and row[3]:
+        return f"{row[1]} {row[2]} {row[3]}"
+    return None
+
+
+def journal_fio(row: Sequence[Any]) -> Optional[str]:
+    """ФИО строки журнала предмета (столбец A)"""
+    return row[0] if row else None
+
+
+def renumber_roster(ws):
+    """Перенумеровывает столбец № в списке студентов"""
+    for number, row_idx in enumerate(range(2, ws.max_row + 1), 1):
+        ws.cell(row=row_idx, column=1, value=number)
+
+
+def subject_files(path: str) -> List[str]:
+    """Файлы журналов предметов в папке группы"""
+    return sorted(
+        file for file in os.listdir(path)
+        if file.endswith('.xlsx') and file != STUDENTS_FILE and not file.startswith('~$')
+    )
+
+
+class SheetRows:
+    """Строки листа (со 2-й) с отложенными изменениями
+
+    Удаления и добавления копятся в памяти, а к листу применяются один раз
+    в apply(): удаленные строки убираются блоками снизу вверх, новые
+    дописываются в конец — как при поочередных delete_rows и добавлении
+    строки в прежней версии.
+    """
+
+    def __init__(self, ws, fio_of: Callable[[Sequence[Any]], Optional[str]]):
+        self.ws = ws
+        self.rows: List[Any] = []  # номер исходной строки или данные добавленной
+        self.fios: List[Optional[str]] = []
+        for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), 2):
+            self.rows.append(row_idx)
+            self.fios.append(fio_of(row))
+        self.original = set(self.rows)
+
+    def find(self, student_fio: str) -> Optional[int]:
+        try:
+            return self.fios.index(student_fio)
+        except ValueError:
+            return None
+
+    def pop(self, position: int) -> Any:
+        self.fios.pop(position)
+        return self.rows.pop(position)
+
+    def append(self, student_fio: str, data: Any):
+        self.fios.append(student_fio)
+        self.rows.append(data)
+
+    def apply(self, write_row: Callable[[int, Any], None]):
+        """Применяет изменения к листу; write_row(номер строки, данные) заполняет новую строку"""
+        removed = sorted(self.original.difference(row for row in self.rows if isinstance(row, int)), reverse=True)
+        idx = 0
+        while idx < len(removed):
+            start = removed[idx]
+            amount = 1
+            while idx + amount < len(removed) and removed[idx + amount] == start - amount:
+                amount += 1
+            self.ws.delete_rows(start - amount + 1, amount)
+            idx += amount
+
+        next_row = self.ws.max_row + 1
+        for data in self.rows:
+            if not isinstance(data, int):
+                write_row(next_row, data)
+                next_row += 1
+
+
+def _write_roster_row(ws, row_idx: int, parts: List[str]):
+    """Заполняет фамилию, имя и отчество в строке списка (№ проставит renumber_roster)"""
+    for col, value in enumerate(parts, 2):
+        ws.cell(row=row_idx, column=col, value=value)
+
+
+def _header_keys(ws) -> Dict[int, str]:
+    """Столбец -> дата заголовка (ДД.ММ.ГГГГ) для столбцов со 2-го"""
+    keys = {}
+    for col in range(2, ws.max_column + 1):
+        key = header_date_key(ws.cell(row=1, column=col).value)
+        if key:
+            keys[col] = key
+    return keys
+
+
+class _Journal:
+    """Журнал предмета группы, открытый для пакетного изменения"""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.wb = load_workbook(file_path)
+        self.ws = self.wb.active
+        self.header_keys = _header_keys(self.ws)
+        self.rows = SheetRows(self.ws, journal_fio)
+
+    def take_marks(self, student_fio: str) -> Optional[Dict[str, Any]]:
+        """Убирает строку студента и возвращает его отметки {дата: значение} (None — строки нет)"""
+        position = self.rows.find(student_fio)
+        if position is None:
+            return None
+        row = self.rows.pop(position)
+        if not isinstance(row, int):
+            return row[1]  # строка, добавленная ранее в этом же пакете
+        marks = {}
+        for col, key in self.header_keys.items():
+            value = self.ws.cell(row=row, column=col).value
+            if value is not None:
+                marks[key] = value
+        return marks
+
+    def write_row(self, row_idx: int, data: Tuple[str, Dict[str, Any]]):
+        student_fio, marks = data
+        self.ws.cell(row=row_idx, column=1, value=student_fio)
+        for col, key in self.header_keys.items():
+            if key in marks:
+                self.ws.cell(row=row_idx, column=col, value=marks[key])
+
+    def save(self, target_path: str):
+        self.rows.apply(self.write_row)
+        save_durable(self.wb, target_path)
+
+
+def save_durable(wb, path: str):
+    """Сохраняет книгу и сбрасывает файл на диск (fsync) — перед атомарной заменой"""
+    wb.save(path)
+    with open(path, 'rb') as f:
+        os.fsync(f.fileno())
+
+
+def _fsync_dir(path: str):
+    """Сбрасывает на диск переименования в папке (где ОС это поддерживает)"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def normalize_operations(journals_path: str, operations: Iterable[Sequence[str]]) -> List[Tuple[str, ...]]:
+    """Проверяет операции пакета (существование групп, формат) до любых изменений"""
+    result = []
+    for operation in operations:
+        kind = operation[0] if operation else None
+        if kind == MOVE and len(operation) == 4:
+            _, student_fio, from_group, to_group = operation
+            if group_path(journals_path, from_group) == group_path(journals_path, to_group):
+                raise ValueError("Исходная и новая группа совпадают")
+            split_fio(student_fio)
+        elif kind == EXPEL and len(operation) == 3:
+            _, student_fio, from_group = operation
+            group_path(journals_path, from_group)
+        else:
+            raise ValueError(f"Неизвестная операция: {operation}")
+        result.append(tuple(operation))
+    return result
+
+
+def _plan_rosters(journals_path: str, operations: List[Tuple[str, ...]], groups: List[str]) -> Dict[str, Any]:
+    """Применяет операции к спискам групп в памяти; ошибки (нет студента) — до записи файлов"""
+    rosters = {}
+    for group_name in groups:
+        wb = load_workbook(os.path.join(journals_path, group_name, STUDENTS_FILE))
+        rosters[group_name] = (wb, SheetRows(wb.active, roster_fio))
+
+    for operation in operations:
+        student_fio, from_group = operation[1], operation[2]
+        rows = rosters[from_group][1]
+        position = rows.find(student_fio)
+        if position is None:
+            raise ValueError(f"Студент {student_fio} не найден в группе {from_group}")
+        rows.pop(position)
+        if operation[0] == MOVE:
+            rosters[operation[3]][1].append(student_fio, split_fio(student_fio))
+    return rosters
+
+
+def recover_mutations(journals_path: str) -> int:
+    """Завершает пакет, прерванный сбоем, и удаляет временные файлы
+
+    Если журнал восстановления записан, все временные файлы пакета уже
+    готовы — переименования доводятся до конца. Иначе пакет не начинал
+    замену файлов, и временные файлы просто удаляются. Возвращает число
+    восстановленных файлов.
+    """
+    recovered = 0
+    recovery_path = os.path.join(journals_path, RECOVERY_FILE)
+    if os.path.exists(recovery_path):
+        with open(recovery_path, encoding='utf-8') as f:
+            files = json.load(f)
+        for tmp_name, target_name in files:
+            tmp_path = os.path.join(journals_path, tmp_name)
+            if os.path.exists(tmp_path):
+                os.replace(tmp_path, os.path.join(journals_path, target_name))
+                recovered += 1
+        os.remove(recovery_path)
+
+    if os.path.isdir(journals_path):
+        for group_name in os.listdir(journals_path):
+            path = os.path.join(journals_path, group_name)
+            if os.path.isdir(path):
+                for file in os.listdir(path):
+                    if file.endswith(TMP_SUFFIX):
+                        os.remove(os.path.join(path, file))
+    return recovered
+
+
+def _commit(journals_path: str, files: List[Tuple[str, str]]):
+    """Атомарно заменяет файлы подготовленными копиями через журнал восстановления"""
+    recovery_path = os.path.join(journals_path, RECOVERY_FILE)
+    entries = [[os.path.relpath(tmp, journals_path), os.path.relpath(target, journals_path)] for tmp, target in files]
+    with open(f"{recovery_path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(entries, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    # Точка фиксации: после появления журнала пакет будет доведен до конца
+    os.replace(f"{recovery_path}.tmp", recovery_path)
+    _fsync_dir(journals_path)
+
+    for tmp, target in files:
+        os.replace(tmp, target)
+    for directory in {os.path.dirname(target) for _, target in files}:
+        _fsync_dir(directory)
+    os.remove(recovery_path)
+
+
+def apply_mutations(journals_path: str, operations: Iterable[Sequence[str]]) -> Dict[str, int]:
+    """Применяет пакет переводов и отчислений, переписывая каждый файл один раз
+
+    Операции выполняются по порядку, как если бы вызывались move_student и
+    expel_student по одной: отметки переносятся в журналы новой группы по
+    совпадающим датам. Сначала все изменения готовятся во временных файлах,
+    затем файлы заменяются переименованием; сбой между этими шагами
+    исправляет recover_mutations(). При ошибке в любой операции ни один
+    файл не меняется.
+    """
+    recover_mutations(journals_path)
+    operations = normalize_operations(journals_path, operations)
+    if not operations:
+        return {'moved': 0, 'expelled': 0, 'files': 0}
+
+    groups = sorted({group for operation in operations for group in operation[2:]})
+    rosters = _plan_rosters(journals_path, operations, groups)
+
+    prepared: List[Tuple[str, str]] = []
+    try:
+        subjects = sorted({file for group_name in groups for file in subject_files(os.path.join(journals_path, group_name))})
+        for file in subjects:
+            # Журналы одного предмета всех затронутых групп держатся в памяти вместе
+            journals = {
+                group_name: _Journal(os.path.join(journals_path, group_name, file))
+                for group_name in groups
+                if os.path.exists(os.path.join(journals_path, group_name, file))
+            }
+            changed = set()
+            for operation in operations:
+                student_fio, from_group = operation[1], operation[2]
+                source = journals.get(from_group)
+                marks = source.take_marks(student_fio) if source else None
+                if marks is None:
+                    continue
+                changed.add(from_group)
+                target = journals.get(operation[3]) if operation[0] == MOVE else None
+                if target:
+                    target.rows.append(student_fio, (student_fio, marks))
+                    changed.add(operation[3])
+
+            for group_name in sorted(changed):
+                journal = journals[group_name]
+                tmp_path = journal.file_path + TMP_SUFFIX
+                journal.save(tmp_path)
+                prepared.append((tmp_path, journal.file_path))
+
+        for group_name, (wb, rows) in rosters.items():
+            rows.apply(lambda row_idx, parts, ws=wb.active: _write_roster_row(ws, row_idx, parts))
+            renumber_roster(wb.active)
+            target_path = os.path.join(journals_path, group_name, STUDENTS_FILE)
+            save_durable(wb, target_path + TMP_SUFFIX)
+            prepared.append((target_path + TMP_SUFFIX, target_path))
+    except Exception:
+        for tmp_path, _ in prepared:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        raise
+
+    _commit(journals_path, prepared)
+    return {
+        'moved': sum(1 for operation in operations if operation[0] == MOVE),
+        'expelled': sum(1 for operation in operations if operation[0] == EXPEL),
+        'files': len(prepared),
+    }
+
+
+def move_student(journals_path: str, student_fio: str, from_group: str, to_group: str):
+    """Переводит студента в другую группу вместе с его отметками
+
+    Отметки переносятся в журналы новой группы по совпадающим датам.
+    """
+    apply_mutations(journals_path, [(MOVE, student_fio, from_group, to_group)])
+
+
+def expel_student(journals_path: str, student_fio: str, group_name: str):
+    """Отчисляет студента: удаляет его из списка группы и из всех журналов"""
+    apply_mutations(journals_path, [(EXPEL, student_fio, group_name)])
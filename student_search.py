@@ -0,0 +1,237 @@
+import os
+import re
+import time
+import numpy as np
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from core_model import STUDENTS_FILE
+
+# Раскладка QWERTY -> ЙЦУКЕН для запросов, набранных не в той раскладке
+_LAYOUT_LATIN = "qwertyuiop[]asdfghjkl;'zxcvbnm,.`"
+_LAYOUT_CYRILLIC = "йцукенгшщзхъфывапролджэячсмитьбюё"
+LAYOUT_TABLE = str.maketrans(_LAYOUT_LATIN + _LAYOUT_LATIN.upper(), _LAYOUT_CYRILLIC + _LAYOUT_CYRILLIC.upper())
+
+_LATIN_RE = re.compile(r"[a-z\[\];',.`]", re.IGNORECASE)
+_CYRILLIC_RE = re.compile(r"[а-яё]", re.IGNORECASE)
+_SEPARATORS_RE = re.compile(r"[^\w-]+")
+
+# Латинские буквы, похожие на русские (опечатки при смешанном вводе)
+HOMOGLYPH_TABLE = str.maketrans("aeopcxykmthb", "аеорсхукмтнв")
+
+# Оценка для совпадения запроса с подстрокой ФИО (как в прежнем поиске)
+SUBSTRING_SCORE = 0.8
+# Оценка слова, с которого начинается слово ФИО
+PREFIX_SCORE = 0.95
+# Доля оценки за совпадение позиции слова в ФИО
+POSITION_WEIGHT = 0.1
+
+
+def normalize_text(text: str) -> str:
+    """Нормализует строку для поиска: регистр, ё -> е, латиница в русских словах, лишние символы"""
+    text = str(text).casefold()
+    tokens = _SEPARATORS_RE.sub(" ", text).split()
+    return " ".join(fix_homoglyphs(token).replace("ё", "е") for token in tokens)
+
+
+def fix_keyboard_layout(text: str) -> str:
+    """Переводит символы, набранные в английской раскладке, в русскую"""
+    return text.translate(LAYOUT_TABLE)
+
+
+def token_trigrams(token: str) -> Set[str]:
+    """Триграммы слова с границами (для коротких слов тоже есть хотя бы одна)"""
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def fix_homoglyphs(token: str) -> str:
+    """Заменяет похожие латинские буквы на русские в словах со смешанным алфавитом"""
+    if _LATIN_RE.search(token) and _CYRILLIC_RE.search(token):
+        return token.translate(HOMOGLYPH_TABLE)
+    return token
+
+
+def token_similarity(query_token: str, token: str, query_grams: Set[str], token_grams: Set[str]) -> float:
+    """Схожесть слов: совпадение — 1, начало слова — почти 1, иначе коэффициент Дайса по триграммам"""
+    if token == query_token:
+        return 1.0
+    if token.startswith(query_token):
+        return PREFIX_SCORE
+    shared = len(query_grams & token_grams)
+    return 2.0 * shared / (len(query_grams) + len(token_grams))
+
+
+def match_tokens(query_tokens: List[Tuple[str, Set[str]]], doc_tokens: List[Tuple[str, Set[str]]], cache: Dict[Tuple[int, str], float]) -> float:
+    """Сопоставляет слова запроса словам ФИО (каждое слово ФИО — не больше одного раза)
+
+    Итог — средняя схожесть сопоставленных слов с небольшой добавкой за совпадение
+    позиции (фамилия к фамилии, имя к имени). cache хранит уже посчитанные пары
+    слов в рамках одного запроса: имена и отчества у студентов часто повторяются.
+    """
+    pairs = []
+    for qi, (query_token, query_grams) in enumerate(query_tokens):
+        for di, (token, token_grams) in enumerate(doc_tokens):
+            similarity = cache.get((qi, token))
+            if similarity is None:
+                similarity = token_similarity(query_token, token, query_grams, token_grams)
+                cache[(qi, token)] = similarity
+            pairs.append((similarity, qi, di))
+    pairs.sort(reverse=True)
+
+    used_query, used_doc = set(), set()
+    total = 0.0
+    same_position = 0
+    for similarity, qi, di in pairs:
+        if qi in used_query or di in used_doc:
+            continue
+        used_query.add(qi)
+        used_doc.add(di)
+        total += similarity
+        same_position += qi == di
+    return (1 - POSITION_WEIGHT) * total / len(query_tokens) + POSITION_WEIGHT * same_position / len(query_tokens)
+
+
+class StudentSearchIndex:
+    """Индекс поиска студентов по ФИО с допуском опечаток
+
+    Построен на инвертированном индексе триграмм. Кандидаты отбираются по
+    числу общих триграмм, затем ранжируются по схожести слов запроса со словами
+    ФИО. Файлы студенты.xlsx проверяются по mtime, и при изменении
+    переиндексируется только соответствующая группа.
+    """
+
+    def __init__(self, journals_path: str, read_students: Callable[[str], List[str]], refresh_interval: float = 1.0):
+        self.journals_path = journals_path
+        self.read_students = read_students  # группа -> список ФИО (без кэша)
+        self.refresh_interval = refresh_interval
+
+        self.docs: Dict[int, Tuple[str, str, str, List[Tuple[str, Set[str]]]]] = {}
+        self.postings: Dict[str, Set[int]] = {}
+        self._posting_arrays: Dict[str, np.ndarray] = {}
+        self.group_docs: Dict[str, List[int]] = {}
+        self.group_mtimes: Dict[str, float] = {}
+        self._next_id = 0
+        self._last_refresh = 0.0
+
+    def _students_file(self, group_name: str) -> str:
+        return os.path.join(self.journals_path, group_name, STUDENTS_FILE)
+
+    def _add_doc(self, group_name: str, fio: str) -> int:
+        doc_id = self._next_id
+        self._next_id += 1
+        normalized = normalize_text(fio)
+        tokens = [(token, token_trigrams(token)) for token in normalized.split()]
+        self.docs[doc_id] = (group_name, fio, normalized, tokens)
+        for _, grams in tokens:
+            for gram in grams:
+                self.postings.setdefault(gram, set()).add(doc_id)
+                self._posting_arrays.pop(gram, None)
+        return doc_id
+
+    def _remove_group(self, group_name: str):
+        for doc_id in self.group_docs.pop(group_name, []):
+            _, _, _, tokens = self.docs.pop(doc_id)
+            for _, grams in tokens:
+                for gram in grams:
+                    posting = self.postings.get(gram)
+                    if posting is not None:
+                        posting.discard(doc_id)
+                        if not posting:
+                            del self.postings[gram]
+                    self._posting_arrays.pop(gram, None)
+        self.group_mtimes.pop(group_name, None)
+
+    def refresh(self, force: bool = False):
+        """Переиндексирует группы, у которых изменился файл студенты.xlsx"""
+        now = time.monotonic()
+        if not force and now - self._last_refresh < self.refresh_interval:
+            return
+        self._last_refresh = now
+
+        if not os.path.exists(self.journals_path):
+            return
+
+        groups = [item for item in os.listdir(self.journals_path) if os.path.isdir(os.path.join(self.journals_path, item))]
+        for group_name in set(self.group_docs) - set(groups):
+            self._remove_group(group_name)
+
+        for group_name in groups:
+            students_file = self._students_file(group_name)
+            mtime = os.path.getmtime(students_file) if os.path.exists(students_file) else None
+            if group_name in self.group_docs and self.group_mtimes.get(group_name) == mtime:
+                continue
+
+            self._remove_group(group_name)
+            self.group_docs[group_name] = [self._add_doc(group_name, fio) for fio in self.read_students(group_name)]
+            self.group_mtimes[group_name] = mtime
+
+    def _posting_array(self, gram: str) -> Optional[np.ndarray]:
+        posting = self.postings.get(gram)
+        if not posting:
+            return None
+        array = self._posting_arrays.get(gram)
+        if array is None:
+            array = np.fromiter(posting, dtype=np.int64, count=len(posting))
+            self._posting_arrays[gram] = array
+        return array
+
+    def _search_variant(self, query: str, max_candidates: Optional[int]) -> Dict[int, float]:
+        """Ищет по одному варианту нормализованного запроса, возвращает {doc_id: оценка}"""
+        query_tokens = [(token, token_trigrams(token)) for token in query.split()]
+        if not query_tokens:
+            return {}
+
+        query_grams = set().union(*(grams for _, grams in query_tokens))
+        arrays = [array for array in (self._posting_array(gram) for gram in query_grams) if array is not None]
+        if arrays:
+            counts = np.bincount(np.concatenate(arrays), minlength=self._next_id)
+            candidates = np.flatnonzero(counts)
+            if max_candidates is not None and len(candidates) > max_candidates:
+                top = np.argpartition(counts[candidates], -max_candidates)[-max_candidates:]
+                candidates = candidates[top]
+            candidates = candidates.tolist()
+        else:
+            candidates = []
+
+        scores = {}
+        similarity_cache = {}
+        for doc_id in candidates:
+            doc = self.docs.get(doc_id)
+            if doc is None:
+                continue
+            _, _, normalized, doc_tokens = doc
+            score = match_tokens(query_tokens, doc_tokens, similarity_cache)
+            if query in normalized:
+                score = max(score, SUBSTRING_SCORE)
+            scores[doc_id] = score
+        return scores
+
+    def search(self, query: str, limit: Optional[int] = 20, min_similarity: float = 0.5, max_candidates: Optional[int] = 50) -> List[Tuple[str, str, float]]:
+        """Ищет студентов по ФИО, возвращает [(группа, ФИО, схожесть)] по убыванию схожести
+
+        limit=None и max_candidates=None снимают ограничения на выдачу и число проверяемых
+        кандидатов; с limit=None в выдачу попадают все ФИО, содержащие запрос как подстроку.
+        """
+        self.refresh()
+
+        normalized = normalize_text(query)
+        if not normalized:
+            return []
+
+        scores = self._search_variant(normalized, max_candidates)
+        if limit is None or len(normalized) < 3:
+            # Триграммы не находят подстроку внутри слова ("ов" в "Петрович"), поэтому для
+            # полной выдачи и коротких запросов все ФИО проверяются на подстроку, как в прежнем поиске
+            for doc_id, (_, _, doc_normalized, _) in self.docs.items():
+                if normalized in doc_normalized:
+                    scores[doc_id] = max(SUBSTRING_SCORE, scores.get(doc_id, 0.0))
+        if _LATIN_RE.search(query):
+            layout_query = normalize_text(fix_keyboard_layout(query))
+            for doc_id, score in self._search_variant(layout_query, max_candidates).items():
+                scores[doc_id] = max(score, scores.get(doc_id, 0.0))
+
+        ranked = sorted(
+            (item for item in scores.items() if item[1] >= min_similarity),
+            key=lambda item: (-item[1], self.docs[item[0]][1]),
+        )
+        return [(self.docs[doc_id][0], self.docs[doc_id][1], round(score, 3)) for doc_id, score in ranked[:limit]]
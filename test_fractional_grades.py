@@ -0,0 +1,80 @@
+"""Дробные оценки (4.5, 3.6) должны попадать в средние баллы точными значениями, как в исходном gen_final"""
+import os
+from datetime import datetime
+
+import numpy as np
+from openpyxl import Workbook
+
+from gen_final import MonthlyAssessmentGenerator
+from journal_matrix import JournalDiskCache, JournalMatrix
+from journal_store import JournalStore
+
+HEADER = ["ФИО", None, "02.09.2025", "03.09.2025", "04.09.2025", "05.09.2025"]
+ROWS = [
+    ["Иванов Иван Иванович", None, 4.5, 3.6, 5, "Н"],
+    ["Петров Петр Петрович", None, 4, 5, None, 3],
+]
+# Сумма подряд, как sum() по списку оценок в исходном gen_final
+IVANOV_SUM = sum([4.5, 3.6, 5])
+
+
+def make_tree(root):
+    group_path = os.path.join(root, "Журналы", "ГР-101")
+    os.makedirs(group_path)
+    wb = Workbook()
+    wb.active.append(["№", "Фамилия", "Имя", "Отчество"])
+    for idx, row in enumerate(ROWS, 1):
+        wb.active.append([idx] + row[0].split())
+    wb.save(os.path.join(group_path, "студенты.xlsx"))
+    wb = Workbook()
+    for row in [HEADER] + ROWS:
+        wb.active.append(row)
+    wb.save(os.path.join(group_path, "Математика.xlsx"))
+    return os.path.join(root, "Журналы")
+
+
+def test_matrix_keeps_fractional_grades(tmp_path):
+    matrix = JournalMatrix.from_rows([HEADER] + ROWS)
+    students = [ROWS[0][0], ROWS[1][0]]
+
+    assert matrix.codes[0, :3].tolist() == [4, 3, 5]
+    summary = matrix.summarize_columns(students)
+    assert summary['grade_sum'].tolist() == [IVANOV_SUM, 12]
+    assert summary['grade_count'].tolist() == [3, 3]
+    ranged = matrix.summarize_range(students, datetime(2025, 9, 2), datetime(2025, 9, 3))
+    assert ranged['grade_sum'].tolist() == [4.5 + 3.6, 9]
+
+    marked = matrix.with_marks([(ROWS[1][0], "03.09.2025", 2.5)])
+    assert marked.summarize_columns(students)['grade_sum'].tolist() == [IVANOV_SUM, 4 + 2.5 + 3]
+
+    journal_file = tmp_path / "Математика.xlsx"
+    journal_file.write_bytes(b"journal")
+    cache = JournalDiskCache(str(tmp_path / "cache"))
+    cache.put(str(journal_file), matrix)
+    assert np.array_equal(cache.get(str(journal_file)).grades, matrix.grades)
+
+
+def test_integer_journal_has_no_grade_matrix():
+    matrix = JournalMatrix.from_rows([HEADER, ROWS[1]])
+    assert matrix.grades is None
+    assert matrix.summarize_columns([ROWS[1][0]])['grade_sum'].dtype == np.int64
+
+
+def test_generator_and_store_average_exact_grades(tmp_path):
+    journals_path = make_tree(str(tmp_path))
+    generator = MonthlyAssessmentGenerator(journals_path, str(tmp_path / "Итог"), cache_folder=None)
+    students = generator.get_students_from_group("ГР-101")
+
+    grades = generator.get_all_student_grades("ГР-101", ROWS[0][0])["Математика"]
+    assert grades['grades'] == [4.5, 3.6, 5]
+    assert grades['absences'] == 1
+    stats = generator.get_student_period_stats("ГР-101", ROWS[0][0], datetime(2025, 9, 1), datetime(2025, 9, 30))
+    assert stats["Математика"]['grade_sum'] == IVANOV_SUM
+
+    store = JournalStore(str(tmp_path / "store.db"))
+    try:
+        store.import_tree(journals_path, ["Математика"])
+        summary = store.summarize_group("ГР-101", len(students))["Математика"]
+        assert summary['grade_sum'].tolist() == [IVANOV_SUM, 12]
+    finally:
+        store.close()
@@ -0,0 +1,251 @@
+import hashlib
+import os
+import re
+import shutil
+import threading
+import zipfile
+from typing import Callable, Iterable, Iterator, Optional, Set
+
+# Части книги, которые переписываются; остальные копируются без изменений
+WORKSHEET_RE = re.compile(r"^xl/worksheets/[^/]+\.xml$")
+SHARED_STRINGS_PART = "xl/sharedStrings.xml"
+
+ROW_RE = re.compile(rb"<row\b[^>]*?(?:/>|>.*?</row>)", re.S)
+ROW_START_RE = re.compile(rb"<row\b")
+ROW_NUMBER_RE = re.compile(rb'^<row\b[^>]*?\br="(\d+)"')
+CELL_RE = re.compile(rb"<c\b([^>]*?)(?:/>|>(.*?)</c>)", re.S)
+CELL_REF_RE = re.compile(rb'\br="([A-Z]+)\d+"')
+CELL_STYLE_RE = re.compile(rb'\bs="\d+"')
+SHARED_TYPE_RE = re.compile(rb'\bt="s"')
+VALUE_RE = re.compile(rb"<v>([^<]*)</v>")
+SI_RE = re.compile(rb"<si\b[^>]*?(?:/>|>.*?</si>)", re.S)
+SI_START_RE = re.compile(rb"<si\b")
+
+CHUNK_SIZE = 1 << 16
+
+
+def stream_elements(chunks: Iterable[bytes], element_re, start_re, transform: Callable[[bytes], bytes]) -> Iterator[bytes]:
+    """Потоково применяет transform к элементам XML, найденным element_re
+
+    В памяти держится только текущий фрагмент и недочитанный элемент,
+    весь остальной текст выдается без изменений.
+    """
+    buffer = b""
+    for chunk in chunks:
+        buffer += chunk
+        last = 0
+        for match in element_re.finditer(buffer):
+            if match.start() > last:
+                yield buffer[last:match.start()]
+            yield transform(match.group())
+            last = match.end()
+        buffer = buffer[last:]
+
+        # Хвост без начала элемента можно отдать, оставив возможное начало тега
+        start = start_re.search(buffer)
+        keep = start.start() if start else buffer.rfind(b"<")
+        if keep > 0:
+            yield buffer[:keep]
+            buffer = buffer[keep:]
+        elif keep < 0:
+            yield buffer
+            buffer = b""
+    if buffer:
+        yield buffer
+
+
+def read_chunks(f) -> Iterator[bytes]:
+    return iter(lambda: f.read(CHUNK_SIZE), b"")
+
+
+class _FioColumnScanner:
+    """Отслеживает блок студентов на листе: строки со 2-й до первой пустой ячейки A
+
+    Так же выбирает строки и прежняя версия на openpyxl.
+    """
+
+    def __init__(self):
+        self.expected_row = 2
+        self.active = True
+        self.row_number = 0
+
+    def fio_cell(self, row: bytes) -> Optional[re.Match]:
+        """Ячейка ФИО строки, если ее нужно очистить"""
+        match = ROW_NUMBER_RE.match(row)
+        self.row_number = int(match.group(1)) if match else self.row_number + 1
+        if not self.active or self.row_number < 2:
+            return None
+
+        cell = self._column_a(row)
+        if self.row_number != self.expected_row or cell is None or not _has_value(cell):
+            self.active = False
+            return None
+        self.expected_row += 1
+        return cell
+
+    @staticmethod
+    def _column_a(row: bytes) -> Optional[re.Match]:
+        for position, cell in enumerate(CELL_RE.finditer(row)):
+            ref = CELL_REF_RE.search(cell.group(1))
+            column = ref.group(1) if ref else (b"A" if position == 0 else None)
+            return cell if column == b"A" else None
+        return None
+
+
+def _has_value(cell: re.Match) -> bool:
+    content = cell.group(2)
+    return bool(content) and (b"<v>" in content or b"<is>" in content or b"<v " in content)
+
+
+def _shared_index(cell: re.Match) -> Optional[int]:
+    if not SHARED_TYPE_RE.search(cell.group(1)):
+        return None
+    value = VALUE_RE.search(cell.group(2) or b"")
+    return int(value.group(1)) if value else None
+
+
+def _blank_cell(cell: re.Match) -> bytes:
+    """Пустая ячейка с тем же адресом и стилем"""
+    attrs = cell.group(1)
+    ref = re.search(rb'\br="[A-Z]+\d+"', attrs)
+    style = CELL_STYLE_RE.search(attrs)
+    parts = [part.group() for part in (ref, style) if part]
+    return b"<c " + b" ".join(parts) + b"/>" if parts else b"<c/>"
+
+
+def collect_shared_indices(zin: zipfile.ZipFile, sheet_names: Iterable[str]):
+    """Первый проход: индексы общих строк в ячейках ФИО и во всех остальных ячейках"""
+    fio_indices: Set[int] = set()
+    other_indices: Set[int] = set()
+    for name in sheet_names:
+        scanner = _FioColumnScanner()
+
+        def scan_row(row: bytes) -> bytes:
+            fio = scanner.fio_cell(row)
+            for cell in CELL_RE.finditer(row):
+                index = _shared_index(cell)
+                if index is None:
+                    continue
+                if fio is not None and cell.start() == fio.start():
+                    fio_indices.add(index)
+                else:
+                    other_indices.add(index)
+            return b""
+
+        with zin.open(name) as f:
+            for _ in stream_elements(read_chunks(f), ROW_RE, ROW_START_RE, scan_row):
+                pass
+    return fio_indices, other_indices
+
+
+def anonymize_sheet(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    scanner = _FioColumnScanner()
+
+    def blank_row(row: bytes) -> bytes:
+        cell = scanner.fio_cell(row)
+        if cell is None:
+            return row
+        return row[:cell.start()] + _blank_cell(cell) + row[cell.end():]
+
+    return stream_elements(chunks, ROW_RE, ROW_START_RE, blank_row)
+
+
+def anonymize_shared_strings(chunks: Iterable[bytes], blank_indices: Set[int]) -> Iterator[bytes]:
+    """Очищает выбранные общие строки, сохраняя их число и порядок (индексы ячеек не меняются)"""
+    counter = iter(range(1 << 62))
+
+    def blank_si(si: bytes) -> bytes:
+        return b"<si><t></t></si>" if next(counter) in blank_indices else si
+
+    return stream_elements(chunks, SI_RE, SI_START_RE, blank_si)
+
+
+def anonymize_xlsx(source_path: str, target_path: str):
+    """Копия книги без ФИО в столбце A на всех листах
+
+    Переписываются только XML листов и общие строки, остальные части
+    копируются как есть; память не зависит от размера файла.
+    """
+    with zipfile.ZipFile(source_path) as zin:
+        infos = zin.infolist()
+        sheet_names = [info.filename for info in infos if WORKSHEET_RE.match(info.filename)]
+        blank_indices: Set[int] = set()
+        if SHARED_STRINGS_PART in zin.namelist():
+            fio_indices, other_indices = collect_shared_indices(zin, sheet_names)
+            blank_indices = fio_indices - other_indices
+
+        with zipfile.ZipFile(target_path, "w") as zout:
+            for info in infos:
+                target_info = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+                target_info.compress_type = info.compress_type
+                target_info.external_attr = info.external_attr
+                with zin.open(info) as src, zout.open(target_info, "w", force_zip64=info.file_size > 0x7FFFFFFF) as dst:
+                    if info.filename in sheet_names:
+                        chunks = anonymize_sheet(read_chunks(src))
+                    elif info.filename == SHARED_STRINGS_PART and blank_indices:
+                        chunks = anonymize_shared_strings(read_chunks(src), blank_indices)
+                    else:
+                        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+                        continue
+                    for chunk in chunks:
+                        dst.write(chunk)
+
+
+class AnonymizedCache:
+    """Кэш обезличенных копий аттестаций на диске
+
+    Копия строится один раз для каждой версии исходного файла (путь, mtime, размер).
+    Хранится не больше max_entries копий: давно не запрошенные удаляются, в том
+    числе копии уже удаленных аттестаций.
+    """
+
+    def __init__(self, cache_dir: str, max_entries: int = 32):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, source_path: str) -> str:
+        """Путь к обезличенной копии файла (строит ее при необходимости)"""
+        st = os.stat(source_path)
+        prefix = hashlib.sha1(os.path.abspath(source_path).encode('utf-8')).hexdigest()
+        path = os.path.join(self.cache_dir, f"{prefix}_{st.st_mtime_ns}_{st.st_size}.xlsx")
+        if os.path.exists(path):
+            try:
+                os.utime(path)  # время последнего запроса — для вытеснения давних копий
+            except OSError:
+                pass
+            return path
+
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            anonymize_xlsx(source_path, tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._prune(prefix, path)
+        return path
+
+    def _prune(self, prefix: str, keep: str):
+        """Удаляет копии прежних версий файла и самые давние копии сверх max_entries
+
+        Копию, которую уже отправляют, удалять можно: FileBody держит файл открытым.
+        """
+        entries = []
+        for file in os.listdir(self.cache_dir):
+            file_path = os.path.join(self.cache_dir, file)
+            if not file.endswith(".xlsx") or file_path == keep:
+                continue
+            try:
+                if file.startswith(f"{prefix}_"):
+                    os.remove(file_path)
+                else:
+                    entries.append((os.path.getmtime(file_path), file_path))
+            except OSError:
+                pass
+        entries.sort()
+        for _, file_path in entries[:max(0, len(entries) - (self.max_entries - 1))]:
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
@@ -0,0 +1,350 @@
+import os
+import posixpath
+import re
+import sys
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Set, Tuple
+from xml.parsers import expat
+
+from journal_matrix import JournalMatrix
+
+# Способы чтения журналов
+READER_OPENPYXL = "openpyxl"
+READER_EXPAT = "expat"
+READERS = (READER_OPENPYXL, READER_EXPAT)
+
+NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+NS_PACKAGE_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# Встроенные форматы чисел с датой/временем (ECMA-376, 18.8.30)
+BUILTIN_DATE_FORMATS = set(range(14, 23)) | set(range(27, 37)) | set(range(45, 48)) | set(range(50, 59))
+_FORMAT_LITERALS_RE = re.compile(r'"[^"]*"|\[[^\]]*\]|\\.')
+_DATE_TOKENS_RE = re.compile(r"[dmyhs]", re.IGNORECASE)
+
+EPOCH_1900 = datetime(1899, 12, 30)
+EPOCH_1904 = datetime(1904, 1, 1)
+
+CHUNK_SIZE = 1 << 16
+
+
+_LOCAL_NAMES: Dict[str, str] = {}
+_COLUMN_INDEXES: Dict[str, int] = {}
+
+
+def _local_name(name: str) -> str:
+    """Имя тега без префикса пространства имен (x:c -> c)"""
+    local = _LOCAL_NAMES.get(name)
+    if local is None:
+        local = _LOCAL_NAMES[name] = name.rsplit(":", 1)[-1]
+    return local
+
+
+def column_index(ref: str) -> int:
+    """Номер столбца (с 1) по адресу ячейки вида 'AB12'"""
+    letters = ref.rstrip("0123456789")
+    index = _COLUMN_INDEXES.get(letters)
+    if index is None:
+        index = 0
+        for char in letters:
+            index = index * 26 + ord(char) - 64
+        _COLUMN_INDEXES[letters] = index
+    return index
+
+
+def is_date_format(format_code: str) -> bool:
+    """Похож ли пользовательский формат числа на формат даты"""
+    return bool(_DATE_TOKENS_RE.search(_FORMAT_LITERALS_RE.sub("", format_code)))
+
+
+class _WorkbookInfo:
+    """Сведения о книге, нужные для чтения листа: путь листа, стили дат, общие строки"""
+
+    def __init__(self, zf: zipfile.ZipFile):
+        names = set(zf.namelist())
+        workbook = ET.fromstring(zf.read("xl/workbook.xml"))
+
+        workbook_pr = workbook.find(f"{NS_MAIN}workbookPr")
+        self.epoch = EPOCH_1904 if workbook_pr is not None and workbook_pr.get("date1904") in ("1", "true") else EPOCH_1900
+
+        # Активный лист, как wb.active в openpyxl
+        view = workbook.find(f"{NS_MAIN}bookViews/{NS_MAIN}workbookView")
+        active_tab = int(view.get("activeTab", 0)) if view is not None else 0
+        sheets = workbook.findall(f"{NS_MAIN}sheets/{NS_MAIN}sheet")
+        if not sheets:
+            raise ValueError("В книге нет листов")
+        sheet = sheets[active_tab] if active_tab < len(sheets) else sheets[0]
+
+        targets = {}
+        rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+        for rel in rels.iter(f"{NS_PACKAGE_REL}Relationship"):
+            targets[rel.get("Id")] = rel.get("Target")
+        target = targets[sheet.get(f"{NS_REL}id")]
+        self.sheet_path = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+
+        self.date_styles = self._read_date_styles(zf) if "xl/styles.xml" in names else set()
+        self.shared_strings = read_shared_strings(zf) if "xl/sharedStrings.xml" in names else []
+
+    @staticmethod
+    def _read_date_styles(zf: zipfile.ZipFile) -> Set[int]:
+        """Номера стилей ячеек (атрибут s), у которых формат числа — дата"""
+        styles = ET.fromstring(zf.read("xl/styles.xml"))
+        custom_formats = {
+            int(fmt.get("numFmtId")): fmt.get("formatCode", "")
+            for fmt in styles.iter(f"{NS_MAIN}numFmt")
+        }
+        date_styles = set()
+        cell_xfs = styles.find(f"{NS_MAIN}cellXfs")
+        if cell_xfs is None:
+            return date_styles
+        for idx, xf in enumerate(cell_xfs.findall(f"{NS_MAIN}xf")):
+            fmt_id = int(xf.get("numFmtId", 0))
+            if fmt_id in BUILTIN_DATE_FORMATS or (fmt_id in custom_formats and is_date_format(custom_formats[fmt_id])):
+                date_styles.add(idx)
+        return date_styles
+
+
+def _feed(parser, f) -> Iterator[None]:
+    """Подает файл в парсер expat частями; после каждой части управление возвращается"""
+    for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+        parser.Parse(chunk, False)
+        yield
+    parser.Parse(b"", True)
+    yield
+
+
+def read_shared_strings(zf: zipfile.ZipFile) -> List[str]:
+    """Таблица общих строк (фонетические подсказки rPh пропускаются)"""
+    strings: List[str] = []
+    parts: List[str] = []
+    state = {"text": False, "phonetic": 0}
+
+    def start(name, attrs):
+        name = _local_name(name)
+        if name == "si":
+            parts.clear()
+        elif name == "t" and not state["phonetic"]:
+            state["text"] = True
+        elif name == "rPh":
+            state["phonetic"] += 1
+
+    def end(name):
+        name = _local_name(name)
+        if name == "si":
+            strings.append("".join(parts))
+        elif name == "t":
+            state["text"] = False
+        elif name == "rPh":
+            state["phonetic"] -= 1
+
+    def data(text):
+        if state["text"]:
+            parts.append(text)
+
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = data
+    with zf.open("xl/sharedStrings.xml") as f:
+        for _ in _feed(parser, f):
+            pass
+    return strings
+
+
+class _SheetParser:
+    """Разбор XML листа в кортежи значений строк (как iter_rows(values_only=True))"""
+
+    def __init__(self, info: _WorkbookInfo):
+        self.info = info
+        self.rows: List[Tuple[int, Tuple[Any, ...]]] = []
+        self.row_number = 0
+        self.values: List[Any] = []
+        self.column = 0
+        self.cell_type = "n"
+        self.cell_style = 0
+        self.text: List[str] = []
+        self.collect = False
+        self.phonetic = 0
+
+        parser = expat.ParserCreate()
+        parser.buffer_text = True
+        parser.StartElementHandler = self.start
+        parser.EndElementHandler = self.end
+        parser.CharacterDataHandler = self.data
+        self.parser = parser
+
+    def start(self, name, attrs):
+        if ":" in name:
+            name = _local_name(name)
+        if name == "c":
+            ref = attrs.get("r")
+            self.column = column_index(ref) if ref else self.column + 1
+            self.cell_type = attrs.get("t", "n")
+            self.cell_style = int(attrs.get("s", 0))
+            self.text = []
+        elif name == "v":
+            self.collect = True
+        elif name == "t" and self.cell_type == "inlineStr" and not self.phonetic:
+            self.collect = True
+        elif name == "rPh":
+            self.phonetic += 1
+        elif name == "row":
+            ref = attrs.get("r")
+            self.row_number = int(ref) if ref else self.row_number + 1
+            self.values = []
+            self.column = 0
+
+    def end(self, name):
+        if ":" in name:
+            name = _local_name(name)
+        if name == "v" or name == "t":
+            self.collect = False
+        elif name == "c":
+            value = self.convert("".join(self.text)) if self.text else None
+            if value is not None:
+                if len(self.values) < self.column:
+                    self.values.extend([None] * (self.column - len(self.values)))
+                self.values[self.column - 1] = value
+        elif name == "rPh":
+            self.phonetic -= 1
+        elif name == "row":
+            self.rows.append((self.row_number, tuple(self.values)))
+
+    def data(self, text):
+        if self.collect:
+            self.text.append(text)
+
+    def convert(self, text: str) -> Any:
+        cell_type = self.cell_type
+        if cell_type == "s":
+            return self.info.shared_strings[int(text)]
+        if cell_type in ("inlineStr", "str", "e"):
+            return text
+        if cell_type == "b":
+            return text == "1"
+        if cell_type == "d":
+            return datetime.fromisoformat(text.rstrip("Z"))
+        number = float(text) if ("." in text or "E" in text or "e" in text) else int(text)
+        if self.cell_style in self.info.date_styles:
+            return _from_excel(number, self.info.epoch)
+        return number
+
+
+def _from_excel(value: float, epoch: datetime) -> datetime:
+    """Число Excel в дату (в системе 1900 учитывается несуществующее 29.02.1900)"""
+    if epoch == EPOCH_1900 and 0 <= value < 60:
+        value += 1
+    result = epoch + timedelta(days=value)
+    # Убираем погрешность хранения времени в виде дробной части суток
+    return result.replace(microsecond=0) + timedelta(seconds=round(result.microsecond / 1e6))
+
+
+def iter_sheet_rows(file_path: str, min_row: int = 1) -> Iterator[Tuple[Any, ...]]:
+    """Строки активного листа книги как кортежи значений
+
+    Замена ws.iter_rows(min_row=..., values_only=True) для журналов: читает XML
+    листа напрямую из zip через expat, без создания объектов ячеек. Пропущенные
+    в файле строки отдаются пустыми кортежами, как в openpyxl.
+    """
+    with zipfile.ZipFile(file_path) as zf:
+        info = _WorkbookInfo(zf)
+        sheet = _SheetParser(info)
+        expected = min_row
+        with zf.open(info.sheet_path) as f:
+            for _ in _feed(sheet.parser, f):
+                for row_number, values in sheet.rows:
+                    if row_number < min_row:
+                        continue
+                    while expected < row_number:
+                        expected += 1
+                        yield ()
+                    expected = row_number + 1
+                    yield values
+                sheet.rows.clear()
+
+
+def read_header_row(file_path: str) -> Tuple[Any, ...]:
+    """Первая строка активного листа (заголовки журнала) без разбора остальных строк
+
+    Разбор XML листа останавливается на первой части файла, в которой
+    закончилась строка 1; пустой лист дает пустой кортеж.
+    """
+    rows = iter_sheet_rows(file_path)
+    try:
+        return next(rows, ())
+    finally:
+        rows.close()
+
+
+def read_journal_matrix(file_path: str) -> JournalMatrix:
+    """Разбирает журнал предмета в матрицу отметок без openpyxl"""
+    return JournalMatrix.from_rows(iter_sheet_rows(file_path))
+
+
+def read_sheet_rows(file_path: str, reader: str = READER_OPENPYXL, min_row: int = 1) -> List[Tuple[Any, ...]]:
+    """Строки активного листа выбранным способом чтения (для небольших файлов, например списков студентов)"""
+    if reader == READER_EXPAT:
+        return list(iter_sheet_rows(file_path, min_row))
+    from openpyxl import load_workbook
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        return list(wb.active.iter_rows(min_row=min_row, values_only=True))
+    finally:
+        wb.close()
+
+
+def _trim(row: Tuple[Any, ...]) -> Tuple[Any, ...]:
+    row = tuple(row or ())
+    end = len(row)
+    while end and row[end - 1] is None:
+        end -= 1
+    return row[:end]
+
+
+def check_parity(file_path: str) -> List[str]:
+    """Сравнивает чтение файла через expat и через openpyxl, возвращает описания расхождений
+
+    Строки сравниваются без завершающих пустых ячеек и пустых строк в конце листа
+    (openpyxl дополняет строки до размеров листа).
+    """
+    expat_rows = [_trim(row) for row in iter_sheet_rows(file_path)]
+    openpyxl_rows = [_trim(row) for row in read_sheet_rows(file_path, READER_OPENPYXL)]
+    for rows in (expat_rows, openpyxl_rows):
+        while rows and not rows[-1]:
+            rows.pop()
+
+    problems = []
+    if len(expat_rows) != len(openpyxl_rows):
+        problems.append(f"строк: expat {len(expat_rows)}, openpyxl {len(openpyxl_rows)}")
+    for row_number, (fast, reference) in enumerate(zip(expat_rows, openpyxl_rows), 1):
+        if fast != reference:
+            problems.append(f"строка {row_number}: expat {fast!r}, openpyxl {reference!r}")
+    return problems
+
+
+def check_parity_folder(journals_path: str) -> int:
+    """Проверяет все .xlsx файлы в папке журналов, возвращает число файлов с расхождениями"""
+    failed = 0
+    checked = 0
+    for root, dirs, files in os.walk(journals_path):
+        dirs.sort()
+        for file in sorted(files):
+            if not file.endswith(".xlsx") or file.startswith("~$"):
+                continue
+            file_path = os.path.join(root, file)
+            checked += 1
+            problems = check_parity(file_path)
+            if problems:
+                failed += 1
+                print(f"Расхождения в {file_path}:")
+                for problem in problems[:10]:
+                    print(f"  {problem}")
+    print(f"Проверено файлов: {checked}, с расхождениями: {failed}")
+    return failed
+
+
+if __name__ == "__main__":
+    sys.exit(1 if check_parity_folder(sys.argv[1] if len(sys.argv) > 1 else "Журналы/1 Курс") else 0)